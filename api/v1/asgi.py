@@ -0,0 +1,409 @@
+import asyncio
+import importlib
+import io
+import json
+import multiprocessing
+import re
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+from multiprocessing import forkserver
+from urllib.parse import parse_qs
+
+from . import metrics
+from .data import ASYNC_SEARCH_WORKERS, ASYNC_MAX_QUEUE, ASYNC_DEADLINE_S, ASYNC_BLOCKING_THREADS
+from .utils import current_network, reload_network, start_network_watcher
+
+
+# ---------------------------------------------------
+# MODO ASGI
+# El mismo blueprint de Flask detrás de un event loop (uvicorn asgi:app).
+# Cada petición se despacha según su costo:
+#   búsquedas (/instrucciones, /alcance)   -> pool acotado de procesos, con plazo
+#   lote NDJSON y recarga de la red        -> un hilo (streaming / trabajo largo)
+#   teselas, /paradas?bbox y geometría     -> un hilo (teselas y polylines se
+#   de rutas                                  arman la primera vez que se
+#                                             piden; el bbox recorre el área)
+#   todo lo demás (catálogos, parada, parada más cercana, /metrics)
+#                                          -> directo en el event loop
+# Las búsquedas lentas ya no bloquean las consultas baratas, y como se usa
+# la misma app WSGI, las respuestas son idénticas a las del modo Flask.
+# ---------------------------------------------------
+SEARCH_PATHS = ("/instrucciones", "/alcance")
+BLOCKING_PATHS = ("/instrucciones/batch", "/admin/recargar")
+# rutas (regex, sin el prefijo) y ruta -> parámetro que también van a un hilo
+BLOCKING_PATTERNS = (r"/tiles/\d+/\d+/\d+", r"/rutas/[^/]+/geometria")
+BLOCKING_QUERIES = {"/paradas": "bbox", "/rutas": "geometria"}
+
+
+# ---------------------------------------------------
+# PUENTE ASGI -> WSGI
+# El environ se arma solo con tipos simples para poder mandarlo a otro
+# proceso; wsgi.input y compañía se agregan donde se ejecuta.
+# ---------------------------------------------------
+def build_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+    }
+    for name, value in scope.get("headers", ()):
+        key = name.decode("latin-1").upper().replace("-", "_")
+        if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = "HTTP_" + key
+        value = value.decode("latin-1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+def _start(app, environ, body):
+    """Llama a la app WSGI; ([status, headers], iterable, escritos con write())."""
+    environ = dict(environ)
+    environ.update({
+        "wsgi.version": (1, 0),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    })
+    head = []
+    written = []
+
+    def start_response(status, headers, exc_info=None):
+        head[:] = [
+            int(status.split(" ", 1)[0]),
+            [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+        ]
+        return written.append
+
+    result = app(environ, start_response)
+    return head, result, written
+
+
+def call_wsgi(app, environ, body):
+    """(status, headers, cuerpo) con el cuerpo completo en memoria."""
+    head, result, written = _start(app, environ, body)
+    try:
+        chunks = written + [chunk for chunk in result if chunk]
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return head[0], head[1], b"".join(chunks)
+
+
+def stream_wsgi(app, environ, body, emit):
+    """Igual que call_wsgi pero manda cada pedazo con emit(mensaje ASGI) al producirlo."""
+    head, result, written = _start(app, environ, body)
+    try:
+        started = False
+        for chunk in chain(written, _nonempty(result)):
+            if not started:
+                emit({"type": "http.response.start", "status": head[0], "headers": head[1]})
+                started = True
+            emit({"type": "http.response.body", "body": chunk, "more_body": True})
+        if not started:
+            emit({"type": "http.response.start", "status": head[0], "headers": head[1]})
+        emit({"type": "http.response.body", "body": b"", "more_body": False})
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+
+def _nonempty(chunks):
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+
+
+async def _read_body(receive):
+    parts = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        parts.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(parts)
+
+
+async def _send(send, status, headers, body):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_error(send, status, message, headers=()):
+    body = (json.dumps({"ok": False, "message": message}) + "\n").encode("utf-8")
+    await _send(send, status, [(b"content-type", b"application/json"), *headers], body)
+
+
+# ---------------------------------------------------
+# POOL ACOTADO DE BÚSQUEDA
+# Admite hasta workers + max_queue peticiones a la vez (en curso + en
+# cola); las demás se rechazan de inmediato con 503 (contrapresión).
+# Una petición que pasa de su plazo se responde con 504, pero su búsqueda
+# sigue ocupando el lugar hasta terminar, así que cuenta para el límite.
+# Si la búsqueda falla fuera de la app (un proceso que murió, el pool
+# cerrado) se responde 500, o 503 si el pool quedó roto: se descarta y
+# la siguiente búsqueda crea otro.
+# Procesos de un forkserver (sin forkserver, hilos): el servidor arranca
+# limpio al iniciar la app (lifespan), importa este módulo y con él la red,
+# y cada proceso sale de ahí por fork. Así no se hace fork del proceso
+# principal, que ya tiene hilos (vigilante de la red, lote, pool) y cuyos
+# candados podrían quedar tomados en el hijo. Cada proceso importa la app
+# WSGI de app_path y, si la red cambió desde que se creó, la recarga antes
+# de buscar (misma versión que la petición).
+# ---------------------------------------------------
+_worker_app = None
+
+
+class _Recorder:
+    """Registro del proceso hijo: la medición regresa con la respuesta."""
+
+    def __init__(self):
+        self.last = None
+
+    def observe(self, *observation):
+        self.last = observation
+
+
+def _init_worker(app_path):
+    global _worker_app
+    module, _, name = app_path.partition(":")
+    _worker_app = getattr(importlib.import_module(module), name)
+    metrics.registry = _Recorder()
+    metrics.profiler.threshold = 0
+
+
+def _run_in_process(version, environ, body):
+    if current_network().version != version:
+        reload_network()
+    status, headers, content = call_wsgi(_worker_app, environ, body)
+    observation, metrics.registry.last = metrics.registry.last, None
+    return status, headers, content, observation
+
+
+def _run_in_thread(environ, body):
+    return (*call_wsgi(_worker_app, environ, body), None)
+
+
+class SearchPool:
+
+    def __init__(self, workers, max_queue, app_path):
+        self.workers = max(1, workers)
+        self.app_path = app_path
+        self.max_queue = max(0, max_queue)
+        self.inflight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._processes = "forkserver" in multiprocessing.get_all_start_methods()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.inflight >= self.workers + self.max_queue:
+                self.rejected += 1
+                return False
+            self.inflight += 1
+            self.accepted += 1
+            return True
+
+    def release(self, _future=None):
+        with self._lock:
+            self.inflight -= 1
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def failed(self):
+        with self._lock:
+            self.errors += 1
+
+    def submit(self, environ, body):
+        """Después de try_acquire; el lugar se libera cuando la búsqueda termina."""
+        executor = None
+        try:
+            executor = self.start()
+            if self._processes:
+                future = executor.submit(_run_in_process, current_network().version, environ, body)
+            else:
+                future = executor.submit(_run_in_thread, environ, body)
+        except Exception as e:
+            self.release()
+            self._discard_if_broken(executor, e)
+            raise
+        future.add_done_callback(self.release)
+        future.add_done_callback(lambda f: f.cancelled() or self._discard_if_broken(executor, f.exception()))
+        return future
+
+    def _discard_if_broken(self, executor, error):
+        # un proceso murió: ese executor ya no acepta trabajo
+        if not isinstance(error, BrokenProcessPool):
+            return
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def start(self):
+        """Crea el pool (una vez); en el lifespan, para que el forkserver cargue la red al iniciar."""
+        with self._lock:
+            if self._executor is None:
+                if self._processes:
+                    context = multiprocessing.get_context("forkserver")
+                    context.set_forkserver_preload([__name__])
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=context,
+                        initializer=_init_worker,
+                        initargs=(self.app_path,),
+                    )
+                    forkserver.ensure_running()
+                else:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="movikoox-search")
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "inflight": self.inflight,
+                "queue_depth": max(0, self.inflight - self.workers),
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+            }
+
+    def gauges(self):
+        s = self.stats()
+        return [
+            ("movikoox_async_workers", "Procesos del pool de búsqueda.", {}, s["workers"]),
+            ("movikoox_async_inflight", "Búsquedas en curso o en cola.", {}, s["inflight"]),
+            ("movikoox_async_queue_depth", "Búsquedas esperando un proceso libre.", {}, s["queue_depth"]),
+            ("movikoox_async_max_queue", "Cola máxima antes de responder 503.", {}, s["max_queue"]),
+            ("movikoox_async_accepted", "Búsquedas admitidas.", {}, s["accepted"]),
+            ("movikoox_async_rejected", "Búsquedas rechazadas con 503 (pool lleno).", {}, s["rejected"]),
+            ("movikoox_async_timeouts", "Búsquedas respondidas con 504 (plazo vencido).", {}, s["timeouts"]),
+            ("movikoox_async_errors", "Búsquedas respondidas con 500/503 por un error del pool.", {}, s["errors"]),
+        ]
+
+
+# ---------------------------------------------------
+# APLICACIÓN ASGI
+# ---------------------------------------------------
+class AsgiApp:
+
+    def __init__(self, wsgi_app, prefix="/api/v1", workers=ASYNC_SEARCH_WORKERS,
+                 max_queue=ASYNC_MAX_QUEUE, deadline_s=ASYNC_DEADLINE_S, threads=ASYNC_BLOCKING_THREADS,
+                 app_path="app:app"):
+        global _worker_app
+        _worker_app = wsgi_app
+        self.wsgi_app = wsgi_app
+        self.search_paths = {prefix + p for p in SEARCH_PATHS}
+        self.blocking_paths = {prefix + p for p in BLOCKING_PATHS}
+        self.blocking_patterns = re.compile("|".join(re.escape(prefix) + p for p in BLOCKING_PATTERNS))
+        self.blocking_queries = {prefix + p: param for p, param in BLOCKING_QUERIES.items()}
+        self.deadline_s = deadline_s
+        # los procesos de búsqueda importan la app por su ruta (módulo:nombre)
+        self.pool = SearchPool(workers, max_queue, app_path)
+        self.threads = ThreadPoolExecutor(threads, thread_name_prefix="movikoox-wsgi")
+        metrics.gauge_providers.append(self.pool.gauges)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        body = await _read_body(receive)
+        environ = build_environ(scope, body)
+        path = scope["path"]
+
+        if path in self.search_paths:
+            await self._search(environ, body, send)
+        elif self.is_blocking(path, environ["QUERY_STRING"]):
+            await self._in_thread(environ, body, send)
+        else:
+            # consultas baratas: en el loop, sin cambiar de hilo
+            await _send(send, *call_wsgi(self.wsgi_app, environ, body))
+
+    def is_blocking(self, path, query):
+        if path in self.blocking_paths or self.blocking_patterns.fullmatch(path):
+            return True
+        param = self.blocking_queries.get(path)
+        return param is not None and param in parse_qs(query, keep_blank_values=True)
+
+    async def _search(self, environ, body, send):
+        if not self.pool.try_acquire():
+            await _send_error(send, 503, "Servidor ocupado, intenta de nuevo", [(b"retry-after", b"1")])
+            return
+
+        try:
+            future = self.pool.submit(environ, body)
+            status, headers, content, observation = await asyncio.wait_for(
+                asyncio.wrap_future(future), self.deadline_s
+            )
+        except asyncio.TimeoutError:
+            self.pool.timed_out()
+            await _send_error(send, 504, "Tiempo de búsqueda agotado")
+            return
+        except Exception as e:
+            print("Error en el pool de búsqueda:", repr(e))
+            self.pool.failed()
+            if isinstance(e, BrokenProcessPool):
+                await _send_error(send, 503, "Servidor ocupado, intenta de nuevo", [(b"retry-after", b"1")])
+            else:
+                await _send_error(send, 500, "Error interno")
+            return
+
+        if observation is not None:
+            metrics.registry.observe(*observation)
+        await _send(send, status, headers, content)
+
+    async def _in_thread(self, environ, body, send):
+        loop = asyncio.get_running_loop()
+
+        def emit(message):
+            # espera a que el loop lo envíe: el cliente lento frena al generador
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        await loop.run_in_executor(self.threads, stream_wsgi, self.wsgi_app, environ, body, emit)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.pool.start()
+                # solo en el proceso del servidor: los del pool importan app.py
+                start_network_watcher()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.pool.shutdown()
+                self.threads.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
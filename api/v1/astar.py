@@ -0,0 +1,304 @@
+import heapq
+
+from .helpers import calculate_distance
+from . import metrics
+
+INF = float("inf")
+
+# las cotas en km se encogen un poco: el redondeo de la haversina no debe
+# romper la desigualdad del triángulo (la cota tiene que ser consistente)
+KM_BOUND_FACTOR = 1.0 - 1e-9
+
+
+# ---------------------------------------------------
+# BÚSQUEDA PARADA-PARADA
+# Mismos estados que route_multi_stop (parada * R + ruta, o
+# foot_base + parada a pie) y mismo objetivo que siempre:
+#   costo = (camiones, camiones que no son eje, km)   lexicográfico
+# Sin route_graph es el Dijkstra de siempre, y además anota el primer
+# estado extraído de cada parada (para la aproximación).
+# Con route_graph es A*: el heap se ordena por costo + cota de lo que
+# falta, componente por componente:
+#   camiones  route_graph.buses_to (0 en la ruta del destino, si no
+#             saltos en el grafo de rutas); a pie, 1 + la mejor ruta
+#             de la parada
+#   no eje    0
+#   km        distancia en línea recta al destino
+# Las tres cotas son consistentes (ninguna arista las hace bajar más que
+# su propio costo), así que el primer estado del destino que sale del
+# heap es óptimo, como en Dijkstra. Los estados sin forma de llegar
+# (cota infinita) ni entran al heap. En los empates de costo se conserva
+# el predecesor que elegiría Dijkstra (break_tie): el camino es el mismo.
+# Devuelve (came_from, estado del destino o None, first_pop o None).
+# ---------------------------------------------------
+def min_buses_search(g, start, goal, route_graph=None):
+    R = g.num_routes
+    foot_base = g.num_stops * R
+    is_eje = g.route_is_eje
+    adj_ptr, adj_stop, adj_route, adj_dist = g.adj_ptr, g.adj_stop, g.adj_route, g.adj_dist
+
+    directed = route_graph is not None
+    if directed:
+        buses_lb = route_graph.buses_to(goal)
+        edge_routes = route_graph.edge_routes
+        lat, lon = g.lat, g.lon
+        goal_lat, goal_lon = lat[goal], lon[goal]
+        # por parada: (cota a pie, cota en km)
+        stop_lb = {}
+
+        def bounds(i):
+            b = stop_lb.get(i)
+            if b is None:
+                foot = 1 + min((buses_lb[r] for r in edge_routes[i]), default=INF)
+                km = calculate_distance(lat[i], lon[i], goal_lat, goal_lon) * KM_BOUND_FACTOR
+                b = stop_lb[i] = (foot, km)
+            return b
+
+    pq = []
+    came_from = {}
+    best_cost = {}
+    closed = set()
+    first_pop = None if directed else {}
+    pops = 0
+
+    origin = foot_base + start
+    best_cost[origin] = (0, 0, 0.0)
+    if directed:
+        foot, km = bounds(start)
+        if foot < INF:
+            heapq.heappush(pq, (foot, 0, km, origin))
+    else:
+        heapq.heappush(pq, (0, 0, 0.0, origin))
+
+    found = None
+    while pq:
+        state = heapq.heappop(pq)[3]
+        pops += 1
+        if state in closed:
+            continue
+        closed.add(state)
+        # con cotas consistentes la entrada extraída es la del mejor costo
+        bus_c, non_eje_c, dist = best_cost[state]
+
+        if state >= foot_base:
+            cur, cur_r = state - foot_base, -1
+            if not directed and state not in came_from and cur not in first_pop:
+                first_pop[cur] = state
+        else:
+            cur, cur_r = divmod(state, R)
+
+            if not directed and cur not in first_pop:
+                first_pop[cur] = state
+
+            if cur == goal:
+                found = state
+                break
+
+            for nxt, walk_km, _ in g.transfers(cur):
+                nxt_state = foot_base + nxt
+                nxt_cost = (bus_c, non_eje_c, dist + walk_km)
+                old = best_cost.get(nxt_state)
+                if old is None or nxt_cost < old:
+                    if directed:
+                        foot, km = bounds(nxt)
+                        if foot == INF:
+                            continue
+                        key = (bus_c + foot, non_eje_c, nxt_cost[2] + km, nxt_state)
+                    else:
+                        key = (*nxt_cost, nxt_state)
+                    best_cost[nxt_state] = nxt_cost
+                    came_from[nxt_state] = state
+                    heapq.heappush(pq, key)
+                elif directed and nxt_cost == old:
+                    break_tie(came_from, best_cost, nxt_state, state)
+
+        lo = adj_ptr[cur]
+        hi = adj_ptr[cur + 1]
+        for nxt, r, step in zip(adj_stop[lo:hi], adj_route[lo:hi], adj_dist[lo:hi]):
+            if r != cur_r:
+                nxt_cost = (bus_c + 1, non_eje_c + (0 if is_eje[r] else 1), dist + step)
+            else:
+                nxt_cost = (bus_c, non_eje_c, dist + step)
+
+            nxt_state = nxt * R + r
+            old = best_cost.get(nxt_state)
+            if old is None or nxt_cost < old:
+                if directed:
+                    lb = buses_lb[r]
+                    if lb == INF:
+                        continue
+                    key = (nxt_cost[0] + lb, nxt_cost[1], nxt_cost[2] + bounds(nxt)[1], nxt_state)
+                else:
+                    key = (*nxt_cost, nxt_state)
+                best_cost[nxt_state] = nxt_cost
+                came_from[nxt_state] = state
+                heapq.heappush(pq, key)
+            elif directed and nxt_cost == old:
+                break_tie(came_from, best_cost, nxt_state, state)
+
+    metrics.count(pops=pops, pushes=pops + len(pq), expanded=len(closed))
+    return came_from, found, first_pop
+
+
+def break_tie(came_from, best_cost, state, cand):
+    """
+    Empate de costo en state: se queda el predecesor que Dijkstra habría
+    extraído primero (menor (costo, estado)), y solo si sale antes que
+    state. Así A* arma exactamente el mismo camino aunque extraiga en
+    otro orden (came_from puede cambiar aunque state ya haya salido).
+    """
+    key = (best_cost[cand], cand)
+    if key >= (best_cost[state], state):
+        return
+    prev = came_from.get(state)
+    if prev is None or key < (best_cost[prev], prev):
+        came_from[state] = cand
+
+
+# ---------------------------------------------------
+# BÚSQUEDA BIDIRECCIONAL (motor "bidireccional")
+# Mismos estados, costo y paradas candidatas que route_multi_stop:
+#   costo = (camiones, camiones que no son eje, minutos)
+# Dos Dijkstra: uno hacia adelante desde las paradas de origen a pie y
+# otro hacia atrás desde los estados en camión de las paradas de destino
+# (costo de ahí a la llegada, con la caminata final).
+# Hacia atrás, el predecesor de (q, ruta) es cualquier estado de una
+# parada vecina por esa ruta (las aristas son simétricas: mismos km en
+# los dos sentidos); si venía en otra ruta o a pie, cuesta un camión. El
+# de una parada a pie es cualquier estado en camión de una parada con
+# transbordo hacia ella (route_graph.transfers_in).
+# Se avanza por el lado con la menor entrada en su heap y se termina
+# cuando la suma de las dos menores ya no mejora el mejor encuentro.
+# Da el mismo costo óptimo que route_multi_stop; entre caminos empatados
+# puede elegir otro.
+# Devuelve la lista de estados del camino, o None si no hay.
+# ---------------------------------------------------
+def bidirectional_search(g, route_graph, seeds, egress, per_km=1.0, per_stop=0.0):
+    """
+    seeds:  {stop_idx: minutos caminando hasta la parada}
+    egress: {stop_idx: minutos caminando desde la parada}
+    """
+    R = g.num_routes
+    foot_base = g.num_stops * R
+    is_eje = g.route_is_eje
+    adj_ptr, adj_stop, adj_route, adj_dist = g.adj_ptr, g.adj_stop, g.adj_route, g.adj_dist
+    edge_routes, transfers_in = route_graph.edge_routes, route_graph.transfers_in
+
+    fwd_cost, bwd_cost = {}, {}
+    came_from, goes_to = {}, {}
+    fwd_done, bwd_done = set(), set()
+    fwd_pq, bwd_pq = [], []
+    pops = 0
+
+    best = None
+    meet = None
+    # parada que también es destino: subir y bajar ahí (1 camión, 0 paradas);
+    # meet queda con el camino ya armado
+    for i, walk_min in seeds.items():
+        r = g.board_route(i)
+        if i in egress and r is not None:
+            cost = (1, 0 if is_eje[r] else 1, walk_min + egress[i])
+            if best is None or cost < best:
+                best, meet = cost, [foot_base + i]
+
+    def offer(state):
+        nonlocal best, meet
+        a, b = fwd_cost.get(state), bwd_cost.get(state)
+        if a is None or b is None:
+            return
+        total = (a[0] + b[0], a[1] + b[1], a[2] + b[2])
+        if best is None or total < best:
+            best, meet = total, state
+
+    def push(pq, costs, links, state, cost, prev):
+        old = costs.get(state)
+        if old is None or cost < old:
+            costs[state] = cost
+            links[state] = prev
+            heapq.heappush(pq, (*cost, state))
+            offer(state)
+
+    for i, walk_min in seeds.items():
+        push(fwd_pq, fwd_cost, came_from, foot_base + i, (0, 0, walk_min), None)
+    for i, walk_min in egress.items():
+        for r in edge_routes[i]:
+            push(bwd_pq, bwd_cost, goes_to, i * R + r, (0, 0, walk_min), None)
+
+    while fwd_pq and bwd_pq:
+        f, b = fwd_pq[0], bwd_pq[0]
+        if best is not None and (f[0] + b[0], f[1] + b[1], f[2] + b[2]) >= best:
+            break
+        pops += 1
+
+        if f[:3] <= b[:3]:
+            state = heapq.heappop(fwd_pq)[3]
+            if state in fwd_done:
+                continue
+            fwd_done.add(state)
+            bus_c, non_eje_c, minutes = fwd_cost[state]
+
+            if state >= foot_base:
+                cur, cur_r = state - foot_base, -1
+            else:
+                cur, cur_r = divmod(state, R)
+                for nxt, _, walk_min in g.transfers(cur):
+                    push(fwd_pq, fwd_cost, came_from, foot_base + nxt, (bus_c, non_eje_c, minutes + walk_min), state)
+
+            lo = adj_ptr[cur]
+            hi = adj_ptr[cur + 1]
+            for nxt, r, step in zip(adj_stop[lo:hi], adj_route[lo:hi], adj_dist[lo:hi]):
+                nxt_minutes = minutes + step * per_km + per_stop
+                if r != cur_r:
+                    nxt_cost = (bus_c + 1, non_eje_c + (0 if is_eje[r] else 1), nxt_minutes)
+                else:
+                    nxt_cost = (bus_c, non_eje_c, nxt_minutes)
+                push(fwd_pq, fwd_cost, came_from, nxt * R + r, nxt_cost, state)
+        else:
+            state = heapq.heappop(bwd_pq)[3]
+            if state in bwd_done:
+                continue
+            bwd_done.add(state)
+            bus_c, non_eje_c, minutes = bwd_cost[state]
+
+            if state >= foot_base:
+                # llegó a pie a cur: desde cualquier estado en camión de una
+                # parada con transbordo hacia cur
+                cur = state - foot_base
+                for prev, walk_min in transfers_in[cur]:
+                    cost = (bus_c, non_eje_c, minutes + walk_min)
+                    for r in edge_routes[prev]:
+                        push(bwd_pq, bwd_cost, goes_to, prev * R + r, cost, state)
+                continue
+
+            cur, cur_r = divmod(state, R)
+            change = (bus_c + 1, non_eje_c + (0 if is_eje[cur_r] else 1))
+            lo = adj_ptr[cur]
+            hi = adj_ptr[cur + 1]
+            for prev, r, step in zip(adj_stop[lo:hi], adj_route[lo:hi], adj_dist[lo:hi]):
+                if r != cur_r:
+                    continue
+                m = minutes + step * per_km + per_stop
+                for prev_r in edge_routes[prev]:
+                    if prev_r == cur_r:
+                        push(bwd_pq, bwd_cost, goes_to, prev * R + prev_r, (bus_c, non_eje_c, m), state)
+                    else:
+                        push(bwd_pq, bwd_cost, goes_to, prev * R + prev_r, (*change, m), state)
+                push(bwd_pq, bwd_cost, goes_to, foot_base + prev, (*change, m), state)
+
+    metrics.count(pops=pops, pushes=pops + len(fwd_pq) + len(bwd_pq), expanded=len(fwd_done) + len(bwd_done))
+    if meet is None:
+        return None
+    if isinstance(meet, list):
+        return meet
+
+    states = []
+    s = meet
+    while s is not None:
+        states.append(s)
+        s = came_from.get(s)
+    states.reverse()
+    s = goes_to.get(meet)
+    while s is not None:
+        states.append(s)
+        s = goes_to.get(s)
+    return states
@@ -0,0 +1,85 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .data import BATCH_WORKERS
+
+
+# ---------------------------------------------------
+# POOL DE PROCESOS PARA BÚSQUEDAS EN LOTE
+# Los procesos salen de un forkserver (como el pool de búsqueda ASGI): no
+# se hace fork de este proceso, que ya tiene hilos (vigilante, peticiones)
+# y cuyos candados podrían quedar tomados en el hijo. El forkserver carga
+# la red una vez al arrancar; un proceso con otra versión la recarga.
+# Cada tarea es (versión, origins, targets, engine, salida) y regresa (path_states, exacto).
+# El pool pertenece a una versión de la red: al recargarla se cierra
+# (las tareas ya enviadas terminan) y el siguiente lote crea otro.
+# Crear y cerrar van bajo _executor_lock: dos lotes a la vez no crean dos pools.
+# ---------------------------------------------------
+_executor = None
+_executor_version = None
+_executor_lock = threading.Lock()
+
+
+class StaleNetwork(Exception):
+    """El proceso tiene otra versión de la red que la de la tarea."""
+
+
+def _search(task):
+    from .utils import current_network, reload_network, route_multi_stop
+    version, origins, targets, engine, departure = task
+    net = current_network()
+    if net.version != version:
+        net, _ = reload_network()
+        if net.version != version:
+            raise StaleNetwork(version)
+    return route_multi_stop(net, origins, targets, engine=engine, departure=departure)
+
+
+def get_executor(version):
+    """Pool de la versión dada; None si el pool activo es de otra versión."""
+    global _executor, _executor_version
+    with _executor_lock:
+        if _executor is None:
+            context = None
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["api.v1.utils"])
+            _executor = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=context)
+            _executor_version = version
+        if _executor_version != version:
+            return None
+        return _executor
+
+
+def shutdown_executor():
+    global _executor, _executor_version
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+            _executor_version = None
+
+
+def solve_routes(net, tasks):
+    """
+    Resuelve las tareas [(origins, targets, engine, salida)] en orden con la red dada;
+    en el mismo proceso si BATCH_WORKERS <= 1 o el pool es de otra versión.
+    """
+    if not tasks:
+        return []
+    tasks = [(net.version, *task) for task in tasks]
+
+    executor = None
+    if BATCH_WORKERS > 1 and len(tasks) > 1:
+        executor = get_executor(net.version)
+    if executor is not None:
+        chunksize = max(1, len(tasks) // (BATCH_WORKERS * 4))
+        try:
+            return list(executor.map(_search, tasks, chunksize=chunksize))
+        except (StaleNetwork, RuntimeError):
+            # la red se recargó mientras tanto: se resuelve aquí con la red de la petición
+            pass
+
+    from .utils import route_multi_stop
+    return [route_multi_stop(net, *task[1:]) for task in tasks]
@@ -0,0 +1,96 @@
+import gzip
+import hashlib
+import json
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# ---------------------------------------------------
+# RESPUESTAS PRESERIALIZADAS (CATÁLOGOS ESTÁTICOS)
+# El JSON se serializa una sola vez al cargar los datos, igual que jsonify,
+# en variantes plana / gzip / brotli (si está instalado).
+# ETag fuerte por variante a partir del hash del contenido.
+# ---------------------------------------------------
+ENCODING_SUFFIX = {"gzip": "gz", "br": "br"}
+
+
+class PreparedResponse:
+
+    def __init__(self, payload):
+        raw = (json.dumps(payload, ensure_ascii=True, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+        self.etag = hashlib.sha256(raw).hexdigest()[:32]
+        self.bodies = {
+            "identity": raw,
+            "gzip": gzip.compress(raw, 9, mtime=0),
+        }
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(raw)
+
+    @classmethod
+    def from_parts(cls, etag, bodies):
+        """Respuesta ya serializada (p. ej. leída del snapshot de la red)."""
+        prepared = cls.__new__(cls)
+        prepared.etag = etag
+        prepared.bodies = bodies
+        return prepared
+
+    def etag_for(self, encoding):
+        if encoding == "identity":
+            return self.etag
+        return f"{self.etag}-{ENCODING_SUFFIX[encoding]}"
+
+    def matches(self, if_none_match):
+        if if_none_match.star_tag:
+            return True
+        return any(if_none_match.contains_weak(self.etag_for(e)) for e in self.bodies)
+
+
+def negotiate_encoding(bodies):
+    accept = request.accept_encodings
+    for encoding in ("br", "gzip"):
+        if encoding in bodies and accept.quality(encoding) > 0:
+            return encoding
+    return "identity"
+
+
+def prepared_response(prepared):
+    encoding = negotiate_encoding(prepared.bodies)
+    headers = {
+        "ETag": f'"{prepared.etag_for(encoding)}"',
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-cache",
+    }
+
+    if prepared.matches(request.if_none_match):
+        return Response(status=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(prepared.bodies[encoding], mimetype="application/json", headers=headers)
+
+
+# ---------------------------------------------------
+# CATÁLOGOS
+# ---------------------------------------------------
+def build_rutas_body(routes_data, stops_by_id):
+    rutas_response = []
+
+    for ruta in routes_data:
+        paradas_full = []
+
+        for stop_id in ruta.get("paradas", []):
+            stop = stops_by_id.get(int(stop_id))
+            if stop:
+                paradas_full.append(stop)
+
+        rutas_response.append({
+            "nombre": ruta.get("nombre"),
+            "paradas": paradas_full
+        })
+
+    return rutas_response
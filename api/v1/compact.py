@@ -0,0 +1,71 @@
+import json
+
+from flask import Response
+
+from .data import COMPACT_STOP_FIELDS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# ---------------------------------------------------
+# FORMATO COMPACTO DE /instrucciones (formato=compacto)
+# Las instrucciones llevan solo el id de sus paradas (from_stop / to_stop)
+# y al final va una sola tabla "stops", sin repetidos, en el orden en que
+# aparecen. campos=nombre,latitud,... deja en la tabla solo esos campos.
+# Se serializa con orjson si está instalado (si no, json sin espacios) y
+# en UTF-8 sin escapar acentos.
+# ---------------------------------------------------
+STOP_KEYS = ("from_stop", "to_stop")
+
+
+def parse_fields(value):
+    """campos=a,b -> tupla de campos de parada; None = todos. ValueError si alguno no existe."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    fields = tuple(f.strip() for f in value if f.strip())
+    unknown = [f for f in fields if f not in COMPACT_STOP_FIELDS]
+    if unknown:
+        raise ValueError(", ".join(unknown))
+    return fields
+
+
+def compact_trips(trips, fields=None):
+    """Viajes de build_trip -> (viajes con ids de parada, tabla de paradas compartida)."""
+    keep = COMPACT_STOP_FIELDS if fields is None else fields
+    table = {}
+    out = []
+    for trip in trips:
+        instructions = []
+        for instruction in trip["instructions"]:
+            instruction = dict(instruction)
+            for key in STOP_KEYS:
+                stop = instruction.get(key)
+                if stop is not None:
+                    stop_id = stop["id"]
+                    if stop_id not in table:
+                        table[stop_id] = {"id": stop_id, **{f: stop[f] for f in keep if f in stop}}
+                    instruction[key] = stop_id
+            instructions.append(instruction)
+        out.append({**trip, "instructions": instructions})
+    return out, list(table.values())
+
+
+def compact_trip(trip, fields=None):
+    (trip,), stops = compact_trips([trip], fields)
+    trip["stops"] = stops
+    return trip
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype="application/json")
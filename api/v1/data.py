@@ -1,17 +1,115 @@
+import os
+import sys
 import json
+import hashlib
+import marshal
+
+from .snapshot import SNAPSHOT_VERSION
 
 # ------------------------------
 # CONFIGURACIÓN GLOBAL
 # ------------------------------
 ROUND_DECIMALS = 8
 
-PARADAS_JSON = "db/paradas.json"
-RUTAS_JSON = "db/rutas.json"
+# carpeta de datos; MOVIKOOX_DATA_DIR permite cargar otra red completa
+# (por ejemplo una generada con scripts.generate_network)
+DATA_DIR = os.environ.get("MOVIKOOX_DATA_DIR", "db")
+
+PARADAS_JSON = os.path.join(DATA_DIR, "paradas.json")
+RUTAS_JSON = os.path.join(DATA_DIR, "rutas.json")
+# velocidad y frecuencia por ruta y franja horaria (opcional, ver profiles.py)
+PERFILES_JSON = os.path.join(DATA_DIR, "perfiles.json")
 
 WALK_KMH = 4.8
 BUS_KMH = 18.0
 DWELL_SECONDS_PER_STOP = 15
 
+# paradas candidatas para subir / bajar (búsqueda multi-parada)
+WALK_RADIUS_KM = 0.5
+MAX_ACCESS_STOPS = 12
+# radio= más grande se recorta a este (km)
+MAX_WALK_RADIUS_KM = 3.0
+
+# transbordos caminando entre paradas cercanas (0 = solo en la misma parada)
+TRANSFER_WALK_KM = 0.25
+MAX_TRANSFERS_PER_STOP = 8
+
+# /instrucciones?alternativas=k: máximo de alternativas y camiones de más
+# permitidos respecto a la alternativa con menos camiones
+MAX_ALTERNATIVES = 5
+ALTERNATIVES_EXTRA_BUSES = 1
+
+# /alcance: límites de minutos y camiones (y camiones por omisión)
+REACH_MAX_MINUTES = 180
+REACH_MAX_BUSES = 4
+REACH_DEFAULT_BUSES = 2
+
+# /instrucciones?formato=compacto: campos de la tabla de paradas que se pueden
+# pedir con campos=... (el id siempre va)
+COMPACT_STOP_FIELDS = ("nombre", "latitud", "longitud", "rutas")
+
+# mapa: /paradas?bbox=...&zoom=z y /tiles/z/x/y
+# con zoom menor a THIN_MAX_ZOOM queda una parada por celda de THIN_CELL_PX píxeles
+THIN_CELL_PX = 32
+THIN_MAX_ZOOM = 16
+TILE_MAX_ZOOM = 20
+# teselas: se arman al pedirlas y quedan en un LRU de TILE_CACHE_SIZE; en estos
+# zooms (mínimo, máximo) con un reparto por tesela de todo el zoom
+TILE_INDEXED_ZOOMS = (11, 16)
+TILE_CACHE_SIZE = 4096
+
+# /rutas?geometria=polyline: polylines simplificadas (Douglas-Peucker) para estos
+# zooms, quitando lo que se desvía menos de GEOMETRY_TOLERANCE_PX píxeles
+GEOMETRY_ZOOMS = (10, 12, 14)
+GEOMETRY_TOLERANCE_PX = 1.0
+
+# motor de búsqueda: "dijkstra" | "raptor" | "tabla" | "rutas" (jerárquico)
+# | "bidireccional"
+ROUTING_ENGINE = "dijkstra"
+ROUTING_ENGINES = ("dijkstra", "raptor", "tabla", "rutas", "bidireccional")
+# con salida= solo estos usan los perfiles por hora; los demás, el modelo constante
+TIMED_ENGINES = ("dijkstra",)
+# motor "rutas": hasta cuántos camiones responde; con más, Dijkstra
+HIERARCHY_MAX_BUSES = 2
+
+# cache de tramos de bus ya calculados
+ROUTE_CACHE_SIZE = 1024
+# malla para ajustar coordenadas (~110 m) y compartir entradas del cache
+COORD_SNAP_DEG = 0.001
+
+# /instrucciones/batch: procesos de búsqueda (1 = en el mismo proceso)
+BATCH_WORKERS = os.cpu_count() or 1
+BATCH_CHUNK = 256
+BATCH_MAX_TRIPS = 50000
+
+# modo ASGI (uvicorn asgi:app): procesos para /instrucciones y /alcance, búsquedas
+# en cola antes de responder 503, plazo por búsqueda (504) e hilos para lote / recarga
+ASYNC_SEARCH_WORKERS = int(os.environ.get("MOVIKOOX_ASYNC_WORKERS", os.cpu_count() or 1))
+ASYNC_MAX_QUEUE = 64
+ASYNC_DEADLINE_S = 10.0
+ASYNC_BLOCKING_THREADS = 4
+
+# tabla precalculada parada-parada (python -m scripts.build_routing_table)
+ROUTING_TABLE = os.path.join(DATA_DIR, "routing_table.bin")
+# al recargar una red que tenía tabla se reconstruye en otro proceso con
+# estos procesos (0 = no reconstruir, solo avisar)
+TABLE_REBUILD_PROCESSES = max(1, (os.cpu_count() or 1) // 2)
+
+# red compilada en binario para arranques en frío (python -m scripts.build_snapshot)
+NETWORK_SNAPSHOT = os.path.join(DATA_DIR, "network.snapshot")
+
+# /metrics y Server-Timing: cubetas (segundos) de los histogramas de latencia
+LATENCY_BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# perfilador por muestreo: peticiones de al menos estos ms se reportan (0 = apagado)
+SLOW_REQUEST_MS = float(os.environ.get("MOVIKOOX_SLOW_MS", "0"))
+PROFILER_INTERVAL_MS = 5
+SLOW_PROFILES_KEPT = 20
+
+# recarga en caliente: cada cuántos segundos revisar los JSON (0 = sin vigilante)
+RELOAD_INTERVAL_S = 5
+# token para POST /admin/recargar (sin token el endpoint queda deshabilitado)
+ADMIN_TOKEN = os.environ.get("MOVIKOOX_ADMIN_TOKEN")
+
 
 # ------------------------------
 # CARGA DE DATOS
@@ -21,14 +119,36 @@ def load_json(path: str):
         return json.load(f)
 
 
-try:
-    stops_data = load_json(PARADAS_JSON)
-except Exception as e:
-    print("Error al cargar paradas:", e)
-    stops_data = []
+def dataset_signature():
+    """(mtime, tamaño) de paradas.json, rutas.json y perfiles.json; barato para detectar cambios."""
+    signature = []
+    for path in (PARADAS_JSON, RUTAS_JSON, PERFILES_JSON):
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def dataset_hash(*extra) -> bytes:
+    """SHA-256 de paradas.json + rutas.json (y parámetros extra)."""
+    h = hashlib.sha256()
+    for path in (PARADAS_JSON, RUTAS_JSON):
+        try:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        except OSError:
+            pass
+        h.update(b"\0")
+    for value in extra:
+        h.update(repr(value).encode("utf-8"))
+    return h.digest()
+
 
-try:
-    routes_data = load_json(RUTAS_JSON)
-except Exception as e:
-    print("Error al cargar rutas:", e)
-    routes_data = []
+def snapshot_hash() -> bytes:
+    # marshal y el orden de bytes dependen del intérprete
+    return dataset_hash(
+        SNAPSHOT_VERSION, marshal.version, sys.byteorder,
+        TRANSFER_WALK_KM, MAX_TRANSFERS_PER_STOP, WALK_KMH,
+    )
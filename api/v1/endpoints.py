@@ -1,20 +1,45 @@
-from flask import Blueprint, request, jsonify
-import unicodedata
-import re
+import hmac
+import math
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 
 from .data import (
     ROUND_DECIMALS, 
     WALK_KMH, 
     BUS_KMH, 
-    stops_data,
-    routes_data,
+    WALK_RADIUS_KM,
+    MAX_WALK_RADIUS_KM,
+    ROUTING_ENGINES,
+    TIMED_ENGINES,
+    BATCH_CHUNK,
+    BATCH_MAX_TRIPS,
+    ADMIN_TOKEN,
+    MAX_ALTERNATIVES,
+    REACH_MAX_MINUTES,
+    REACH_MAX_BUSES,
+    REACH_DEFAULT_BUSES,
+    TILE_MAX_ZOOM,
 )
 
+from .batch import solve_routes
+from .helpers import calculate_distance
+from . import metrics
+from .catalog import prepared_response
+from .compact import parse_fields, compact_trip, compact_trips, dumps, json_response
+from .profiles import parse_clock, format_clock
 from .utils import (
-    stops_data, stops_by_id,
+    current_network,
+    reload_network,
     closest_stop,
-    route_min_buses_prefer_ejes,
-    build_bus_segments,
+    trip_stop_candidates,
+    batch_stop_candidates,
+    route_cache_key,
+    store_bus_segments,
+    cached_bus_segments,
+    cached_alternatives,
+    reachable_stops,
+    stops_in_bbox,
+    route_cache,
     minutes_from_km,
     estimate_bus_minutes
 )
@@ -22,14 +47,58 @@ from .utils import (
 api_v1 = Blueprint("api_v1", __name__)
 
 
+# =========================
+# MEDICIÓN (Server-Timing + /metrics)
+# =========================
+@api_v1.before_request
+def start_timing():
+    metrics.start_request(request.url_rule.rule if request.url_rule else request.path)
+
+
+@api_v1.after_request
+def finish_timing(response):
+    timer, total = metrics.finish_request(response.status_code)
+    if timer is not None:
+        response.headers["Server-Timing"] = timer.server_timing(total)
+    return response
+
+
+@api_v1.teardown_request
+def release_timing(exc):
+    metrics.abandon_request()
+
+
 @api_v1.route("/paradas")
 def get_paradas():
-    return jsonify({"ok": True, "body": stops_data})
+    bbox = request.args.get("bbox")
+    if bbox is None:
+        return prepared_response(current_network().paradas_response)
+
+    # solo lo que se ve en el mapa: bbox=minLon,minLat,maxLon,maxLat
+    try:
+        min_lon, min_lat, max_lon, max_lat = parse_bbox(bbox)
+    except ValueError:
+        return jsonify({"ok": False, "message": "bbox inválido (minLon,minLat,maxLon,maxLat)"}), 400
+    try:
+        zoom = parse_zoom(request.args.get("zoom"))
+    except ValueError:
+        return jsonify({"ok": False, "message": f"zoom debe estar entre 0 y {TILE_MAX_ZOOM}"}), 400
+
+    stops, total = stops_in_bbox(current_network(), min_lat, min_lon, max_lat, max_lon, zoom)
+    return jsonify({"ok": True, "count": len(stops), "total": total, "body": stops})
+
+
+@api_v1.route("/tiles/<int:z>/<int:x>/<int:y>")
+def get_tile(z, x, y):
+    tiles = current_network().tiles
+    if not tiles.valid(z, x, y):
+        return jsonify({"ok": False, "message": "Tesela inválida"}), 400
+    return prepared_response(tiles.get(z, x, y))
 
 
 @api_v1.route("/paradas/<int:id>")
 def get_parada(id):
-    stop = stops_by_id.get(id)
+    stop = current_network().stop_store.by_id(id)
     if not stop:
         return jsonify({"ok": False, "message": "Parada no encontrada"}), 404
     return jsonify({"ok": True, "body": stop})
@@ -40,13 +109,15 @@ def get_parada_cercana():
     try:
         lat = float(request.args.get("latitud"))
         lon = float(request.args.get("longitud"))
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            raise ValueError("punto inválido")
     except:
         return jsonify({
             "ok": False,
             "message": "Parámetros inválidos"
         }), 400
 
-    stop, distance = closest_stop(lat, lon)
+    stop, distance = closest_stop(current_network(), lat, lon)
 
     if not stop:
         return jsonify({
@@ -61,6 +132,63 @@ def get_parada_cercana():
     })
 
 
+def parse_point(value):
+    """'LAT,LON' o [lat, lon] -> (lat, lon); ValueError si no es válido."""
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError("punto inválido")
+    lat, lon = (float(x) for x in value)
+    # nan / inf no caen en ninguna celda del índice espacial
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise ValueError("punto inválido")
+    return lat, lon
+
+
+def parse_bbox(value):
+    """'minLon,minLat,maxLon,maxLat' -> 4 floats; ValueError si no es válido."""
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError("bbox inválido")
+    min_lon, min_lat, max_lon, max_lat = (float(x) for x in parts)
+    if not all(math.isfinite(x) for x in (min_lon, min_lat, max_lon, max_lat)):
+        raise ValueError("bbox inválido")
+    if not (min_lon <= max_lon and min_lat <= max_lat):
+        raise ValueError("bbox inválido")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parse_zoom(value):
+    """Zoom del mapa (0 a TILE_MAX_ZOOM); None si no se dio. ValueError si no es válido."""
+    if value is None:
+        return None
+    zoom = int(value)
+    if not 0 <= zoom <= TILE_MAX_ZOOM:
+        raise ValueError("zoom inválido")
+    return zoom
+
+
+def parse_radius(value):
+    """Radio caminable en km, recortado a MAX_WALK_RADIUS_KM; WALK_RADIUS_KM si no se dio. ValueError si no es > 0."""
+    if value is None or value == "":
+        return WALK_RADIUS_KM
+    radius = float(value)
+    if not (math.isfinite(radius) and radius > 0):
+        raise ValueError("radio inválido")
+    return min(radius, MAX_WALK_RADIUS_KM)
+
+
+def is_truthy(value):
+    return str(value).lower() in ("1", "true", "si")
+
+
+def parse_departure(value):
+    """'HH:MM' -> minutos desde las 00:00; None si no se dio. ValueError si no es válida."""
+    if value is None or value == "":
+        return None
+    return parse_clock(value)
+
+
 @api_v1.route("/instrucciones")
 def instrucciones():
     inicio = request.args.get("inicio")
@@ -69,22 +197,95 @@ def instrucciones():
     if not inicio or not destino:
         return jsonify({"ok": False, "message": "Parámetros requeridos"}), 400
 
-    i_lat, i_lon = map(float, inicio.split(","))
-    d_lat, d_lon = map(float, destino.split(","))
+    try:
+        i_lat, i_lon = parse_point(inicio)
+        d_lat, d_lon = parse_point(destino)
+    except ValueError:
+        return jsonify({"ok": False, "message": "Formato inválido"}), 400
+
+    try:
+        radio = parse_radius(request.args.get("radio"))
+    except ValueError:
+        return jsonify({"ok": False, "message": "Radio inválido"}), 400
+    motor = request.args.get("motor")
+    if motor is not None and motor not in ROUTING_ENGINES:
+        return jsonify({"ok": False, "message": "Motor inválido"}), 400
+    alternativas = request.args.get("alternativas", type=int)
+    if "alternativas" in request.args and not (alternativas and 1 <= alternativas <= MAX_ALTERNATIVES):
+        return jsonify({"ok": False, "message": f"alternativas debe estar entre 1 y {MAX_ALTERNATIVES}"}), 400
+    try:
+        salida = parse_departure(request.args.get("salida"))
+    except ValueError:
+        return jsonify({"ok": False, "message": "Hora de salida inválida (HH:MM)"}), 400
+    if salida is not None and motor is not None and motor not in TIMED_ENGINES:
+        return jsonify({"ok": False, "message": "Con salida solo se admite motor=dijkstra"}), 400
+    compacto = request.args.get("formato") == "compacto"
+    try:
+        campos = parse_fields(request.args.get("campos"))
+    except ValueError as e:
+        return jsonify({"ok": False, "message": f"Campos inválidos: {e}"}), 400
+
+    # la misma red durante toda la petición aunque se recargue a la mitad
+    net = current_network()
+
+    # paradas cercanas (todas las del radio caminable);
+    # ajustar a la malla: peticiones cercanas comparten cache
+    with metrics.phase("paradas"):
+        origins, targets = trip_stop_candidates(
+            net, i_lat, i_lon, d_lat, d_lon, radio,
+            snap=is_truthy(request.args.get("ajustar", ""))
+        )
+
+    if not origins or not targets:
+        return jsonify({"ok": False, "message": "No se encontraron paradas"}), 404
+
+    trip = (i_lat, i_lon, d_lat, d_lon)
 
-    # paradas cercanas
-    start_stop, start_walk = closest_stop(i_lat, i_lon)
-    end_stop, end_walk = closest_stop(d_lat, d_lon)
+    if alternativas:
+        return alternatives_response(net, trip, origins, targets, alternativas, motor, salida, compacto, campos)
 
-    path_states = route_min_buses_prefer_ejes(
-        int(start_stop["id"]),
-        int(end_stop["id"])
-    )
+    bus_segments, exact = cached_bus_segments(net, origins, targets, engine=motor, departure=salida)
 
-    if not path_states:
+    if not bus_segments:
         return jsonify({"ok": False, "message": "No hay ruta"}), 404
 
-    bus_segments = build_bus_segments(path_states)
+    with metrics.phase("viaje"):
+        body = build_trip(*trip, bus_segments, exact, net, salida)
+    with metrics.phase("json"):
+        if compacto:
+            return json_response(compact_trip(body, campos))
+        return jsonify(body)
+
+
+def alternatives_response(net, trip, origins, targets, k, motor, salida, compacto=False, campos=None):
+    # frente de Pareto (camiones, camiones no eje, minutos, caminata) en una sola búsqueda
+    alternatives = cached_alternatives(net, origins, targets, k, salida)
+    with metrics.phase("viaje"):
+        trips = [build_trip(*trip, bus_segments, True, net, salida) for bus_segments in alternatives]
+
+    # sin llegada exacta: la aproximación de siempre como única alternativa
+    if not trips:
+        bus_segments, exact = cached_bus_segments(net, origins, targets, engine=motor, departure=salida)
+        if bus_segments:
+            trips.append(build_trip(*trip, bus_segments, exact, net, salida))
+
+    if not trips:
+        return jsonify({"ok": False, "message": "No hay ruta"}), 404
+
+    with metrics.phase("json"):
+        if compacto:
+            # una sola tabla de paradas para todas las alternativas
+            trips, stops = compact_trips(trips, campos)
+            return json_response({"ok": True, "alternatives": trips, "stops": stops})
+        return jsonify({"ok": True, "alternatives": trips})
+
+
+def build_trip(i_lat, i_lon, d_lat, d_lon, bus_segments, exact, net=None, departure=None):
+    """Con departure (minutos desde las 00:00): tiempos y esperas según los perfiles de net."""
+    start_stop = bus_segments[0]["from_stop"]
+    end_stop = bus_segments[-1]["to_stop"]
+    start_walk = calculate_distance(i_lat, i_lon, start_stop["latitud"], start_stop["longitud"])
+    end_walk = calculate_distance(end_stop["latitud"], end_stop["longitud"], d_lat, d_lon)
 
     instructions = []
 
@@ -105,15 +306,60 @@ def instrucciones():
     # TRAMOS DE BUS
     # =========================
     total_bus_minutes = 0.0
+    total_wait_minutes = 0.0
+    transfer_walk = 0.0
+    transfer_minutes = 0.0
+    prev_stop = None
+    timed = departure is not None
+    if timed:
+        profiles = net.profiles
+        clock = departure + walk_start_minutes
 
     for seg in bus_segments:
-        bus_minutes = estimate_bus_minutes(
-            seg["distance_km"],
-            seg["stops_count"]
-        )
+        # transbordo a pie entre paradas cercanas
+        if prev_stop is not None and prev_stop["id"] != seg["from_stop"]["id"]:
+            walk = calculate_distance(
+                prev_stop["latitud"], prev_stop["longitud"],
+                seg["from_stop"]["latitud"], seg["from_stop"]["longitud"]
+            )
+            walk_minutes = minutes_from_km(walk, WALK_KMH)
+            transfer_walk += walk
+            transfer_minutes += walk_minutes
+            if timed:
+                clock += walk_minutes
+
+            instructions.append({
+                "type": "walk",
+                "from_stop": prev_stop,
+                "to_stop": seg["from_stop"],
+                "distance_km": round(walk, ROUND_DECIMALS),
+                "minutes": round(walk_minutes, 2)
+            })
+        prev_stop = seg["to_stop"]
+
+        if timed:
+            # igual que la búsqueda: espera de la franja en que se llega a la
+            # parada y cada arista con la franja de la hora en que empieza
+            # (la primera, antes de la espera); sin aristas no se sube
+            r = net.compiled.route_index[seg["bus"]]
+            wait_minutes = profiles.wait_minutes(r, clock) if seg["steps"] else 0.0
+            band_clock = clock
+            clock += wait_minutes
+            bus_minutes = 0.0
+            for step in seg["steps"]:
+                step_minutes = estimate_bus_minutes(step, 2, profiles.ride_per_km(r, band_clock))
+                bus_minutes += step_minutes
+                clock += step_minutes
+                band_clock = clock
+            total_wait_minutes += wait_minutes
+        else:
+            bus_minutes = estimate_bus_minutes(
+                seg["distance_km"],
+                seg["stops_count"]
+            )
         total_bus_minutes += bus_minutes
 
-        instructions.append({
+        instruction = {
             "type": "bus",
             "bus": seg["bus"],
             "isEje": seg["isEje"],
@@ -122,7 +368,10 @@ def instrucciones():
             "stops_count": seg["stops_count"],
             "distance_km": round(seg["distance_km"], ROUND_DECIMALS),
             "minutes": round(bus_minutes, 2)
-        })
+        }
+        if timed:
+            instruction["wait_minutes"] = round(wait_minutes, 2)
+        instructions.append(instruction)
 
     # =========================
     # 🚶‍♂️ CAMINATA FINAL
@@ -140,81 +389,287 @@ def instrucciones():
     # =========================
     # RESUMEN DE TIEMPOS
     # =========================
-    total_minutes = walk_start_minutes + total_bus_minutes + walk_end_minutes
+    walk_minutes = walk_start_minutes + walk_end_minutes + transfer_minutes
+    total_minutes = walk_start_minutes + total_bus_minutes + walk_end_minutes + transfer_minutes + total_wait_minutes
+
+    summary = {
+        "num_buses": len(bus_segments),
+        "eje_buses": sum(1 for s in bus_segments if s["isEje"]),
+        "non_eje_buses": sum(1 for s in bus_segments if not s["isEje"]),
+        "walk_km": round(start_walk + transfer_walk + end_walk, ROUND_DECIMALS),
+        "bus_km": round(sum(s["distance_km"] for s in bus_segments), ROUND_DECIMALS),
+        "walk_minutes": round(walk_minutes, 2),
+        "bus_minutes": round(total_bus_minutes, 2),
+        "total_minutes": round(total_minutes, 2)
+    }
+    if timed:
+        summary["wait_minutes"] = round(total_wait_minutes, 2)
+        summary["departure"] = format_clock(departure)
+        summary["arrival"] = format_clock(departure + total_minutes)
+
+    return {
+        "ok": True,
+        "isAprox": not exact,
+        "instructions": instructions,
+        "summary": summary
+    }
+
+
+# =========================
+# ALCANCE (ISÓCRONA)
+# =========================
+@api_v1.route("/alcance")
+def alcance():
+    origen = request.args.get("origen")
+    minutos = request.args.get("minutos", type=float)
+
+    if not origen or minutos is None:
+        return jsonify({"ok": False, "message": "Parámetros requeridos"}), 400
+
+    try:
+        lat, lon = parse_point(origen)
+    except ValueError:
+        return jsonify({"ok": False, "message": "Formato inválido"}), 400
+
+    if not 0 < minutos <= REACH_MAX_MINUTES:
+        return jsonify({"ok": False, "message": f"minutos debe estar entre 0 y {REACH_MAX_MINUTES}"}), 400
+    max_buses = request.args.get("max_buses", default=REACH_DEFAULT_BUSES, type=int)
+    if max_buses is None or not 0 <= max_buses <= REACH_MAX_BUSES:
+        return jsonify({"ok": False, "message": f"max_buses debe estar entre 0 y {REACH_MAX_BUSES}"}), 400
+    try:
+        radio = parse_radius(request.args.get("radio"))
+    except ValueError:
+        return jsonify({"ok": False, "message": "Radio inválido"}), 400
+    try:
+        salida = parse_departure(request.args.get("salida"))
+    except ValueError:
+        return jsonify({"ok": False, "message": "Hora de salida inválida (HH:MM)"}), 400
+
+    with metrics.phase("busqueda"):
+        reached = reachable_stops(current_network(), lat, lon, minutos, max_buses, radio, salida)
+
+    if request.args.get("formato") == "geojson":
+        return jsonify({
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [stop["longitud"], stop["latitud"]]},
+                    "properties": {
+                        "id": stop["id"],
+                        "nombre": stop["nombre"],
+                        "minutes": round(minutes, 2),
+                        "buses": bus_c,
+                        "bus": bus,
+                    },
+                }
+                for stop, minutes, bus_c, bus in reached
+            ],
+        })
 
     return jsonify({
         "ok": True,
-        "isAprox": False,
-        "instructions": instructions,
-        "summary": {
-            "num_buses": len(bus_segments),
-            "eje_buses": sum(1 for s in bus_segments if s["isEje"]),
-            "non_eje_buses": sum(1 for s in bus_segments if not s["isEje"]),
-            "walk_km": round(start_walk + end_walk, ROUND_DECIMALS),
-            "bus_km": round(sum(s["distance_km"] for s in bus_segments), ROUND_DECIMALS),
-            "walk_minutes": round(walk_start_minutes + walk_end_minutes, 2),
-            "bus_minutes": round(total_bus_minutes, 2),
-            "total_minutes": round(total_minutes, 2)
-        }
+        "count": len(reached),
+        "body": [
+            {"stop": stop, "minutes": round(minutes, 2), "buses": bus_c, "bus": bus}
+            for stop, minutes, bus_c, bus in reached
+        ],
     })
 
-@api_v1.route("/rutas")
-def get_rutas():
-    rutas_response = []
 
-    for ruta in routes_data:
-        paradas_full = []
+# =========================
+# INSTRUCCIONES EN LOTE (NDJSON)
+# =========================
+@api_v1.route("/instrucciones/batch", methods=["POST"])
+def instrucciones_batch():
+    data = request.get_json(silent=True)
+    if isinstance(data, list):
+        data = {"viajes": data}
+    if not isinstance(data, dict) or not isinstance(data.get("viajes"), list):
+        return jsonify({"ok": False, "message": "Se espera {\"viajes\": [...]}"}), 400
 
-        for stop_id in ruta.get("paradas", []):
-            stop = stops_by_id.get(int(stop_id))
-            if stop:
-                paradas_full.append(stop)
+    viajes = data["viajes"]
+    if len(viajes) > BATCH_MAX_TRIPS:
+        return jsonify({"ok": False, "message": f"Máximo {BATCH_MAX_TRIPS} viajes por lote"}), 400
+
+    try:
+        radio = parse_radius(data.get("radio"))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "message": "Radio inválido"}), 400
+    motor = data.get("motor")
+    if motor is not None and motor not in ROUTING_ENGINES:
+        return jsonify({"ok": False, "message": "Motor inválido"}), 400
+    try:
+        salida = parse_departure(data.get("salida"))
+    except ValueError:
+        return jsonify({"ok": False, "message": "Hora de salida inválida (HH:MM)"}), 400
+    if salida is not None and motor is not None and motor not in TIMED_ENGINES:
+        return jsonify({"ok": False, "message": "Con salida solo se admite motor=dijkstra"}), 400
+    ajustar = is_truthy(data.get("ajustar", ""))
+    compacto = data.get("formato") == "compacto"
+    try:
+        campos = parse_fields(data.get("campos"))
+    except (TypeError, ValueError) as e:
+        return jsonify({"ok": False, "message": f"Campos inválidos: {e}"}), 400
+    net = current_network()
+
+    def generate():
+        for offset in range(0, len(viajes), BATCH_CHUNK):
+            chunk = viajes[offset:offset + BATCH_CHUNK]
+            for line in _solve_batch_chunk(net, chunk, offset, radio, motor, ajustar, salida):
+                if not compacto:
+                    yield current_app.json.dumps(line) + "\n"
+                elif "instructions" in line:
+                    # cada línea con su propia tabla de paradas
+                    yield dumps(compact_trip(line, campos)) + b"\n"
+                else:
+                    yield dumps(line) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def _solve_batch_chunk(net, viajes, offset, radio, motor, ajustar, salida):
+    trips = []
+    pending = {}
+
+    points = {}
+    for i, viaje in enumerate(viajes, start=offset):
+        try:
+            points[i] = (*parse_point(viaje["inicio"]), *parse_point(viaje["destino"]))
+        except (TypeError, KeyError, ValueError):
+            continue
+
+    # paradas candidatas de todo el bloque de una vez (kernel vectorizado)
+    candidates = dict(zip(points, batch_stop_candidates(net, list(points.values()), radio, snap=ajustar)))
+
+    for i in range(offset, offset + len(viajes)):
+        if i not in points:
+            trips.append((i, None, {"ok": False, "status": 400, "message": "Formato inválido"}))
+            continue
+
+        i_lat, i_lon, d_lat, d_lon = points[i]
+        origins, targets = candidates[i]
+        if not origins or not targets:
+            trips.append((i, None, {"ok": False, "status": 404, "message": "No se encontraron paradas"}))
+            continue
+
+        # pares de paradas repetidos se resuelven una sola vez
+        key = route_cache_key(net, origins, targets, motor, salida)
+        if key not in pending:
+            pending[key] = route_cache.get(key)
+        trips.append((i, key, (i_lat, i_lon, d_lat, d_lon)))
+
+    missing = [key for key, result in pending.items() if result is None]
+    solved = solve_routes(net, [key[1:] for key in missing])
+    for key, (path_states, exact) in zip(missing, solved):
+        pending[key] = store_bus_segments(net, key, path_states, exact)
+
+    for i, key, trip in trips:
+        if key is None:
+            yield {"index": i, **trip}
+            continue
+        bus_segments, exact = pending[key]
+        if not bus_segments:
+            yield {"index": i, "ok": False, "status": 404, "message": "No hay ruta"}
+            continue
+        yield {"index": i, **build_trip(*trip, bus_segments, exact, net, salida)}
+
+
+@api_v1.route("/cache")
+def get_cache_stats():
+    return jsonify({
+        "ok": True,
+        "body": {"version": current_network().version, "rutas": route_cache.stats()}
+    })
 
-        rutas_response.append({
-            "nombre": ruta.get("nombre"),
-            "paradas": paradas_full
-        })
 
+@api_v1.route("/metrics")
+def get_metrics():
+    net = current_network()
+    cache = route_cache.stats()
+    gauges = [
+        ("movikoox_network_info", "Versión de la red cargada.", {"version": net.version, "origen": net.source}, 1),
+        ("movikoox_network_stops", "Paradas de la red.", {}, len(net.stops_data)),
+        ("movikoox_network_routes", "Rutas de la red.", {}, len(net.routes_data)),
+        ("movikoox_route_cache_size", "Entradas en el cache de tramos.", {}, cache["size"]),
+        ("movikoox_route_cache_hits", "Aciertos del cache de tramos.", {}, cache["hits"]),
+        ("movikoox_route_cache_misses", "Fallos del cache de tramos.", {}, cache["misses"]),
+        *metrics.extra_gauges(),
+    ]
+    return Response(metrics.registry.render(gauges), mimetype="text/plain; version=0.0.4")
+
+
+def is_admin():
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+@api_v1.route("/admin/lentas")
+def admin_lentas():
+    """Últimas peticiones lentas con sus pilas muestreadas (MOVIKOOX_SLOW_MS)."""
+    if not is_admin():
+        return jsonify({"ok": False, "message": "No autorizado"}), 403
     return jsonify({
         "ok": True,
-        "body": rutas_response
+        "enabled": metrics.profiler.enabled,
+        "body": list(metrics.profiler.recent)
     })
 
 
-@api_v1.route("/paradas/bus/<name>")
-def get_paradas_by_bus(name):
+# =========================
+# RECARGA DE LA RED
+# =========================
+@api_v1.route("/admin/recargar", methods=["POST"])
+def admin_recargar():
+    if not is_admin():
+        return jsonify({"ok": False, "message": "No autorizado"}), 403
 
-    def normalize(text: str) -> str:
-        text = text.lower()
-        text = unicodedata.normalize("NFD", text)
-        text = "".join(
-            c for c in text
-            if unicodedata.category(c) != "Mn"
-        )
-        text = re.sub(r"[^a-z0-9]", "", text)
-        return text
+    try:
+        net, swapped = reload_network(force=is_truthy(request.args.get("forzar", "")))
+    except Exception as e:
+        return jsonify({"ok": False, "message": f"No se pudo recargar: {e}"}), 500
+
+    return jsonify({
+        "ok": True,
+        "body": {
+            "version": net.version,
+            "recargada": swapped,
+            "origen": net.source,
+            "paradas": len(net.stops_data),
+            "rutas": len(net.routes_data)
+        }
+    })
 
-    def extract_number(text: str):
-        match = re.search(r"(\d+)", text)
-        return int(match.group(1)) if match else None
 
-    query_norm = normalize(name)
-    query_number = extract_number(name)
+@api_v1.route("/rutas")
+def get_rutas():
+    geometria = request.args.get("geometria")
+    if geometria is None:
+        return prepared_response(current_network().rutas_response)
+    if geometria != "polyline":
+        return jsonify({"ok": False, "message": "geometria debe ser polyline"}), 400
+    try:
+        zoom = parse_zoom(request.args.get("zoom"))
+    except ValueError:
+        return jsonify({"ok": False, "message": f"zoom debe estar entre 0 y {TILE_MAX_ZOOM}"}), 400
+    return prepared_response(current_network().route_geometry.catalog(zoom))
 
-    paradas = []
 
-    for stop in stops_data:
-        for ruta in stop.get("rutas", []):
-            ruta_norm = normalize(ruta)
-            ruta_number = extract_number(ruta)
+@api_v1.route("/rutas/<nombre>/geometria")
+def get_ruta_geometria(nombre):
+    try:
+        zoom = parse_zoom(request.args.get("zoom"))
+    except ValueError:
+        return jsonify({"ok": False, "message": f"zoom debe estar entre 0 y {TILE_MAX_ZOOM}"}), 400
+    prepared = current_network().route_geometry.route(nombre, zoom)
+    if prepared is None:
+        return jsonify({"ok": False, "message": "Ruta no encontrada"}), 404
+    return prepared_response(prepared)
 
-            if query_number is not None and ruta_number == query_number:
-                paradas.append(stop)
-                break
 
-            if query_norm in ruta_norm:
-                paradas.append(stop)
-                break
+@api_v1.route("/paradas/bus/<name>")
+def get_paradas_by_bus(name):
+    paradas = current_network().route_name_index.stops(name)
 
     if not paradas:
         return jsonify({
@@ -225,4 +680,4 @@ def get_paradas_by_bus(name):
     return jsonify({
         "ok": True,
         "body": paradas
-    })
\ No newline at end of file
+    })
@@ -0,0 +1,142 @@
+import math
+
+from .catalog import PreparedResponse
+from .helpers import normalize_compact
+from .tiles import world_pixel
+
+
+# ---------------------------------------------------
+# GEOMETRÍA DE RUTAS (polyline codificada)
+# Cada ruta como una polyline de Google (precisión 1e-5) de las
+# coordenadas de sus paradas en orden. Además de la completa, una
+# simplificada por cada zoom de `zooms` con Douglas-Peucker: se quitan
+# los puntos que se desvían menos de tolerance_px píxeles de pantalla a
+# ese zoom; "paradas" lleva solo los ids de los puntos que quedan, en el
+# mismo orden que la polyline. Nada se arma al cargar la red: cada nivel
+# (del catálogo o de una ruta) se arma la primera vez que se pide y se
+# guarda ya serializado (PreparedResponse: ETag + gzip / br).
+# Un zoom pedido usa el nivel más fino que lo cubre: el menor de `zooms`
+# que sea >= zoom; arriba del último, la completa.
+# ---------------------------------------------------
+def encode_polyline(points, precision=5):
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lon = 0
+    for lat, lon in points:
+        ilat = math.floor(lat * factor + 0.5)
+        ilon = math.floor(lon * factor + 0.5)
+        for delta in (ilat - prev_lat, ilon - prev_lon):
+            v = ~(delta << 1) if delta < 0 else delta << 1
+            while v >= 0x20:
+                out.append(chr((0x20 | (v & 0x1F)) + 63))
+                v >>= 5
+            out.append(chr(v + 63))
+        prev_lat, prev_lon = ilat, ilon
+    return "".join(out)
+
+
+def douglas_peucker(xs, ys, tolerance):
+    """Índices de los puntos que quedan (siempre el primero y el último), en orden."""
+    n = len(xs)
+    if n <= 2:
+        return list(range(n))
+    keep = [False] * n
+    keep[0] = keep[n - 1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        ax, ay = xs[a], ys[a]
+        dx, dy = xs[b] - ax, ys[b] - ay
+        length = math.hypot(dx, dy)
+        far, far_d = -1, tolerance
+        for i in range(a + 1, b):
+            if length == 0:
+                # tramo cerrado (la ruta regresa al mismo punto): distancia al punto
+                d = math.hypot(xs[i] - ax, ys[i] - ay)
+            else:
+                d = abs(dx * (ys[i] - ay) - dy * (xs[i] - ax)) / length
+            if d > far_d:
+                far, far_d = i, d
+        if far >= 0:
+            keep[far] = True
+            stack.append((a, far))
+            stack.append((far, b))
+    return [i for i in range(n) if keep[i]]
+
+
+class RouteGeometry:
+
+    def __init__(self, routes_data, stops_data, zooms, tolerance_px):
+        self.routes_data = routes_data
+        self.stops_data = stops_data
+        self.zooms = tuple(sorted(zooms))
+        self.tolerance_px = tolerance_px
+        self._lines = None
+        self._by_name = None
+        # dos peticiones a la vez pueden armar el mismo nivel: da lo mismo
+        self.catalogs = {}
+        self.routes = {}
+
+    def lines(self):
+        """[(nombre, ids, puntos, xs, ys)] por ruta; xs / ys en píxeles del mundo a zoom 0."""
+        if self._lines is None:
+            stops_by_id = {int(s["id"]): s for s in self.stops_data}
+            lines = []
+            for ruta in self.routes_data:
+                ids = []
+                points = []
+                for stop_id in ruta.get("paradas", []):
+                    stop = stops_by_id.get(int(stop_id))
+                    if stop:
+                        ids.append(int(stop_id))
+                        points.append((float(stop["latitud"]), float(stop["longitud"])))
+                pixels = [world_pixel(lat, lon, 0) for lat, lon in points]
+                lines.append((ruta.get("nombre"), ids, points, [p[0] for p in pixels], [p[1] for p in pixels]))
+            self._lines = lines
+        return self._lines
+
+    def level(self, zoom):
+        if zoom is None:
+            return None
+        for z in self.zooms:
+            if zoom <= z:
+                return z
+        return None
+
+    def _body(self, line, level):
+        nombre, ids, points, xs, ys = line
+        if level is None:
+            kept = range(len(points))
+        else:
+            # la tolerancia a zoom z es tolerance_px / 2**z en píxeles a zoom 0
+            kept = douglas_peucker(xs, ys, self.tolerance_px / (1 << level))
+        return {
+            "nombre": nombre,
+            "paradas": [ids[i] for i in kept],
+            "polyline": encode_polyline([points[i] for i in kept]),
+        }
+
+    def catalog(self, zoom=None):
+        level = self.level(zoom)
+        prepared = self.catalogs.get(level)
+        if prepared is None:
+            body = [self._body(line, level) for line in self.lines()]
+            prepared = self.catalogs[level] = PreparedResponse({"ok": True, "body": body})
+        return prepared
+
+    def route(self, nombre, zoom=None):
+        """PreparedResponse de una ruta (nombre sin importar acentos, espacios ni mayúsculas) o None."""
+        if self._by_name is None:
+            by_name = {}
+            for k, line in enumerate(self.lines()):
+                by_name.setdefault(normalize_compact(line[0] or ""), k)
+            self._by_name = by_name
+        k = self._by_name.get(normalize_compact(nombre))
+        if k is None:
+            return None
+        key = (k, self.level(zoom))
+        prepared = self.routes.get(key)
+        if prepared is None:
+            body = self._body(self.lines()[k], key[1])
+            prepared = self.routes[key] = PreparedResponse({"ok": True, "body": body})
+        return prepared
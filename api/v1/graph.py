@@ -0,0 +1,175 @@
+from .helpers import is_eje_route, calculate_distance
+from .spatial import SpatialIndex
+
+
+# ---------------------------------------------------
+# GRAFO COMPILADO
+# Paradas y rutas con índices enteros densos.
+# Adyacencia en formato CSR (arreglos planos):
+#   vecinos de la parada i -> posiciones adj_ptr[i] .. adj_ptr[i + 1]
+#   adj_stop / adj_route / adj_dist en esas posiciones
+# Estado de búsqueda = stop_idx * num_routes + route_idx
+#
+# Recorridos (patterns): secuencias de paradas de cada ruta, para los
+# motores que escanean rutas completas (RAPTOR):
+#   paradas del recorrido p -> pattern_stops[pattern_ptr[p] .. pattern_ptr[p + 1]]
+#   pattern_step[k] = distancia desde la parada anterior del recorrido
+#
+# Transbordos caminando (footpaths) entre paradas cercanas, también CSR:
+#   transfer_ptr[i] .. transfer_ptr[i + 1] -> transfer_stop / transfer_km / transfer_min
+#   como mucho max_transfers por parada (las más cercanas dentro del radio)
+# ---------------------------------------------------
+class CompiledGraph:
+    __slots__ = (
+        "stop_ids", "stop_index", "lat", "lon",
+        "route_names", "route_index", "route_is_eje",
+        "adj_ptr", "adj_stop", "adj_route", "adj_dist",
+        "stop_routes_ptr", "stop_routes",
+        "pattern_ptr", "pattern_stops", "pattern_step", "pattern_route",
+        "route_patterns_ptr", "route_patterns",
+        "transfer_ptr", "transfer_stop", "transfer_km", "transfer_min",
+        "num_stops", "num_routes",
+    )
+
+    def neighbors(self, stop_idx):
+        lo = self.adj_ptr[stop_idx]
+        hi = self.adj_ptr[stop_idx + 1]
+        return zip(self.adj_stop[lo:hi], self.adj_route[lo:hi], self.adj_dist[lo:hi])
+
+    def routes_at(self, stop_idx):
+        return self.stop_routes[self.stop_routes_ptr[stop_idx]:self.stop_routes_ptr[stop_idx + 1]]
+
+    def board_route(self, stop_idx):
+        """Ruta para subir en una parada sin viajar (origen = destino): ejes primero."""
+        routes = self.routes_at(stop_idx)
+        if not routes:
+            return None
+        return min(routes, key=lambda r: (not self.route_is_eje[r], r))
+
+    def transfers(self, stop_idx):
+        lo = self.transfer_ptr[stop_idx]
+        hi = self.transfer_ptr[stop_idx + 1]
+        return zip(self.transfer_stop[lo:hi], self.transfer_km[lo:hi], self.transfer_min[lo:hi])
+
+    def patterns_of(self, route_idx):
+        return self.route_patterns[self.route_patterns_ptr[route_idx]:self.route_patterns_ptr[route_idx + 1]]
+
+    def distance_km(self, a_idx, b_idx):
+        return calculate_distance(
+            self.lat[a_idx], self.lon[a_idx],
+            self.lat[b_idx], self.lon[b_idx]
+        )
+
+
+def compile_graph(stops_data, routes_data, transfer_km=0.0, max_transfers=0, walk_kmh=1.0):
+    g = CompiledGraph()
+
+    g.stop_ids = [int(s["id"]) for s in stops_data]
+    g.stop_index = {sid: i for i, sid in enumerate(g.stop_ids)}
+    g.lat = [float(s["latitud"]) for s in stops_data]
+    g.lon = [float(s["longitud"]) for s in stops_data]
+
+    g.route_names = []
+    g.route_index = {}
+    for ruta in routes_data:
+        name = ruta.get("nombre", "")
+        if name not in g.route_index:
+            g.route_index[name] = len(g.route_names)
+            g.route_names.append(name)
+    g.route_is_eje = [is_eje_route(name) for name in g.route_names]
+
+    g.num_stops = len(g.stop_ids)
+    g.num_routes = len(g.route_names)
+
+    # aristas sin duplicados: (a, b, ruta)
+    adjacency = [dict() for _ in range(g.num_stops)]
+    routes_per_stop = [set() for _ in range(g.num_stops)]
+    patterns = []
+
+    for ruta in routes_data:
+        r = g.route_index[ruta.get("nombre", "")]
+        seq = [g.stop_index.get(int(x)) for x in ruta.get("paradas", [])]
+
+        for i in seq:
+            if i is not None:
+                routes_per_stop[i].add(r)
+
+        for a, b in zip(seq, seq[1:]):
+            if a is None or b is None or a == b:
+                continue
+            d = g.distance_km(a, b)
+            adjacency[a].setdefault((b, r), d)
+            adjacency[b].setdefault((a, r), d)
+
+        # tramos continuos de paradas conocidas, sin repeticiones consecutivas
+        run = []
+        for i in seq + [None]:
+            if i is None:
+                if len(run) > 1:
+                    patterns.append((r, run))
+                run = []
+            elif not run or run[-1] != i:
+                run.append(i)
+
+    g.adj_ptr = [0]
+    g.adj_stop = []
+    g.adj_route = []
+    g.adj_dist = []
+    for edges in adjacency:
+        for (b, r), d in edges.items():
+            g.adj_stop.append(b)
+            g.adj_route.append(r)
+            g.adj_dist.append(d)
+        g.adj_ptr.append(len(g.adj_stop))
+
+    g.stop_routes_ptr = [0]
+    g.stop_routes = []
+    for routes in routes_per_stop:
+        g.stop_routes.extend(sorted(routes))
+        g.stop_routes_ptr.append(len(g.stop_routes))
+
+    g.pattern_ptr = [0]
+    g.pattern_stops = []
+    g.pattern_step = []
+    g.pattern_route = []
+    patterns_per_route = [[] for _ in range(g.num_routes)]
+    for p, (r, run) in enumerate(patterns):
+        g.pattern_route.append(r)
+        patterns_per_route[r].append(p)
+        prev = None
+        for i in run:
+            g.pattern_stops.append(i)
+            g.pattern_step.append(0.0 if prev is None else g.distance_km(prev, i))
+            prev = i
+        g.pattern_ptr.append(len(g.pattern_stops))
+
+    g.route_patterns_ptr = [0]
+    g.route_patterns = []
+    for ps in patterns_per_route:
+        g.route_patterns.extend(ps)
+        g.route_patterns_ptr.append(len(g.route_patterns))
+
+    compile_transfers(g, transfer_km, max_transfers, walk_kmh)
+    return g
+
+
+def compile_transfers(g, max_km, max_per_stop, walk_kmh):
+    """
+    Footpaths hacia las max_per_stop paradas más cercanas a menos de max_km.
+    Con el índice espacial cada parada solo revisa las celdas de su radio,
+    así que el costo crece con el número de paradas, no con su cuadrado.
+    """
+    g.transfer_ptr = [0]
+    g.transfer_stop = []
+    g.transfer_km = []
+    g.transfer_min = []
+
+    index = SpatialIndex(g.lat, g.lon) if max_km > 0 and max_per_stop > 0 else None
+    for i in range(g.num_stops):
+        if index is not None:
+            near = [(j, d) for j, d in index.within_radius(g.lat[i], g.lon[i], max_km) if j != i]
+            for j, d in near[:max_per_stop]:
+                g.transfer_stop.append(j)
+                g.transfer_km.append(d)
+                g.transfer_min.append(d / walk_kmh * 60.0)
+        g.transfer_ptr.append(len(g.transfer_stop))
@@ -0,0 +1,50 @@
+import math
+import unicodedata
+import re
+
+
+# ---------------------------------------------------
+# NORMALIZACIÓN
+# ---------------------------------------------------
+def normalize_text(text: str) -> str:
+    text = (text or "").lower()
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+def normalize_compact(text: str) -> str:
+    # igual que normalize_text pero solo [a-z0-9]: "Ko'ox 15" -> "koox15"
+    text = text.lower()
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    text = re.sub(r"[^a-z0-9]", "", text)
+    return text
+
+
+def extract_number(text: str):
+    match = re.search(r"(\d+)", text)
+    return int(match.group(1)) if match else None
+
+
+def is_eje_route(route_name: str) -> bool:
+    t = normalize_text(route_name)
+    return ("troncal" in t) or ("eje" in t)
+
+
+# ---------------------------------------------------
+# DISTANCIA (KM)
+# ---------------------------------------------------
+def calculate_distance(lat1, lon1, lat2, lon2):
+    R = 6371.0
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dlat / 2) ** 2 +
+        math.cos(math.radians(lat1)) *
+        math.cos(math.radians(lat2)) *
+        math.sin(dlon / 2) ** 2
+    )
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
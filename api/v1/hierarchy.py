@@ -0,0 +1,153 @@
+INF = float("inf")
+
+
+# ---------------------------------------------------
+# RUTEO JERÁRQUICO (motor "rutas")
+# Dos niveles, con lo que RouteGraph calcula la primera vez (prepare_levels):
+#   1. nivel de rutas: con la tabla de saltos (BFS en el grafo de rutas)
+#      sale el mínimo de camiones L entre las rutas de las paradas de
+#      origen y las de destino, y las rutas que están en alguna cadena
+#      de L camiones (capa k: a k - 1 saltos del origen y L - k del destino)
+#   2. nivel de paradas: solo esas rutas, capa por capa; en cada una se
+#      sube en la mejor parada (origen o transbordo precalculado del par
+#      de rutas) y se viaja con los minutos ya calculados por ruta
+# costo = (camiones, camiones que no son eje, minutos), como route_multi_stop.
+# Las cadenas de L camiones son cotas exactas (una cadena más corta no
+# existe), así que el resultado tiene el mismo costo que Dijkstra.
+# Si hacen falta más de max_buses camiones, o la cadena no se puede
+# recorrer a nivel de paradas, devuelve None y se usa la búsqueda normal.
+# ---------------------------------------------------
+def hierarchical_search(g, route_graph, seeds, egress, max_buses):
+    """
+    seeds / egress: {stop_idx: minutos a pie}
+    Devuelve la lista de estados del camino (como la búsqueda normal) o None.
+    """
+    route_graph.prepare_levels()
+    R = g.num_routes
+    foot_base = g.num_stops * R
+    is_eje = g.route_is_eje
+    edge_routes, hops = route_graph.edge_routes, route_graph.hops
+
+    # parada que también es destino: subir y bajar ahí (1 camión, 0 paradas)
+    best = None
+    for i, walk_min in seeds.items():
+        r = g.board_route(i)
+        if i in egress and r is not None:
+            cand = ((1, 0 if is_eje[r] else 1, walk_min + egress[i]), [foot_base + i])
+            if best is None or cand[0] < best[0]:
+                best = cand
+
+    origin_routes = sorted({r for i in seeds for r in edge_routes[i]})
+    target_routes = sorted({r for i in egress for r in edge_routes[i]})
+    if not origin_routes or not target_routes:
+        return best[1] if best else None
+
+    from_origin = [min(hops[o][r] for o in origin_routes) for r in range(R)]
+    to_target = [min(hops[r][t] for t in target_routes) for r in range(R)]
+    buses = 1 + min(to_target[o] for o in origin_routes)
+    if buses > 1 and best is not None:
+        return best[1]
+    if buses > max_buses:
+        return None
+
+    layers = [
+        [r for r in range(R) if from_origin[r] == k and to_target[r] == buses - 1 - k]
+        for k in range(buses)
+    ]
+
+    # capa por capa: {ruta: (abordajes, mejor llegada por parada local, abordaje usado)}
+    done = []
+    for k, routes in enumerate(layers):
+        current = {}
+        for r in routes:
+            pos = route_graph.route_pos[r]
+            non_eje = 0 if is_eje[r] else 1
+            boards = {}
+            if k == 0:
+                for i, walk_min in seeds.items():
+                    q = pos.get(i)
+                    if q is not None:
+                        _offer(boards, q, (non_eje, walk_min), i)
+            else:
+                for prev_r, (_, arrive, _) in done[-1].items():
+                    pairs = route_graph.transfer_stops.get((prev_r, r))
+                    if pairs is None:
+                        continue
+                    prev_pos = route_graph.route_pos[prev_r]
+                    for p, q, walk_min in zip(*pairs):
+                        a = arrive[prev_pos[p]]
+                        if a is not None:
+                            _offer(boards, pos[q], (a[0] + non_eje, a[1] + walk_min), (prev_r, p, q))
+            if boards:
+                current[r] = (boards, *_ride(route_graph, r, boards))
+        done.append(current)
+
+    # bajar en una parada de destino de la última capa
+    found = None
+    for r, (_, arrive, _) in done[-1].items():
+        pos = route_graph.route_pos[r]
+        for t, walk_min in egress.items():
+            x = pos.get(t)
+            if x is None or arrive[x] is None:
+                continue
+            cost = (buses, arrive[x][0], arrive[x][1] + walk_min)
+            if found is None or cost < found[0]:
+                found = (cost, r, t)
+
+    if found is None:
+        return best[1] if best else None
+    if best is not None and best[0] <= found[0]:
+        return best[1]
+    return _states(g, route_graph, done, found[1], found[2])
+
+
+def _offer(boards, q, cost, info):
+    old = boards.get(q)
+    if old is None or cost < old[0]:
+        boards[q] = (cost, info)
+
+
+def _ride(route_graph, r, boards):
+    """Mejor llegada a cada parada local de r, sin bajarse desde su abordaje."""
+    n = len(route_graph.route_stops[r])
+    ride = route_graph.ride[r]
+    arrive = [None] * n
+    used = [-1] * n
+    for q, ((non_eje, minutes), _) in boards.items():
+        base = q * n
+        for x in range(n):
+            m = ride[base + x]
+            if x == q or m == INF:
+                continue
+            cost = (non_eje, minutes + m)
+            a = arrive[x]
+            if a is None or cost < a:
+                arrive[x] = cost
+                used[x] = q
+    return arrive, used
+
+
+def _states(g, route_graph, done, r, stop):
+    R = g.num_routes
+    foot_base = g.num_stops * R
+    legs = []
+    for layer in reversed(done):
+        boards, _, used = layer[r]
+        pos = route_graph.route_pos[r]
+        q = used[pos[stop]]
+        board_stop = route_graph.route_stops[r][q]
+        legs.append([y * R + r for y in route_graph.ride_path(r, board_stop, stop)])
+
+        info = boards[q][1]
+        if not isinstance(info, tuple):
+            legs.append([foot_base + info])
+            break
+        r, stop, q_stop = info
+        if stop != q_stop:
+            # transbordo a pie entre las dos paradas
+            legs.append([foot_base + q_stop])
+
+    states = []
+    for leg in reversed(legs):
+        states.extend(leg)
+    return states
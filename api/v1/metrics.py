@@ -0,0 +1,336 @@
+import contextvars
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from .data import LATENCY_BUCKETS_S, SLOW_REQUEST_MS, PROFILER_INTERVAL_MS, SLOW_PROFILES_KEPT
+
+
+# ---------------------------------------------------
+# MEDICIÓN POR PETICIÓN
+# Cada petición del API lleva un RequestTimer en un contextvar:
+#   phase("busqueda")  suma la duración de un bloque a esa fase
+#   count(pops=...)    suma contadores de la búsqueda
+# Fuera de una petición (scripts, procesos del lote) no hacen nada.
+# Al terminar, las fases van al encabezado Server-Timing y a los
+# histogramas de /metrics (formato de texto de Prometheus).
+# Costo: dos perf_counter por fase y un lock por petición.
+# ---------------------------------------------------
+_current = contextvars.ContextVar("movikoox_request", default=None)
+
+
+class RequestTimer:
+
+    __slots__ = ("endpoint", "start", "phases", "counters", "samples", "thread_id", "token")
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self.samples = None
+        self.thread_id = threading.get_ident()
+        self.token = None
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self, total):
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.phases.items()]
+        if self.counters:
+            desc = " ".join(f"{k}={v}" for k, v in self.counters.items())
+            parts.append(f'estados;desc="{desc}"')
+        parts.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(parts)
+
+
+class _Phase:
+
+    __slots__ = ("timer", "name", "t0")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        if self.timer is not None:
+            self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.timer is not None:
+            self.timer.add(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+def phase(name):
+    return _Phase(_current.get(), name)
+
+
+def count(**values):
+    timer = _current.get()
+    if timer is None:
+        return
+    counters = timer.counters
+    for k, v in values.items():
+        counters[k] = counters.get(k, 0) + v
+
+
+@contextmanager
+def counting():
+    """Contadores de búsqueda fuera de una petición (scripts): el dict se llena dentro del bloque."""
+    timer = RequestTimer("script")
+    token = _current.set(timer)
+    try:
+        yield timer.counters
+    finally:
+        _current.reset(token)
+
+
+def start_request(endpoint):
+    timer = RequestTimer(endpoint)
+    timer.token = _current.set(timer)
+    profiler.watch(timer)
+    return timer
+
+
+def finish_request(status):
+    """Cierra la medición de la petición actual; (timer, segundos) o (None, 0)."""
+    timer = _current.get()
+    if timer is None:
+        return None, 0.0
+    total = time.perf_counter() - timer.start
+    _release(timer)
+    registry.observe(timer.endpoint, status, total, timer.phases, timer.counters)
+    profiler.check(timer, total)
+    return timer, total
+
+
+def abandon_request():
+    """Sin respuesta (excepción): solo se suelta el contexto."""
+    timer = _current.get()
+    if timer is not None:
+        _release(timer)
+
+
+def _release(timer):
+    profiler.unwatch(timer)
+    try:
+        _current.reset(timer.token)
+    except ValueError:
+        # otro contexto (p. ej. un generador en streaming)
+        _current.set(None)
+
+
+# ---------------------------------------------------
+# REGISTRO PROMETHEUS
+# Histogramas sin dependencias: conteos por cubeta (no acumulados) que
+# se acumulan al exportar.
+# ---------------------------------------------------
+class _Histogram:
+
+    __slots__ = ("buckets", "series")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        s = self.series.get(labels)
+        if s is None:
+            s = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        counts = s[0]
+        for i, le in enumerate(self.buckets):
+            if value <= le:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        s[1] += value
+
+    def render(self, name, label_names, out):
+        for labels, (counts, total) in sorted(self.series.items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(label_names, labels))
+            acc = 0
+            for le, c in zip(self.buckets, counts):
+                acc += c
+                out.append(f'{name}_bucket{{{base},le="{le}"}} {acc}')
+            acc += counts[-1]
+            out.append(f'{name}_bucket{{{base},le="+Inf"}} {acc}')
+            out.append(f"{name}_sum{{{base}}} {total:.6f}")
+            out.append(f"{name}_count{{{base}}} {acc}")
+
+
+# ayuda de los contadores de count() en /metrics (movikoox_search_<nombre>_total)
+SEARCH_COUNTERS_HELP = {
+    "pops": "Estados extraídos del heap en las búsquedas.",
+    "pushes": "Estados agregados al heap en las búsquedas.",
+    "expanded": "Estados expandidos (vecinos recorridos) en las búsquedas.",
+}
+
+
+class MetricsRegistry:
+
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.requests = _Histogram(buckets)
+        self.phases = _Histogram(buckets)
+        self.statuses = {}
+        self.counters = {}
+
+    def observe(self, endpoint, status, total, phases, counters):
+        with self._lock:
+            self.requests.observe((endpoint,), total)
+            for name, seconds in phases.items():
+                self.phases.observe((endpoint, name), seconds)
+            key = (endpoint, str(status))
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def render(self, gauges=()):
+        """Texto de Prometheus; gauges: [(nombre, ayuda, {etiquetas}, valor)]."""
+        out = []
+        with self._lock:
+            out.append("# HELP movikoox_request_duration_seconds Latencia por endpoint.")
+            out.append("# TYPE movikoox_request_duration_seconds histogram")
+            self.requests.render("movikoox_request_duration_seconds", ("endpoint",), out)
+
+            out.append("# HELP movikoox_phase_duration_seconds Latencia por fase de la petición.")
+            out.append("# TYPE movikoox_phase_duration_seconds histogram")
+            self.phases.render("movikoox_phase_duration_seconds", ("endpoint", "phase"), out)
+
+            out.append("# HELP movikoox_requests_total Peticiones por endpoint y estado HTTP.")
+            out.append("# TYPE movikoox_requests_total counter")
+            for (endpoint, status), n in sorted(self.statuses.items()):
+                out.append(f'movikoox_requests_total{{endpoint="{_escape(endpoint)}",status="{status}"}} {n}')
+
+            for name, value in sorted(self.counters.items()):
+                metric = f"movikoox_search_{name}_total"
+                help_text = SEARCH_COUNTERS_HELP.get(name, f"Contador {name} de las búsquedas.")
+                out.append(f"# HELP {metric} {help_text}")
+                out.append(f"# TYPE {metric} counter")
+                out.append(f"{metric} {value}")
+
+        for name, help_text, labels, value in gauges:
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} gauge")
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            out.append(f"{name}{{{base}}} {value}" if base else f"{name} {value}")
+        return "\n".join(out) + "\n"
+
+
+# gauges de otros componentes (p. ej. el pool del modo ASGI) para /metrics:
+# cada uno es fn() -> [(nombre, ayuda, {etiquetas}, valor)]
+gauge_providers = []
+
+
+def extra_gauges():
+    gauges = []
+    for provider in gauge_providers:
+        gauges.extend(provider())
+    return gauges
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ---------------------------------------------------
+# PERFILADOR POR MUESTREO PARA PETICIONES LENTAS (opcional)
+# Con threshold_ms > 0, un hilo toma la pila de cada petición en curso
+# cada interval_ms (sys._current_frames, sin instrumentar el código).
+# Si la petición tarda threshold_ms o más, se arma un reporte con sus
+# fases, contadores y las pilas más frecuentes (formato "colapsado" de
+# flamegraph: raíz;...;hoja) y se pasa a cada hook registrado.
+# Los últimos reportes quedan en recent.
+# ---------------------------------------------------
+class SlowRequestProfiler:
+
+    def __init__(self, threshold_ms, interval_ms, keep, top=15):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.top = top
+        self.recent = deque(maxlen=keep)
+        self.hooks = [self.recent.append]
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def add_hook(self, fn):
+        """fn(reporte) se llama con cada petición lenta (desde el hilo de la petición)."""
+        self.hooks.append(fn)
+
+    def watch(self, timer):
+        if not self.enabled:
+            return
+        timer.samples = {}
+        with self._lock:
+            self._active[timer.thread_id] = timer
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="movikoox-profiler", daemon=True)
+                self._thread.start()
+
+    def unwatch(self, timer):
+        if timer.samples is None:
+            return
+        with self._lock:
+            if self._active.get(timer.thread_id) is timer:
+                del self._active[timer.thread_id]
+
+    def check(self, timer, total):
+        if not self.enabled or total < self.threshold:
+            return
+        samples = sorted((timer.samples or {}).items(), key=lambda x: -x[1])[:self.top]
+        report = {
+            "endpoint": timer.endpoint,
+            "total_ms": round(total * 1000, 3),
+            "phases_ms": {k: round(v * 1000, 3) for k, v in timer.phases.items()},
+            "counters": dict(timer.counters),
+            "interval_ms": self.interval * 1000,
+            "stacks": [{"stack": stack, "samples": n} for stack, n in samples],
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }
+        for hook in self.hooks:
+            try:
+                hook(report)
+            except Exception as e:
+                print("Error en hook de petición lenta:", e)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, timer in active:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stack = _collapse(frame)
+                    timer.samples[stack] = timer.samples.get(stack, 0) + 1
+
+
+def _collapse(frame):
+    # función (archivo) por nivel; la hoja lleva también la línea
+    code = frame.f_code
+    names = [f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})"]
+    frame = frame.f_back
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]})")
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+# instancias del proceso (configuración en data.py)
+registry = MetricsRegistry(LATENCY_BUCKETS_S)
+profiler = SlowRequestProfiler(SLOW_REQUEST_MS, PROFILER_INTERVAL_MS, SLOW_PROFILES_KEPT)
@@ -0,0 +1,193 @@
+import heapq
+
+from . import metrics
+from .profiles import MINUTES_PER_DAY
+
+
+# ---------------------------------------------------
+# BÚSQUEDA MULTICRITERIO (FRENTE DE PARETO)
+# Un solo Dijkstra con varias etiquetas por estado en lugar de una:
+# etiqueta = (bus_count, non_eje_count, minutos, minutos_caminando)
+# Una etiqueta se descarta si otra del mismo estado (o una llegada ya
+# encontrada) es igual o mejor en los cuatro criterios, o si en la misma
+# parada hay otra ruta con un camión menos e igual o mejor en el resto.
+# Las etiquetas salen del heap en orden lexicográfico, así que cada llegada
+# extraída ya es no dominada y el frente sale ordenado por
+# (camiones, camiones no eje, minutos, caminata): el primero es el mismo
+# costo que minimiza route_multi_stop.
+# Los estados son los del grafo compilado (parada * R + ruta, o
+# foot_base + parada a pie), con las mismas reglas que route_multi_stop.
+# Poda contra las llegadas con una cota inferior de lo que falta: distancia
+# en línea recta a las paradas de destino al modo más rápido (desigualdad
+# del triángulo respecto a una parada de destino de referencia).
+# max_extra_buses: descarta etiquetas con más camiones que la primera
+# llegada + max_extra_buses.
+# profiles + departure: costo de cada arista según la franja horaria,
+# igual que route_multi_stop (la cota usa el per_km más rápido).
+# ---------------------------------------------------
+def pareto_search(g, seeds, egress, per_km=1.0, per_stop=0.0, per_walk_km=1.0, max_extra_buses=None,
+                  profiles=None, departure=0.0):
+    """
+    seeds:  {stop_idx: minutos caminando hasta la parada}
+    egress: {stop_idx: minutos caminando desde la parada}
+    Devuelve [(etiqueta, estados)] del frente de llegada, donde estados es
+    la lista de estados del camino (del origen a pie a la bajada).
+    """
+    if not seeds or not egress:
+        return []
+
+    R = g.num_routes
+    foot_base = g.num_stops * R
+    is_eje = g.route_is_eje
+    adj_ptr, adj_stop, adj_route, adj_dist = g.adj_ptr, g.adj_stop, g.adj_route, g.adj_dist
+
+    # etiquetas en arreglos paralelos: costo, estado, etiqueta padre, viva
+    cost = []
+    state_of = []
+    parent = []
+    alive = []
+    labels_at = {}
+    at_stop = {}
+    pq = []
+    front = []
+    max_buses = float("inf")
+    pops = 0
+    expanded = 0
+
+    # cota inferior: minutos y caminata mínimos desde una parada hasta llegar
+    ref = next(iter(egress))
+    ref_radius = max(g.distance_km(ref, t) for t in egress)
+    min_per_km = min(per_km, per_walk_km)
+    if profiles is not None:
+        band_of_minute, route_per_km, wait = profiles.band_of_minute, profiles.per_km, profiles.wait
+        min_per_km = min(min_per_km, min(route_per_km))
+    min_egress = min(egress.values())
+    remaining = {}
+
+    def bound(c, i):
+        lb = remaining.get(i)
+        if lb is None:
+            lb = remaining[i] = max(g.distance_km(i, ref) - ref_radius, 0.0) * min_per_km + min_egress
+        return (c[0], c[1], c[2] + lb, c[3] + min_egress)
+
+    def dominated(c, others):
+        b, n, m, w = c
+        for o in others:
+            ob, on, om, ow = cost[o]
+            if ob <= b and on <= n and om <= m and ow <= w:
+                return True
+        return False
+
+    def push(state, c, par, i, r=None):
+        if c[0] > max_buses or (front and dominated(bound(c, i), front)):
+            return
+        at = labels_at.setdefault(state, [])
+        if dominated(c, at):
+            return
+        if state < foot_base and profiles is None:
+            # otra ruta en la misma parada con un camión menos: de ahí se puede
+            # transbordar a esta ruta y quedar igual o mejor (con perfiles no:
+            # transbordar agrega la espera)
+            here = at_stop.setdefault(i, [])
+            if dominated((c[0] - 1, c[1] - (not is_eje[r]), c[2], c[3]), here):
+                return
+            here.append(len(cost))
+        b, n, m, w = c
+        keep = []
+        for o in at:
+            ob, on, om, ow = cost[o]
+            if b <= ob and n <= on and m <= om and w <= ow:
+                alive[o] = False
+            else:
+                keep.append(o)
+        lid = len(cost)
+        cost.append(c)
+        state_of.append(state)
+        parent.append(par)
+        alive.append(True)
+        keep.append(lid)
+        labels_at[state] = keep
+        heapq.heappush(pq, (*c, lid))
+
+    def arrive(c, par):
+        # llegada: estado virtual -1, ya incluye la caminata final
+        lid = len(cost)
+        cost.append(c)
+        state_of.append(-1)
+        parent.append(par)
+        alive.append(True)
+        heapq.heappush(pq, (*c, lid))
+
+    for i, walk_min in seeds.items():
+        push(foot_base + i, (0, 0, walk_min, walk_min), None, i)
+
+    # parada que también es destino: subir y bajar ahí (1 camión, 0 paradas)
+    for lid in range(len(cost)):
+        i = state_of[lid] - foot_base
+        r = g.board_route(i)
+        if i in egress and r is not None:
+            walk_min = seeds[i] + egress[i]
+            arrive((1, 0 if is_eje[r] else 1, walk_min, walk_min), lid)
+
+    while pq:
+        bus_c, non_eje_c, minutes, walk_min, lid = heapq.heappop(pq)
+        pops += 1
+        if not alive[lid]:
+            continue
+        c = (bus_c, non_eje_c, minutes, walk_min)
+        state = state_of[lid]
+
+        if state < 0:
+            if not front and max_extra_buses is not None:
+                max_buses = bus_c + max_extra_buses
+            if not dominated(c, front):
+                front.append(lid)
+            continue
+
+        if state >= foot_base:
+            cur, cur_r = state - foot_base, -1
+        else:
+            cur, cur_r = divmod(state, R)
+
+        # la etiqueta pudo quedar dominada por llegadas encontradas después
+        if bus_c > max_buses or dominated(bound(c, cur), front):
+            continue
+        expanded += 1
+
+        if cur_r >= 0:
+            if cur in egress:
+                arrive((bus_c, non_eje_c, minutes + egress[cur], walk_min + egress[cur]), lid)
+
+            for nxt, _, transfer_min in g.transfers(cur):
+                push(foot_base + nxt, (bus_c, non_eje_c, minutes + transfer_min, walk_min + transfer_min), lid, nxt)
+
+        if profiles is not None:
+            base = band_of_minute[int(departure + minutes) % MINUTES_PER_DAY] * R
+
+        lo = adj_ptr[cur]
+        hi = adj_ptr[cur + 1]
+        for nxt, r, step in zip(adj_stop[lo:hi], adj_route[lo:hi], adj_dist[lo:hi]):
+            if profiles is None:
+                nxt_minutes = minutes + step * per_km + per_stop
+            else:
+                nxt_minutes = minutes + step * route_per_km[base + r] + per_stop
+                if r != cur_r:
+                    nxt_minutes += wait[base + r]
+            if r != cur_r:
+                nxt_cost = (bus_c + 1, non_eje_c + (not is_eje[r]), nxt_minutes, walk_min)
+            else:
+                nxt_cost = (bus_c, non_eje_c, nxt_minutes, walk_min)
+            push(nxt * R + r, nxt_cost, lid, nxt, r)
+
+    metrics.count(pops=pops, pushes=pops + len(pq), expanded=expanded)
+
+    results = []
+    for lid in front:
+        states = []
+        cur = parent[lid]
+        while cur is not None:
+            states.append(state_of[cur])
+            cur = parent[cur]
+        states.reverse()
+        results.append((cost[lid], states))
+    return results
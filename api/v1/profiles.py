@@ -0,0 +1,116 @@
+import hashlib
+import json
+from bisect import bisect_right
+
+MINUTES_PER_DAY = 24 * 60
+
+
+# ---------------------------------------------------
+# PERFILES POR HORA DEL DÍA (VELOCIDAD Y FRECUENCIA)
+# db/perfiles.json (opcional, no se versiona; ejemplo en tests/data/perfiles.json):
+#   {
+#     "franjas": ["00:00", "06:00", "09:00", ...],   inicio de cada franja
+#     "default": {"velocidad_kmh": [...], "frecuencia_min": [...]},
+#     "rutas":   {"<nombre de ruta>": {"velocidad_kmh": [...], "frecuencia_min": [...]}}
+#   }
+# Un valor por franja; lo que falte en una ruta se toma de "default"
+# y lo que falte en "default", de BUS_KMH / sin espera.
+# Se compila a tablas planas para que cada arista cueste O(1):
+#   band_of_minute[minuto del día] -> franja
+#   per_km[franja * R + ruta]      -> minutos por km
+#   wait[franja * R + ruta]        -> espera esperada al abordar (frecuencia / 2)
+# ---------------------------------------------------
+class TimeProfiles:
+
+    __slots__ = ("num_routes", "band_starts", "band_of_minute", "per_km", "wait", "digest")
+
+    def band(self, minute):
+        """Franja del minuto dado (minutos desde las 00:00; da la vuelta al día)."""
+        return self.band_of_minute[int(minute) % MINUTES_PER_DAY]
+
+    def ride_per_km(self, route_idx, minute):
+        return self.per_km[self.band(minute) * self.num_routes + route_idx]
+
+    def wait_minutes(self, route_idx, minute):
+        return self.wait[self.band(minute) * self.num_routes + route_idx]
+
+
+def constant_profiles(num_routes, bus_kmh):
+    """Una sola franja: BUS_KMH para todas las rutas y sin espera (el modelo de siempre)."""
+    return _compile([0], num_routes, [[60.0 / bus_kmh] * num_routes], [[0.0] * num_routes], b"")
+
+
+def load_profiles(path, route_names, bus_kmh):
+    """
+    Perfiles desde el archivo; sin archivo, constant_profiles.
+    Un archivo inválido lanza la excepción (el llamador decide si lo ignora).
+    """
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return constant_profiles(len(route_names), bus_kmh)
+
+    data = json.loads(raw)
+    starts = [parse_clock(x) for x in data["franjas"]]
+    if not starts or starts != sorted(set(starts)):
+        raise ValueError("franjas vacías o desordenadas")
+
+    num_bands = len(starts)
+    default = data.get("default", {})
+    base_speed = _band_values(default, "velocidad_kmh", num_bands, [bus_kmh] * num_bands)
+    base_headway = _band_values(default, "frecuencia_min", num_bands, [0.0] * num_bands)
+
+    by_route = data.get("rutas", {})
+    per_km = [[0.0] * len(route_names) for _ in range(num_bands)]
+    wait = [[0.0] * len(route_names) for _ in range(num_bands)]
+    for r, name in enumerate(route_names):
+        route = by_route.get(name, {})
+        speed = _band_values(route, "velocidad_kmh", num_bands, base_speed)
+        headway = _band_values(route, "frecuencia_min", num_bands, base_headway)
+        for b in range(num_bands):
+            if speed[b] <= 0 or headway[b] < 0:
+                raise ValueError(f"valores inválidos para {name!r}")
+            per_km[b][r] = 60.0 / speed[b]
+            wait[b][r] = headway[b] / 2.0
+
+    return _compile(starts, len(route_names), per_km, wait, hashlib.sha256(raw).digest())
+
+
+def parse_clock(value):
+    """'HH:MM' -> minutos desde las 00:00; ValueError si no es válido."""
+    hours, minutes = (int(x) for x in str(value).split(":"))
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError("hora inválida")
+    return hours * 60 + minutes
+
+
+def format_clock(minute):
+    minute = int(round(minute)) % MINUTES_PER_DAY
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def _band_values(block, key, num_bands, fallback):
+    values = block.get(key)
+    if values is None:
+        return fallback
+    if len(values) != num_bands:
+        raise ValueError(f"{key}: se esperan {num_bands} valores")
+    return [float(x) for x in values]
+
+
+def _compile(starts, num_routes, per_km, wait, digest):
+    p = TimeProfiles()
+    p.num_routes = num_routes
+    p.band_starts = starts
+    p.digest = digest
+
+    # antes de la primera franja sigue la última del día anterior (índice -1)
+    p.band_of_minute = [
+        (bisect_right(starts, minute) - 1) % len(starts)
+        for minute in range(MINUTES_PER_DAY)
+    ]
+
+    p.per_km = [x for row in per_km for x in row]
+    p.wait = [x for row in wait for x in row]
+    return p
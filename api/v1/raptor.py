@@ -0,0 +1,209 @@
+# ---------------------------------------------------
+# MOTOR RAPTOR (POR RONDAS)
+# Ronda k = viajes con exactamente k camiones.
+# En cada ronda se escanean solo las rutas que pasan por paradas
+# alcanzadas por primera vez en la ronda anterior; cada parada queda
+# etiquetada en la primera ronda que la alcanza.
+# etiqueta = (non_eje_bus_count, costo)
+# costo de un tramo = distancia_km * per_km + per_stop
+# Al final de cada ronda, desde las paradas donde se bajó del camión se
+# camina a las cercanas (footpaths); esas se abordan en la ronda siguiente
+# pero no cuentan como llegada (hay que subir a otro camión).
+# ---------------------------------------------------
+def raptor_search(g, seeds, targets, per_km=1.0, per_stop=0.0, per_walk_km=1.0, approx_goal=None):
+    """
+    seeds:   {stop_idx: costo inicial}
+    targets: {stop_idx: costo de bajada}
+    Devuelve (path, exacto) con path = [(stop_idx, route_idx)] en el
+    mismo formato de estados que la búsqueda Dijkstra (route_idx None =
+    llegó caminando desde la parada anterior), o (None, False).
+    """
+    is_eje = g.route_is_eje
+    pattern_ptr, pattern_stops, pattern_step = g.pattern_ptr, g.pattern_stops, g.pattern_step
+
+    label = {}
+    round_of = {}
+    route_of = {}
+    parents = [None]
+    # walks[k] = {parada: parada donde se bajó} para las abordadas caminando en la ronda k + 1;
+    # los orígenes también se abordan a pie (subir ahí no es una llegada)
+    walks = [dict.fromkeys(seeds)]
+
+    # origen que también es destino: subir y bajar en la misma parada
+    direct = {}
+    for s, c in seeds.items():
+        r = g.board_route(s)
+        if r is not None:
+            direct[s] = ((0 if is_eje[r] else 1, c), r)
+
+    marked = {s: (0, c) for s, c in seeds.items()}
+    k = 0
+
+    while marked:
+        k += 1
+        walked_in = walks[k - 1]
+        round_parent = {}
+        # mejor llegada en camión a las paradas que se abordan tras caminar
+        # (su etiqueta de abordaje no es una llegada)
+        ride_in = {}
+        reached = {}
+
+        routes = sorted({r for s in marked for r in g.routes_at(s)})
+        for r in routes:
+            board = 0 if is_eje[r] else 1
+            patterns = g.patterns_of(r)
+
+            onboard = {}
+            for p in patterns:
+                for s in pattern_stops[pattern_ptr[p]:pattern_ptr[p + 1]]:
+                    if s in marked and s not in onboard:
+                        ne, c = marked[s]
+                        onboard[s] = (ne + board, c)
+                        round_parent[(r, s)] = None
+
+            # barridos ida / vuelta hasta estabilizar (rutas con paradas repetidas)
+            changed = True
+            while changed:
+                changed = False
+                for p in patterns:
+                    lo, hi = pattern_ptr[p], pattern_ptr[p + 1]
+                    for positions in (range(lo, hi), range(hi - 1, lo - 1, -1)):
+                        cur = None
+                        prev = None
+                        prev_pos = None
+                        for pos in positions:
+                            s = pattern_stops[pos]
+                            if cur is not None:
+                                step = pattern_step[pos] if pos > prev_pos else pattern_step[prev_pos]
+                                cand = (cur[0], cur[1] + step * per_km + per_stop)
+                                old = onboard.get(s)
+                                if old is None or cand < old:
+                                    onboard[s] = cand
+                                    round_parent[(r, s)] = prev
+                                    changed = True
+                                    cur = cand
+                                else:
+                                    if s in walked_in and round_parent[(r, s)] is None:
+                                        ride = ride_in.get((r, s))
+                                        if ride is None or cand < ride[0]:
+                                            ride_in[(r, s)] = (cand, prev)
+                                    cur = old
+                            else:
+                                cur = onboard.get(s)
+                            prev = s
+                            prev_pos = pos
+
+            for s, lab in onboard.items():
+                if s in round_of:
+                    continue
+                if s in walked_in and round_parent[(r, s)] is None:
+                    ride = ride_in.get((r, s))
+                    if ride is None:
+                        continue
+                    lab = ride[0]
+                old = reached.get(s)
+                if old is None or lab < old[0]:
+                    reached[s] = (lab, r)
+
+        # la llegada a una parada abordada tras caminar viene de ride_in
+        arrival_parent = {
+            (r, s): prev
+            for (r, s), (lab, prev) in ride_in.items()
+            if reached.get(s) == (lab, r)
+        }
+
+        parents.append((round_parent, arrival_parent))
+        for s, (lab, r) in reached.items():
+            label[s] = lab
+            round_of[s] = k
+            route_of[s] = r
+
+        # el primer destino alcanzado (menos camiones) gana
+        best = None
+        best_direct = None
+        for s in reached:
+            if s in targets:
+                ne, c = label[s]
+                cand = (ne, c + targets[s], s)
+                if best is None or cand < best:
+                    best = cand
+        if k == 1:
+            for s, ((ne, c), r) in direct.items():
+                if s in targets:
+                    cand = (ne, c + targets[s], s)
+                    if best is None or cand < best:
+                        best = cand
+                        best_direct = r
+        if best is not None:
+            if best_direct is not None:
+                return [(best[2], best_direct)], True
+            return _raptor_path(best[2], round_of, route_of, parents, walks), True
+
+        marked = {s: label[s] for s in reached}
+
+        # caminar a paradas cercanas, solo desde donde se bajó de un camión
+        walked = {}
+        for s in reached:
+            key = (route_of[s], s)
+            if round_parent[key] is None and key not in arrival_parent:
+                continue
+            ne, c = label[s]
+            for b, km, _ in g.transfers(s):
+                if round_of.get(b, k) < k:
+                    continue
+                cand = (ne, c + km * per_walk_km)
+                old = marked.get(b)
+                if old is None or cand < old:
+                    marked[b] = cand
+                    walked[b] = s
+        walks.append(walked)
+
+    # los orígenes cuentan como alcanzados sin viajar
+    reached_any = {s: (round_of[s], label[s]) for s in round_of}
+    for s, (lab, _) in direct.items():
+        reached_any[s] = (1, lab)
+
+    if reached_any and approx_goal is not None:
+        closest = min(reached_any, key=lambda s: (g.distance_km(s, approx_goal), *reached_any[s]))
+        if closest in direct:
+            return [(closest, direct[closest][1])], False
+        return _raptor_path(closest, round_of, route_of, parents, walks), False
+
+    return None, False
+
+
+def _raptor_path(stop, round_of, route_of, parents, walks):
+    legs = []
+    k = round_of[stop]
+    r = route_of[stop]
+
+    while True:
+        chain = [stop]
+        round_parent, arrival_parent = parents[k]
+        prev = arrival_parent.get((r, stop), round_parent[(r, stop)])
+        while prev is not None:
+            stop = prev
+            chain.append(stop)
+            prev = round_parent[(r, stop)]
+        chain.reverse()
+        legs.append((r, chain))
+
+        if k == 1:
+            break
+        # parada de abordaje: alcanzada en la ronda anterior (en camión o caminando)
+        k -= 1
+        if stop in walks[k]:
+            legs.append((None, [stop]))
+            stop = walks[k][stop]
+        r = route_of[stop]
+
+    legs.reverse()
+    path = []
+    for n, (r, chain) in enumerate(legs):
+        if r is None:
+            path.append((chain[0], None))
+            continue
+        # al transbordar, la parada de abordaje ya está en el tramo anterior
+        for s in chain if n == 0 else chain[1:]:
+            path.append((s, r))
+    return path
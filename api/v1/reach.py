@@ -0,0 +1,84 @@
+import heapq
+
+from .profiles import MINUTES_PER_DAY
+
+
+# ---------------------------------------------------
+# ALCANCE (ISÓCRONA) DESDE UN ORIGEN
+# Una sola búsqueda uno-a-todos sobre el grafo compilado, con los mismos
+# estados y reglas que route_multi_stop (parada * R + ruta, o
+# foot_base + parada a pie; transbordos a pie solo al bajar del camión).
+# etiqueta = (minutos, camiones)
+# El heap sale en orden de minutos, así que en cada estado basta recordar
+# el menor número de camiones ya extraído: una etiqueta posterior con
+# igual o más camiones está dominada. Cada estado sale a lo más
+# max_buses + 1 veces.
+# Nada que pase de budget entra al heap; la búsqueda termina en cuanto
+# se acaba el heap.
+# Cada parada queda con la primera etiqueta extraída (la más rápida,
+# con menos camiones en empate).
+# ---------------------------------------------------
+def reach_search(g, seeds, budget, max_buses, per_km=1.0, per_stop=0.0, profiles=None, departure=0.0):
+    """
+    seeds: {stop_idx: minutos caminando hasta la parada}
+    Devuelve {stop_idx: (minutos, camiones, route_idx o None)}; route_idx es la
+    ruta en la que se llegó (None = a pie).
+    """
+    R = g.num_routes
+    foot_base = g.num_stops * R
+    adj_ptr, adj_stop, adj_route, adj_dist = g.adj_ptr, g.adj_stop, g.adj_route, g.adj_dist
+    if profiles is not None:
+        band_of_minute, route_per_km, wait = profiles.band_of_minute, profiles.per_km, profiles.wait
+
+    pq = []
+    fewest_buses = {}
+    reached = {}
+
+    for i, walk_min in seeds.items():
+        if walk_min <= budget:
+            heapq.heappush(pq, (walk_min, 0, foot_base + i))
+
+    while pq:
+        minutes, bus_c, state = heapq.heappop(pq)
+
+        if fewest_buses.get(state, max_buses + 1) <= bus_c:
+            continue
+        fewest_buses[state] = bus_c
+
+        if state >= foot_base:
+            cur, cur_r = state - foot_base, -1
+        else:
+            cur, cur_r = divmod(state, R)
+
+        if cur not in reached:
+            reached[cur] = (minutes, bus_c, cur_r if cur_r >= 0 else None)
+
+        if cur_r >= 0:
+            for nxt, _, transfer_min in g.transfers(cur):
+                nxt_minutes = minutes + transfer_min
+                if nxt_minutes <= budget:
+                    heapq.heappush(pq, (nxt_minutes, bus_c, foot_base + nxt))
+
+        if profiles is not None:
+            base = band_of_minute[int(departure + minutes) % MINUTES_PER_DAY] * R
+
+        lo = adj_ptr[cur]
+        hi = adj_ptr[cur + 1]
+        for nxt, r, step in zip(adj_stop[lo:hi], adj_route[lo:hi], adj_dist[lo:hi]):
+            nxt_bus = bus_c + (r != cur_r)
+            if nxt_bus > max_buses:
+                continue
+            if profiles is None:
+                nxt_minutes = minutes + step * per_km + per_stop
+            else:
+                nxt_minutes = minutes + step * route_per_km[base + r] + per_stop
+                if r != cur_r:
+                    nxt_minutes += wait[base + r]
+            if nxt_minutes > budget:
+                continue
+            nxt_state = nxt * R + r
+            if fewest_buses.get(nxt_state, max_buses + 1) <= nxt_bus:
+                continue
+            heapq.heappush(pq, (nxt_minutes, nxt_bus, nxt_state))
+
+    return reached
@@ -0,0 +1,194 @@
+import heapq
+import threading
+from array import array
+from collections import deque
+
+INF = float("inf")
+
+
+# ---------------------------------------------------
+# GRAFO DE RUTAS
+# Un nodo por ruta; la ruta a es vecina de la b si se puede pasar de una
+# a otra: comparten una parada o hay un transbordo a pie desde una parada
+# de a hacia una de b. Solo cuentan las paradas donde la ruta tiene
+# aristas (donde hay estados de búsqueda). Al cargar la red se arma solo
+# lo que usan todas las búsquedas (R es chico: decenas a cientos):
+#   hops[a][b]             = camiones extra mínimos de la ruta a a la b
+#                            (BFS desde cada ruta; INF si no hay forma)
+# De hops sale la cota de camiones que faltan de las búsquedas dirigidas
+# (astar.py y route_multi_stop: buses_to / buses_to_any).
+#
+# Lo del ruteo jerárquico (hierarchy.py) se arma la primera vez que se
+# usa (prepare_levels), porque las matrices por ruta son n x n:
+#   transfer_stops[(a, b)] = (paradas p de a, paradas q de b, minutos a pie)
+#                            p == q y 0 minutos si comparten la parada
+# y el recorrido dentro de cada ruta, para sus paradas con aristas,
+#   route_stops[r]  paradas de la ruta (índice local = posición)
+#   route_pos[r]    {parada: índice local}
+#   ride[r][i*n+j]  minutos en camión de la parada local i a la j sin
+#                   bajarse (Dijkstra en las aristas de la ruta; mismo
+#                   costo por arista que route_multi_stop)
+#   ride_prev[r][i*n+j] parada local anterior a j en ese recorrido
+# También guarda, por parada:
+#   edge_routes[i]   rutas con alguna arista en la parada i (sus estados)
+#   transfers_in[i]  [(parada j, minutos a pie)] con un transbordo j -> i
+#                    (la búsqueda bidireccional los recorre hacia atrás)
+# ---------------------------------------------------
+class RouteGraph:
+
+    __slots__ = (
+        "num_routes", "neighbors", "hops", "transfer_stops",
+        "edge_routes", "transfers_in",
+        "route_stops", "route_pos", "ride", "ride_prev",
+        "g", "per_km", "per_stop", "levels_ready", "lock",
+    )
+
+    def __init__(self, g, bus_kmh, dwell_seconds):
+        R = g.num_routes
+        self.num_routes = R
+        self.g = g
+        self.per_km = (1.0 / bus_kmh) * 60.0 if bus_kmh > 0 else 0.0
+        self.per_stop = dwell_seconds / 60.0
+        self.levels_ready = False
+        self.lock = threading.Lock()
+
+        self.edge_routes = []
+        for i in range(g.num_stops):
+            lo, hi = g.adj_ptr[i], g.adj_ptr[i + 1]
+            self.edge_routes.append(sorted(set(g.adj_route[lo:hi])))
+
+        self.transfers_in = [[] for _ in range(g.num_stops)]
+        for j in range(g.num_stops):
+            for i, _, walk_min in g.transfers(j):
+                self.transfers_in[i].append((j, walk_min))
+
+        self._compile_neighbors(g)
+        self.hops = [self._bfs(a) for a in range(R)]
+
+    def _compile_neighbors(self, g):
+        # mismos pares que las llaves de transfer_stops, sin juntar las paradas
+        edge_routes = self.edge_routes
+        pairs = set()
+        for p in range(g.num_stops):
+            here = edge_routes[p]
+            if not here:
+                continue
+            reach = set(here)
+            for q, _, _ in g.transfers(p):
+                reach.update(edge_routes[q])
+            for a in here:
+                for b in reach:
+                    if a != b:
+                        pairs.add((a, b))
+
+        self.neighbors = [[] for _ in range(self.num_routes)]
+        for a, b in sorted(pairs):
+            self.neighbors[a].append(b)
+
+    def prepare_levels(self):
+        """Arma transfer_stops y los recorridos por ruta, una sola vez (motor "rutas")."""
+        if self.levels_ready:
+            return
+        with self.lock:
+            if not self.levels_ready:
+                self._compile_transfer_stops(self.g)
+                self._compile_rides(self.g, self.per_km, self.per_stop)
+                self.levels_ready = True
+
+    def _compile_transfer_stops(self, g):
+        pairs = {}
+        edge_routes = self.edge_routes
+        for p in range(g.num_stops):
+            here = edge_routes[p]
+            if not here:
+                continue
+            for a in here:
+                for b in here:
+                    if a != b:
+                        pairs.setdefault((a, b), []).append((p, p, 0.0))
+            for q, _, walk_min in g.transfers(p):
+                for a in here:
+                    for b in edge_routes[q]:
+                        if a != b:
+                            pairs.setdefault((a, b), []).append((p, q, walk_min))
+
+        self.transfer_stops = {
+            key: (array("i", [t[0] for t in found]), array("i", [t[1] for t in found]),
+                  array("d", [t[2] for t in found]))
+            for key, found in pairs.items()
+        }
+
+    def _compile_rides(self, g, per_km, per_stop):
+        R = self.num_routes
+        local_adj = [dict() for _ in range(R)]
+        for i in range(g.num_stops):
+            for j, r, step in g.neighbors(i):
+                local_adj[r].setdefault(i, []).append((j, step * per_km + per_stop))
+
+        self.route_stops = []
+        self.route_pos = []
+        self.ride = []
+        self.ride_prev = []
+        for r in range(R):
+            stops = sorted(local_adj[r])
+            pos = {s: k for k, s in enumerate(stops)}
+            n = len(stops)
+            edges = [[(pos[j], m) for j, m in local_adj[r][s]] for s in stops]
+            ride = array("d", [INF]) * (n * n)
+            prev = array("i", [-1]) * (n * n)
+            for src in range(n):
+                base = src * n
+                ride[base + src] = 0.0
+                pq = [(0.0, src)]
+                while pq:
+                    d, u = heapq.heappop(pq)
+                    if d > ride[base + u]:
+                        continue
+                    for v, m in edges[u]:
+                        nd = d + m
+                        if nd < ride[base + v]:
+                            ride[base + v] = nd
+                            prev[base + v] = u
+                            heapq.heappush(pq, (nd, v))
+            self.route_stops.append(stops)
+            self.route_pos.append(pos)
+            self.ride.append(ride)
+            self.ride_prev.append(prev)
+
+    def _bfs(self, source):
+        dist = [INF] * self.num_routes
+        dist[source] = 0
+        queue = deque([source])
+        while queue:
+            a = queue.popleft()
+            for b in self.neighbors[a]:
+                if dist[b] == INF:
+                    dist[b] = dist[a] + 1
+                    queue.append(b)
+        return dist
+
+    def buses_to(self, goal):
+        """
+        Por ruta: camiones que faltan, como mínimo, estando en esa ruta,
+        para bajar en la parada goal (0 si la ruta llega ahí).
+        """
+        return self.buses_to_any((goal,))
+
+    def buses_to_any(self, goals):
+        """Como buses_to, para bajar en cualquiera de las paradas goals."""
+        targets = {r for i in goals for r in self.edge_routes[i]}
+        if not targets:
+            return [INF] * self.num_routes
+        return [min(row[t] for t in targets) for row in self.hops]
+
+    def ride_path(self, r, a, b):
+        """Paradas (índices globales) después de a hasta b, en camión sobre la ruta r."""
+        stops, pos, n = self.route_stops[r], self.route_pos[r], len(self.route_stops[r])
+        src, k = pos[a], pos[b]
+        prev = self.ride_prev[r]
+        out = []
+        while k != src:
+            out.append(stops[k])
+            k = prev[src * n + k]
+        out.reverse()
+        return out
@@ -0,0 +1,88 @@
+from .helpers import normalize_compact, extract_number
+
+
+# ---------------------------------------------------
+# ÍNDICE DE NOMBRES DE RUTA
+# número de ruta / n-gramas del nombre normalizado -> ids de ruta
+# id de ruta -> paradas (en el orden de stops_data)
+# Coincide igual que la búsqueda lineal original:
+#   mismo número de ruta, o el texto normalizado contenido en el nombre.
+# ---------------------------------------------------
+NGRAM = 3
+
+
+class RouteNameIndex:
+
+    def __init__(self, stops_data):
+        self.stops_data = stops_data
+        self.names = []
+        self.norms = []
+        self.stops_of = []
+        self.by_number = {}
+        self.by_gram = {}
+
+        ids = {}
+        for pos, stop in enumerate(stops_data):
+            for ruta in stop.get("rutas", []):
+                rid = ids.get(ruta)
+                if rid is None:
+                    rid = ids[ruta] = len(self.names)
+                    self._add_route(ruta)
+                if not self.stops_of[rid] or self.stops_of[rid][-1] != pos:
+                    self.stops_of[rid].append(pos)
+
+    def _add_route(self, name):
+        rid = len(self.names)
+        norm = normalize_compact(name)
+        self.names.append(name)
+        self.norms.append(norm)
+        self.stops_of.append([])
+
+        number = extract_number(name)
+        if number is not None:
+            self.by_number.setdefault(number, set()).add(rid)
+
+        # todos los fragmentos de hasta NGRAM caracteres
+        for n in range(1, NGRAM + 1):
+            for i in range(len(norm) - n + 1):
+                self.by_gram.setdefault(norm[i:i + n], set()).add(rid)
+
+    def match_routes(self, query):
+        query_norm = normalize_compact(query)
+        query_number = extract_number(query)
+
+        matched = set()
+        if query_number is not None:
+            matched |= self.by_number.get(query_number, set())
+
+        if not query_norm:
+            matched |= set(range(len(self.names)))
+        else:
+            matched |= self._substring_matches(query_norm)
+
+        return matched
+
+    def _substring_matches(self, query_norm):
+        if len(query_norm) <= NGRAM:
+            return self.by_gram.get(query_norm, set())
+
+        grams = [query_norm[i:i + NGRAM] for i in range(len(query_norm) - NGRAM + 1)]
+        candidates = None
+        for gram in sorted(set(grams), key=lambda g: len(self.by_gram.get(g, ()))):
+            rids = self.by_gram.get(gram)
+            if not rids:
+                return set()
+            candidates = set(rids) if candidates is None else candidates & rids
+            if not candidates:
+                return set()
+        return {rid for rid in candidates if query_norm in self.norms[rid]}
+
+    def stops(self, query):
+        matched = self.match_routes(query)
+        if not matched:
+            return []
+        if len(matched) == 1:
+            positions = self.stops_of[next(iter(matched))]
+        else:
+            positions = sorted({pos for rid in matched for pos in self.stops_of[rid]})
+        return [self.stops_data[pos] for pos in positions]
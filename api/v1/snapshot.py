@@ -0,0 +1,189 @@
+import marshal
+import mmap
+import os
+import struct
+from array import array
+
+from .graph import CompiledGraph, compile_graph
+from .catalog import PreparedResponse, build_rutas_body
+
+
+# ---------------------------------------------------
+# SNAPSHOT BINARIO DE LA RED
+# Todo lo que se deriva de paradas.json / rutas.json al arrancar,
+# ya calculado, para evitar el trabajo en cada arranque en frío:
+#   cabecera: magic, versión, num_stops, num_routes, hash de los datos
+#   arreglos del grafo compilado (CSR, distancias, recorridos), cada uno:
+#     cantidad de elementos + bytes crudos alineados a 8
+#   bloque marshal: paradas, rutas, nombres de ruta y los catálogos ya serializados (ETag + cuerpos plano / gzip / br)
+# Las listas se cargan desde el mmap sin pasar por JSON.
+# ---------------------------------------------------
+SNAPSHOT_MAGIC = b"MVKS"
+SNAPSHOT_VERSION = 3
+
+HEADER = struct.Struct("<4sHII32s")
+U32 = struct.Struct("<I")
+ALIGN = 8
+
+# (campo de CompiledGraph, typecode); "d" conserva las distancias exactas
+GRAPH_ARRAYS = (
+    ("lat", "d"),
+    ("lon", "d"),
+    ("stop_ids", "q"),
+    ("route_is_eje", "b"),
+    ("adj_ptr", "i"),
+    ("adj_stop", "i"),
+    ("adj_route", "i"),
+    ("adj_dist", "d"),
+    ("stop_routes_ptr", "i"),
+    ("stop_routes", "i"),
+    ("pattern_ptr", "i"),
+    ("pattern_stops", "i"),
+    ("pattern_step", "d"),
+    ("pattern_route", "i"),
+    ("route_patterns_ptr", "i"),
+    ("route_patterns", "i"),
+    ("transfer_ptr", "i"),
+    ("transfer_stop", "i"),
+    ("transfer_km", "d"),
+    ("transfer_min", "d"),
+)
+
+
+class Network:
+    """
+    Red completa lista para el API: datos crudos + estructuras derivadas.
+    Una vez publicada (utils.current_network) no se modifica: una recarga
+    construye otra y la reemplaza completa.
+    """
+
+    __slots__ = (
+        "version", "source",
+        "stops_data", "routes_data", "stop_store",
+        "compiled",
+        "spatial_index", "routing_table", "table_hash", "route_name_index", "profiles", "route_graph", "tiles", "route_geometry",
+        "paradas_response", "rutas_response",
+    )
+
+
+# ---------------------------------------------------
+# RUTA LENTA: DESDE LOS JSON
+# ---------------------------------------------------
+def compile_network(stops_data, routes_data, transfer_km=0.0, max_transfers=0, walk_kmh=1.0):
+    net = Network()
+    net.source = "json"
+    net.stops_data = stops_data
+    net.routes_data = routes_data
+
+    stops_by_id = {int(s["id"]): s for s in stops_data}
+    net.compiled = compile_graph(stops_data, routes_data, transfer_km, max_transfers, walk_kmh)
+
+    # catálogos estáticos ya serializados
+    net.paradas_response = PreparedResponse({"ok": True, "body": stops_data})
+    net.rutas_response = PreparedResponse({"ok": True, "body": build_rutas_body(routes_data, stops_by_id)})
+    return net
+
+
+# ---------------------------------------------------
+# ESCRITURA / LECTURA
+# ---------------------------------------------------
+def _pad(offset):
+    return -offset % ALIGN
+
+
+def write_snapshot(path, net, data_hash):
+    g = net.compiled
+    extra = marshal.dumps({
+        "stops": net.stops_data,
+        "routes": net.routes_data,
+        "route_names": g.route_names,
+        "paradas": (net.paradas_response.etag, net.paradas_response.bodies),
+        "rutas": (net.rutas_response.etag, net.rutas_response.bodies),
+    })
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, g.num_stops, g.num_routes, data_hash))
+        offset = HEADER.size
+
+        for name, typecode in GRAPH_ARRAYS:
+            values = getattr(g, name)
+            raw = array(typecode, values).tobytes()
+            head = U32.pack(len(values))
+            pad = _pad(offset + len(head))
+            f.write(head + b"\0" * pad + raw)
+            offset += len(head) + pad + len(raw)
+
+        f.write(U32.pack(len(extra)))
+        f.write(extra)
+
+    # reemplazo atómico: el API nunca ve un archivo a medias
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path, expected_hash):
+    """Red desde el snapshot; None si no existe, está dañado o no coincide con los datos."""
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        return _read(mm, expected_hash, path)
+    except (struct.error, ValueError, EOFError, TypeError, KeyError):
+        print("Snapshot de la red dañado, se ignora:", path)
+        return None
+    finally:
+        mm.close()
+
+
+def _read(mm, expected_hash, path):
+    magic, version, num_stops, num_routes, data_hash = HEADER.unpack_from(mm, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or data_hash != expected_hash:
+        print("Snapshot de la red desactualizado, se ignora:", path)
+        return None
+
+    g = CompiledGraph()
+    g.num_stops = num_stops
+    g.num_routes = num_routes
+
+    view = memoryview(mm)
+    try:
+        offset = HEADER.size
+        for name, typecode in GRAPH_ARRAYS:
+            (count,) = U32.unpack_from(mm, offset)
+            offset += U32.size
+            offset += _pad(offset)
+            size = count * array(typecode).itemsize
+            if offset + size > len(mm):
+                raise ValueError("snapshot truncado")
+            # se copian a listas: las búsquedas indexan listas más rápido que
+            # array; el ahorro del snapshot es no leer JSON ni compilar el grafo
+            values = array(typecode)
+            values.frombytes(view[offset:offset + size])
+            offset += size
+            setattr(g, name, values.tolist())
+
+        (size,) = U32.unpack_from(mm, offset)
+        offset += U32.size
+        extra = marshal.loads(view[offset:offset + size])
+    finally:
+        view.release()
+
+    g.route_is_eje = [bool(x) for x in g.route_is_eje]
+    g.route_names = extra["route_names"]
+    g.stop_index = {sid: i for i, sid in enumerate(g.stop_ids)}
+    g.route_index = {name: i for i, name in enumerate(g.route_names)}
+
+    if len(g.stop_ids) != num_stops or len(g.route_names) != num_routes:
+        raise ValueError("tamaños inconsistentes")
+
+    net = Network()
+    net.source = "snapshot"
+    net.stops_data = extra["stops"]
+    net.routes_data = extra["routes"]
+    net.compiled = g
+    net.paradas_response = PreparedResponse.from_parts(*extra["paradas"])
+    net.rutas_response = PreparedResponse.from_parts(*extra["rutas"])
+    return net
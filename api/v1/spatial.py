@@ -0,0 +1,179 @@
+import math
+import heapq
+
+from .helpers import calculate_distance
+from .stops import EARTH_RADIUS_KM, PREFILTER_SLACK_KM, as_column, take, haversine_one_to_many
+
+
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+
+# paradas promedio por celda de la malla
+STOPS_PER_CELL = 4
+MIN_CELL_KM = 0.05
+
+
+# ---------------------------------------------------
+# ÍNDICE ESPACIAL (MALLA UNIFORME LAT/LON)
+# Las celdas se recorren en anillos alrededor de la celda de consulta.
+# Los candidatos de cada anillo se evalúan con el kernel Haversine
+# (vectorizado si el anillo es grande) y la búsqueda termina cuando la
+# cota inferior del siguiente anillo supera al peor resultado. Las
+# distancias devueltas se recalculan con calculate_distance, así que no
+# dependen de si se usó numpy.
+# ---------------------------------------------------
+class SpatialIndex:
+
+    def __init__(self, lats, lons):
+        self.lats = [float(x) for x in lats]
+        self.lons = [float(x) for x in lons]
+        self.lat_col = as_column(self.lats)
+        self.lon_col = as_column(self.lons)
+        self.cells = {}
+        n = len(self.lats)
+
+        if n == 0:
+            self.min_lat = self.min_lon = 0.0
+            self.cell_lat = self.cell_lon = 1.0
+            self.rows = self.cols = 0
+            self.max_abs_lat = 0.0
+            return
+
+        self.min_lat = min(self.lats)
+        self.min_lon = min(self.lons)
+        max_lat = max(self.lats)
+        max_lon = max(self.lons)
+        self.max_abs_lat = max(abs(self.min_lat), abs(max_lat))
+
+        mid_cos = max(math.cos(math.radians((self.min_lat + max_lat) / 2)), 1e-6)
+        height_km = (max_lat - self.min_lat) * KM_PER_DEG_LAT
+        width_km = (max_lon - self.min_lon) * KM_PER_DEG_LAT * mid_cos
+        cell_km = max(math.sqrt(max(height_km * width_km, 0.0) * STOPS_PER_CELL / n), MIN_CELL_KM)
+
+        self.cell_lat = cell_km / KM_PER_DEG_LAT
+        self.cell_lon = self.cell_lat / mid_cos
+        self.rows = int((max_lat - self.min_lat) / self.cell_lat) + 1
+        self.cols = int((max_lon - self.min_lon) / self.cell_lon) + 1
+
+        for i, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            self.cells.setdefault(self._cell(lat, lon), []).append(i)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cell(self, lat, lon):
+        return (
+            math.floor((lat - self.min_lat) / self.cell_lat),
+            math.floor((lon - self.min_lon) / self.cell_lon),
+        )
+
+    def _ring(self, ci, cj, k):
+        # celdas con distancia de Chebyshev exactamente k, recortadas a la malla
+        i0, i1 = max(ci - k, 0), min(ci + k, self.rows - 1)
+        j0, j1 = max(cj - k, 0), min(cj + k, self.cols - 1)
+        if i0 > i1 or j0 > j1:
+            return
+        for i in range(i0, i1 + 1):
+            if i == ci - k or i == ci + k:
+                for j in range(j0, j1 + 1):
+                    yield (i, j)
+            else:
+                if cj - k >= j0:
+                    yield (i, cj - k)
+                if cj + k <= j1 and k > 0:
+                    yield (i, cj + k)
+
+    def _lower_bound_km(self, lat, k):
+        # distancia mínima a cualquier punto fuera de los anillos 0..k
+        if k <= 0:
+            return 0.0
+        by_lat = math.radians(k * self.cell_lat) * EARTH_RADIUS_KM
+        cos_max = math.cos(math.radians(min(max(self.max_abs_lat, abs(lat)), 90.0)))
+        half = min(math.radians(k * self.cell_lon) / 2, math.pi / 2)
+        by_lon = 2 * EARTH_RADIUS_KM * math.asin(min(cos_max * math.sin(half), 1.0))
+        return min(by_lat, by_lon)
+
+    def _first_ring(self, ci, cj):
+        # anillos vacíos cuando la consulta cae fuera de la malla
+        di = max(-ci, ci - (self.rows - 1), 0)
+        dj = max(-cj, cj - (self.cols - 1), 0)
+        return max(di, dj)
+
+    def _scan(self, lat, lon, accept):
+        ci, cj = self._cell(lat, lon)
+        last = max(ci, self.rows - 1 - ci, cj, self.cols - 1 - cj)
+        k = self._first_ring(ci, cj)
+        while k <= last:
+            ring = [idx for cell in self._ring(ci, cj, k) for idx in self.cells.get(cell, ())]
+            if ring:
+                dists = haversine_one_to_many(lat, lon, take(self.lat_col, ring), take(self.lon_col, ring))
+                for idx, d in zip(ring, dists):
+                    accept(idx, d)
+            yield k
+            k += 1
+
+    # ------------------------------
+    # CONSULTAS
+    # ------------------------------
+    def nearest(self, lat, lon):
+        result = self.k_nearest(lat, lon, 1)
+        return result[0] if result else (None, float("inf"))
+
+    def k_nearest(self, lat, lon, k):
+        """Devuelve [(idx, distancia_km)] ordenado por distancia (empates por índice)."""
+        if k <= 0 or not self.lats:
+            return []
+
+        # max-heap de tamaño k sobre (distancia, índice)
+        best = []
+
+        def accept(idx, d):
+            item = (-d, -idx)
+            if len(best) < k:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
+
+        for ring in self._scan(lat, lon, accept):
+            if len(best) == k and -best[0][0] < self._lower_bound_km(lat, ring):
+                break
+
+        return self._exact(lat, lon, [-i for _, i in best])
+
+    def within_radius(self, lat, lon, radius_km):
+        """Devuelve [(idx, distancia_km)] dentro del radio, ordenado por distancia."""
+        found = []
+
+        def accept(idx, d):
+            if d <= radius_km + PREFILTER_SLACK_KM:
+                found.append(idx)
+
+        for ring in self._scan(lat, lon, accept):
+            if self._lower_bound_km(lat, ring) > radius_km:
+                break
+
+        return [(idx, d) for idx, d in self._exact(lat, lon, found) if d <= radius_km]
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Índices dentro del rectángulo (bordes incluidos), en orden de índice."""
+        if not self.lats or min_lat > max_lat or min_lon > max_lon:
+            return []
+        i0, j0 = self._cell(min_lat, min_lon)
+        i1, j1 = self._cell(max_lat, max_lon)
+        i0, i1 = max(i0, 0), min(i1, self.rows - 1)
+        j0, j1 = max(j0, 0), min(j1, self.cols - 1)
+        lats, lons = self.lats, self.lons
+        found = [
+            idx
+            for i in range(i0, i1 + 1)
+            for j in range(j0, j1 + 1)
+            for idx in self.cells.get((i, j), ())
+            if min_lat <= lats[idx] <= max_lat and min_lon <= lons[idx] <= max_lon
+        ]
+        found.sort()
+        return found
+
+    def _exact(self, lat, lon, candidates):
+        # [(idx, distancia_km)] ordenado por (distancia, índice)
+        found = [(idx, calculate_distance(lat, lon, self.lats[idx], self.lons[idx])) for idx in candidates]
+        found.sort(key=lambda x: (x[1], x[0]))
+        return found
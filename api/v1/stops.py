@@ -0,0 +1,179 @@
+import sys
+from array import array
+
+from .helpers import calculate_distance
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+EARTH_RADIUS_KM = 6371.0
+
+# por debajo de este tamaño el ciclo escalar es más rápido que numpy
+VECTOR_MIN = 32
+# matriz puntos x paradas: celdas por bloque de filas, y a partir de cuántas
+# paradas conviene más el índice espacial por punto que la matriz completa
+MATRIX_BLOCK_CELLS = 1 << 20
+MATRIX_MAX_STOPS = 20000
+# margen del prefiltro vectorizado; el resultado final usa la distancia escalar
+PREFILTER_SLACK_KM = 1e-6
+# row_of es un arreglo denso solo si los ids son >= 0 y el mayor es menor
+# que este factor por el número de paradas; si no, un dict
+DENSE_IDS_FACTOR = 4
+
+
+# ---------------------------------------------------
+# KERNELS HAVERSINE
+# Misma fórmula que helpers.calculate_distance. Con numpy (opcional) se
+# evalúan por arreglos; sin numpy, o con pocos elementos, en un ciclo escalar.
+# Devuelven listas de floats.
+# ---------------------------------------------------
+def haversine_one_to_many(lat, lon, lats, lons):
+    """Distancias (km) de un punto a cada (lats[i], lons[i])."""
+    if np is None or len(lats) < VECTOR_MIN:
+        return [calculate_distance(lat, lon, la, lo) for la, lo in zip(lats, lons)]
+    return _haversine(lat, lon, np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)).tolist()
+
+
+def haversine_pairwise(lats1, lons1, lats2, lons2):
+    """Distancias (km) entre (lats1[i], lons1[i]) y (lats2[i], lons2[i])."""
+    if np is None or len(lats1) < VECTOR_MIN:
+        return [calculate_distance(a, b, c, d) for a, b, c, d in zip(lats1, lons1, lats2, lons2)]
+    return _haversine(
+        np.asarray(lats1, dtype=np.float64), np.asarray(lons1, dtype=np.float64),
+        np.asarray(lats2, dtype=np.float64), np.asarray(lons2, dtype=np.float64),
+    ).tolist()
+
+
+def haversine_many_to_many(lats1, lons1, lats2, lons2):
+    """Matriz numpy de distancias (km): fila i = punto i contra todos los demás (requiere numpy)."""
+    lat1 = np.asarray(lats1, dtype=np.float64)[:, None]
+    lon1 = np.asarray(lons1, dtype=np.float64)[:, None]
+    lat2 = np.asarray(lats2, dtype=np.float64)[None, :]
+    lon2 = np.asarray(lons2, dtype=np.float64)[None, :]
+    return _haversine(lat1, lon1, lat2, lon2)
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * (2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)))
+
+
+def as_column(values):
+    """Columna float64 contigua: arreglo numpy si está instalado, si no array("d")."""
+    column = array("d", values)
+    if np is not None:
+        return np.frombuffer(column, dtype=np.float64)
+    return column
+
+
+def take(column, rows):
+    if np is not None and isinstance(column, np.ndarray):
+        return column[np.asarray(rows, dtype=np.intp)]
+    return [column[i] for i in rows]
+
+
+# ---------------------------------------------------
+# ALMACÉN COLUMNAR DE PARADAS
+# Las paradas en columnas contiguas (fila = posición en paradas.json,
+# la misma que el índice del grafo compilado):
+#   lat / lon  float64
+#   ids        int64
+#   row_of     id -> fila: arreglo denso (-1 = no existe) si los ids son
+#              chicos y no negativos (ver DENSE_IDS_FACTOR); si no, dict
+#   names      nombres internados, por fila
+# Los dicts originales se conservan sin tocar para responder el mismo JSON
+# de siempre.
+# ---------------------------------------------------
+class StopStore:
+
+    __slots__ = ("stops", "ids", "row_of", "dense", "lat", "lon", "names")
+
+    def __init__(self, stops_data):
+        self.stops = stops_data
+        self.ids = array("q", (int(s["id"]) for s in stops_data))
+
+        # ids repetidos: gana el último, igual que un dict {id: parada}
+        ids = self.ids
+        self.dense = bool(ids) and min(ids) >= 0 and max(ids) < DENSE_IDS_FACTOR * len(ids)
+        if self.dense:
+            self.row_of = array("i", [-1]) * (max(ids) + 1)
+            for row, stop_id in enumerate(ids):
+                self.row_of[stop_id] = row
+        else:
+            self.row_of = {stop_id: row for row, stop_id in enumerate(ids)}
+
+        self.lat = as_column(float(s["latitud"]) for s in stops_data)
+        self.lon = as_column(float(s["longitud"]) for s in stops_data)
+
+        self.names = [
+            sys.intern(name) if isinstance(name, str) else name
+            for name in (s.get("nombre") for s in stops_data)
+        ]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, stop_id):
+        if not self.dense:
+            return self.row_of.get(stop_id)
+        if 0 <= stop_id < len(self.row_of):
+            row = self.row_of[stop_id]
+            return row if row >= 0 else None
+        return None
+
+    def by_id(self, stop_id):
+        """Dict de la parada (el mismo de paradas.json) o None."""
+        row = self.row(stop_id)
+        return None if row is None else self.stops[row]
+
+    def distances_from(self, lat, lon):
+        """Distancias (km) de un punto a todas las paradas, por fila."""
+        return haversine_one_to_many(lat, lon, self.lat, self.lon)
+
+    def path_steps(self, rows):
+        """Distancias (km) entre filas consecutivas de un recorrido."""
+        if len(rows) < 2:
+            return []
+        lat = take(self.lat, rows)
+        lon = take(self.lon, rows)
+        return haversine_pairwise(lat[:-1], lon[:-1], lat[1:], lon[1:])
+
+    def within_radius_many(self, points, radius_km, limit):
+        """
+        Para cada punto (lat, lon): [(fila, km)] dentro del radio, ordenado por
+        (distancia, fila) y recortado a limit; si no hay ninguna, la más cercana.
+        Igual que SpatialIndex.within_radius / nearest, pero con la matriz
+        puntos x paradas por bloques (requiere numpy). El prefiltro es
+        vectorizado y las distancias finales son las escalares de siempre.
+        """
+        n = len(self)
+        if not n:
+            return [[] for _ in points]
+
+        out = []
+        block = max(1, MATRIX_BLOCK_CELLS // n)
+        for start in range(0, len(points), block):
+            chunk = points[start:start + block]
+            matrix = haversine_many_to_many([p[0] for p in chunk], [p[1] for p in chunk], self.lat, self.lon)
+            for (lat, lon), dist in zip(chunk, matrix):
+                rows = np.flatnonzero(dist <= radius_km + PREFILTER_SLACK_KM).tolist()
+                found = self._exact(lat, lon, rows, radius_km)
+                if not found:
+                    rows = np.flatnonzero(dist <= dist.min() + PREFILTER_SLACK_KM).tolist()
+                    found = self._exact(lat, lon, rows)[:1]
+                out.append([(row, d) for d, row in found[:limit]])
+        return out
+
+    def _exact(self, lat, lon, rows, radius_km=float("inf")):
+        found = []
+        for row in rows:
+            d = calculate_distance(lat, lon, self.lat[row], self.lon[row])
+            if d <= radius_km:
+                found.append((d, row))
+        found.sort()
+        return found
@@ -0,0 +1,314 @@
+import heapq
+import mmap
+import os
+import struct
+from multiprocessing import Pool
+
+
+# ---------------------------------------------------
+# TABLA PRECALCULADA PARADA-PARADA
+# Archivo binario (little endian):
+#   cabecera: magic, versión, num_stops, num_routes, hash de los datos
+#   registros num_stops x num_stops (origen, destino):
+#     buses (0 = sin ruta), non_eje, ruta del siguiente salto,
+#     parada del siguiente salto, parada donde se vuelve a subir,
+#     minutos de viaje, km de bus
+#   el "siguiente salto" es (parada donde se baja, ruta que se toma);
+#   si sigue un transbordo a pie, la parada de subida es otra
+#   tramos dentro de cada ruta: paradas locales + matriz de siguiente parada
+# costo = (bus_count, non_eje_bus_count, minutos) igual que route_multi_stop
+# ---------------------------------------------------
+TABLE_MAGIC = b"MVKT"
+TABLE_VERSION = 2
+
+HEADER = struct.Struct("<4sHII32s")
+RECORD = struct.Struct("<BBHIIff")
+U32 = struct.Struct("<I")
+NO_NEXT = 0xFFFF
+
+
+class RoutingTable:
+
+    def __init__(self, mm, num_stops, num_routes):
+        self.mm = mm
+        self.num_stops = num_stops
+        self.num_routes = num_routes
+
+        # índice de los tramos por ruta (pequeño, se lee completo)
+        self.route_local = []
+        self.route_next_offset = []
+        offset = HEADER.size + num_stops * num_stops * RECORD.size
+        for _ in range(num_routes):
+            (n,) = U32.unpack_from(mm, offset)
+            offset += U32.size
+            stops = struct.unpack_from(f"<{n}I", mm, offset)
+            offset += 4 * n
+            self.route_local.append({s: i for i, s in enumerate(stops)})
+            self.route_next_offset.append((offset, stops))
+            offset += 2 * n * n
+
+        # un archivo escrito a medias o truncado no debe llegar a las búsquedas
+        if offset != len(mm):
+            raise ValueError("tamaño inesperado")
+
+    @classmethod
+    def open(cls, path, g, expected_hash):
+        """Abre la tabla con mmap; None si no existe o no coincide con los datos."""
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(mm) < HEADER.size:
+            mm.close()
+            return None
+
+        magic, version, num_stops, num_routes, data_hash = HEADER.unpack_from(mm, 0)
+        if (
+            magic != TABLE_MAGIC or version != TABLE_VERSION or
+            num_stops != g.num_stops or num_routes != g.num_routes or
+            data_hash != expected_hash
+        ):
+            print("Tabla de rutas desactualizada, se ignora:", path)
+            mm.close()
+            return None
+
+        try:
+            return cls(mm, num_stops, num_routes)
+        except (struct.error, ValueError):
+            print("Tabla de rutas dañada, se ignora:", path)
+            mm.close()
+            return None
+
+    def close(self):
+        """
+        Libera el mmap (al reemplazar la red). Una petición que todavía use
+        la red anterior ve la tabla vacía y sigue con la búsqueda normal.
+        """
+        mm, self.mm = self.mm, None
+        if mm is not None:
+            mm.close()
+
+    def lookup(self, a, b):
+        """(buses, non_eje, minutos, km, parada_salto, ruta_salto, parada_subida) o None."""
+        mm = self.mm
+        if mm is None:
+            return None
+        try:
+            buses, non_eje, route, stop, board, minutes, km = RECORD.unpack_from(
+                mm, HEADER.size + (a * self.num_stops + b) * RECORD.size
+            )
+        except ValueError:
+            # cerrada por una recarga entre la revisión y la lectura
+            return None
+        if buses == 0:
+            return None
+        return buses, non_eje, minutes, km, stop, route, board
+
+    def _ride(self, r, a, b):
+        mm = self.mm
+        if mm is None:
+            return None
+        offset, stops = self.route_next_offset[r]
+        local = self.route_local[r]
+        n = len(stops)
+        u, v = local[a], local[b]
+        ride = [a]
+        try:
+            while u != v:
+                (u,) = struct.unpack_from("<H", mm, offset + 2 * (u * n + v))
+                if u == NO_NEXT:
+                    return None
+                ride.append(stops[u])
+        except ValueError:
+            return None
+        return ride
+
+    def path(self, a, b):
+        """
+        Reconstruye [(stop_idx, route_idx)] siguiendo los saltos, sin búsqueda;
+        (stop_idx, None) = transbordo a pie hasta esa parada.
+        """
+        rec = self.lookup(a, b)
+        if rec is None:
+            return None
+
+        path = []
+        cur = a
+        for _ in range(rec[0]):
+            hop = self.lookup(cur, b)
+            if hop is None:
+                return None
+            stop, r, board = hop[4], hop[5], hop[6]
+            ride = self._ride(r, cur, stop)
+            if ride is None:
+                return None
+            path.extend((s, r) for s in (ride if not path else ride[1:]))
+            if stop == b:
+                return path
+            if board != stop:
+                path.append((board, None))
+            cur = board
+        return None
+
+
+# ---------------------------------------------------
+# CONSTRUCCIÓN
+# ---------------------------------------------------
+def _one_to_all(g, source, per_km, per_stop):
+    R = g.num_routes
+    foot_base = g.num_stops * R
+    is_eje = g.route_is_eje
+    adj_ptr, adj_stop, adj_route, adj_dist = g.adj_ptr, g.adj_stop, g.adj_route, g.adj_dist
+
+    pq = []
+    best = {}
+    km = {}
+    # primer tramo: (estado de bajada, parada donde se vuelve a subir)
+    # o None si aún no hay transbordo
+    lead = {}
+    done = {}
+    seeds = set()
+
+    for r in g.routes_at(source):
+        state = source * R + r
+        cost = (1, 0 if is_eje[r] else 1, 0.0)
+        best[state] = cost
+        km[state] = 0.0
+        lead[state] = None
+        seeds.add(state)
+        heapq.heappush(pq, (*cost, state))
+
+    def relax(nxt_state, nxt_cost, nxt_km, nxt_lead):
+        old = best.get(nxt_state)
+        if old is None or nxt_cost < old:
+            best[nxt_state] = nxt_cost
+            km[nxt_state] = nxt_km
+            lead[nxt_state] = nxt_lead
+            heapq.heappush(pq, (*nxt_cost, nxt_state))
+
+    while pq:
+        bus_c, non_eje_c, minutes, state = heapq.heappop(pq)
+        if best[state] < (bus_c, non_eje_c, minutes):
+            continue
+
+        if state >= foot_base:
+            # llegó caminando: el siguiente camión es un transbordo
+            cur, cur_r = state - foot_base, -1
+        else:
+            cur, cur_r = divmod(state, R)
+            if cur not in done:
+                first = lead[state]
+                if first is None:
+                    hop = (cur, cur_r, cur)
+                else:
+                    hop = (*divmod(first[0], R), first[1])
+                done[cur] = (bus_c, non_eje_c, minutes, km[state], hop)
+
+            if state not in seeds:
+                for nxt, _, walk_min in g.transfers(cur):
+                    relax(
+                        foot_base + nxt, (bus_c, non_eje_c, minutes + walk_min), km[state],
+                        lead[state] if lead[state] is not None else (state, nxt)
+                    )
+
+        lo = adj_ptr[cur]
+        hi = adj_ptr[cur + 1]
+        for nxt, r, step in zip(adj_stop[lo:hi], adj_route[lo:hi], adj_dist[lo:hi]):
+            nxt_minutes = minutes + step * per_km + per_stop
+            if r != cur_r:
+                nxt_cost = (bus_c + 1, non_eje_c + (0 if is_eje[r] else 1), nxt_minutes)
+            else:
+                nxt_cost = (bus_c, non_eje_c, nxt_minutes)
+
+            if lead[state] is not None:
+                nxt_lead = lead[state]
+            elif r == cur_r:
+                nxt_lead = None
+            else:
+                nxt_lead = (state, cur)
+            relax(nxt * R + r, nxt_cost, km[state] + step, nxt_lead)
+
+    row = bytearray(g.num_stops * RECORD.size)
+    empty = RECORD.pack(0, 0, 0, 0, 0, 0.0, 0.0)
+    for t in range(g.num_stops):
+        if t in done:
+            buses, non_eje, minutes, dist, (stop, r, board) = done[t]
+            rec = RECORD.pack(min(buses, 255), min(non_eje, 255), r, stop, board, minutes, dist)
+        else:
+            rec = empty
+        row[t * RECORD.size:(t + 1) * RECORD.size] = rec
+    return bytes(row)
+
+
+def _route_next_matrix(g, r, per_km, per_stop):
+    stops = sorted({
+        g.pattern_stops[k]
+        for p in g.patterns_of(r)
+        for k in range(g.pattern_ptr[p], g.pattern_ptr[p + 1])
+    })
+    local = {s: i for i, s in enumerate(stops)}
+    n = len(stops)
+    nxt = [NO_NEXT] * (n * n)
+
+    for u in range(n):
+        nxt[u * n + u] = u
+        dist = {u: 0.0}
+        first = {}
+        pq = [(0.0, u)]
+        while pq:
+            d, cur = heapq.heappop(pq)
+            if d > dist[cur]:
+                continue
+            for s, rr, step in g.neighbors(stops[cur]):
+                if rr != r or s not in local:
+                    continue
+                v = local[s]
+                nd = d + step * per_km + per_stop
+                if nd < dist.get(v, float("inf")):
+                    dist[v] = nd
+                    first[v] = v if cur == u else first[cur]
+                    heapq.heappush(pq, (nd, v))
+        for v, hop in first.items():
+            nxt[u * n + v] = hop
+
+    return stops, nxt
+
+
+_worker_args = None
+
+
+def _init_worker(g, per_km, per_stop):
+    global _worker_args
+    _worker_args = (g, per_km, per_stop)
+
+
+def _worker_row(source):
+    g, per_km, per_stop = _worker_args
+    return _one_to_all(g, source, per_km, per_stop)
+
+
+def build_routing_table(path, g, data_hash, per_km, per_stop, processes=None):
+    """Escribe la tabla completa; processes > 1 reparte los orígenes en procesos."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(TABLE_MAGIC, TABLE_VERSION, g.num_stops, g.num_routes, data_hash))
+
+        sources = range(g.num_stops)
+        if processes and processes > 1:
+            with Pool(processes, initializer=_init_worker, initargs=(g, per_km, per_stop)) as pool:
+                for row in pool.imap(_worker_row, sources, chunksize=8):
+                    f.write(row)
+        else:
+            for source in sources:
+                f.write(_one_to_all(g, source, per_km, per_stop))
+
+        for r in range(g.num_routes):
+            stops, nxt = _route_next_matrix(g, r, per_km, per_stop)
+            f.write(U32.pack(len(stops)))
+            f.write(struct.pack(f"<{len(stops)}I", *stops))
+            f.write(struct.pack(f"<{len(nxt)}H", *nxt))
+
+    # reemplazo atómico: el API nunca ve un archivo a medias
+    os.replace(tmp_path, path)
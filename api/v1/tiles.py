@@ -0,0 +1,181 @@
+import math
+
+from .cache import LRUCache
+from .catalog import PreparedResponse
+
+TILE_SIZE_PX = 256
+MAX_MERCATOR_LAT = 85.05112878
+
+
+# ---------------------------------------------------
+# TESELAS DEL MAPA (Web Mercator, esquema z/x/y de OSM / Google)
+# Cada tesela lleva sus paradas (adelgazadas según el zoom) y los tramos
+# de ruta que la cruzan, unidos en líneas por ruta:
+#   {"ok": true,
+#    "stops": [parada, ...],
+#    "segments": [{"ruta": nombre, "isEje": bool, "coords": [[lat, lon], ...]}]}
+# Nada se arma al cargar la red: cada tesela se arma la primera vez que
+# se pide y queda ya serializada (PreparedResponse: ETag + gzip / br) en
+# un LRU; las vacías comparten una sola respuesta. Para los zooms de
+# indexed_zooms, la primera tesela de ese zoom reparte de una vez todas
+# las paradas y tramos por tesela (sin serializar nada); en los demás se
+# buscan en el rectángulo de la tesela.
+#
+# Adelgazado: con zoom < thin_max_zoom queda una parada por celda de
+# cell_px píxeles del mundo a ese zoom (la que tiene más rutas; en empate,
+# la de menor índice). Las celdas dividen exacto a las teselas, así que
+# /paradas?bbox= y /tiles dan las mismas paradas.
+# ---------------------------------------------------
+def world_pixel(lat, lon, zoom):
+    scale = TILE_SIZE_PX * (1 << zoom)
+    lat = max(min(lat, MAX_MERCATOR_LAT), -MAX_MERCATOR_LAT)
+    s = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0 * scale
+    y = (0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def tile_bounds(z, x, y):
+    """(min_lat, min_lon, max_lat, max_lon) de la tesela."""
+    n = 1 << z
+    min_lon = x / n * 360.0 - 180.0
+    max_lon = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def thin(indices, px, py, weight, zoom, cell_px, max_zoom):
+    """
+    Índices que quedan al zoom dado, en orden; sin zoom o desde max_zoom, todos.
+    px / py: píxel del mundo de cada parada a zoom 0.
+    """
+    if zoom is None or zoom >= max_zoom:
+        return list(indices)
+    cell = cell_px / (1 << zoom)
+    best = {}
+    for i in indices:
+        key = (int(px[i] // cell), int(py[i] // cell))
+        cur = best.get(key)
+        if cur is None or (-weight[i], i) < (-weight[cur], cur):
+            best[key] = i
+    return sorted(best.values())
+
+
+class TileSet:
+
+    def __init__(self, g, stops_data, spatial_index, indexed_zooms, max_zoom,
+                 cache_size, cell_px, thin_max_zoom):
+        self.g = g
+        self.stops_data = stops_data
+        self.spatial_index = spatial_index
+        self.max_zoom = max_zoom
+        self.cell_px = cell_px
+        self.thin_max_zoom = thin_max_zoom
+        self.weight = [len(g.routes_at(i)) for i in range(g.num_stops)]
+        # píxel del mundo a zoom 0; a zoom z es este por 2**z
+        pixels = [world_pixel(g.lat[i], g.lon[i], 0) for i in range(g.num_stops)]
+        self.px = [p[0] for p in pixels]
+        self.py = [p[1] for p in pixels]
+        self.segments = self._route_segments()
+        self.empty = PreparedResponse({"ok": True, "stops": [], "segments": []})
+
+        self.first_zoom, self.last_zoom = indexed_zooms
+        # zoom -> {(x, y): (paradas, tramos)}
+        self.by_zoom = {}
+        self.cache = LRUCache(cache_size)
+
+    def _route_segments(self):
+        # (ruta, a, b) en el orden de los recorridos, sin repetir el mismo tramo
+        g = self.g
+        seen = set()
+        out = []
+        for p, r in enumerate(g.pattern_route):
+            stops = g.pattern_stops[g.pattern_ptr[p]:g.pattern_ptr[p + 1]]
+            for a, b in zip(stops, stops[1:]):
+                key = (r, min(a, b), max(a, b))
+                if key not in seen:
+                    seen.add(key)
+                    out.append((r, a, b))
+        return out
+
+    def valid(self, z, x, y):
+        return 0 <= z <= self.max_zoom and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+    def get(self, z, x, y):
+        """PreparedResponse de la tesela (después de valid)."""
+        key = (z, x, y)
+        prepared = self.cache.get(key)
+        if prepared is None:
+            if self.first_zoom <= z <= self.last_zoom:
+                prepared = self._from_index(z, x, y)
+            else:
+                prepared = self._build_tile(z, x, y)
+            self.cache.put(key, prepared)
+        return prepared
+
+    def _from_index(self, z, x, y):
+        tiles = self.by_zoom.get(z)
+        if tiles is None:
+            # dos peticiones a la vez pueden armarlo las dos: da lo mismo
+            tiles = self.by_zoom[z] = self._index_zoom(z)
+        found = tiles.get((x, y))
+        if found is None:
+            return self.empty
+        return self._prepare(z, *found)
+
+    def _index_zoom(self, z):
+        size = TILE_SIZE_PX / (1 << z)
+        tx = [int(x // size) for x in self.px]
+        ty = [int(y // size) for y in self.py]
+        stops = {}
+        for i in range(self.g.num_stops):
+            stops.setdefault((tx[i], ty[i]), []).append(i)
+
+        segments = {}
+        for seg in self.segments:
+            _, a, b = seg
+            x0, x1 = (tx[a], tx[b]) if tx[a] <= tx[b] else (tx[b], tx[a])
+            y0, y1 = (ty[a], ty[b]) if ty[a] <= ty[b] else (ty[b], ty[a])
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    segments.setdefault((x, y), []).append(seg)
+
+        return {key: (stops.get(key, ()), segments.get(key, ())) for key in stops.keys() | segments.keys()}
+
+    def _build_tile(self, z, x, y):
+        g = self.g
+        min_lat, min_lon, max_lat, max_lon = tile_bounds(z, x, y)
+        inside = self.spatial_index.within_bbox(min_lat, min_lon, max_lat, max_lon)
+        segments = [
+            seg for seg in self.segments
+            if min(g.lat[seg[1]], g.lat[seg[2]]) <= max_lat and max(g.lat[seg[1]], g.lat[seg[2]]) >= min_lat
+            and min(g.lon[seg[1]], g.lon[seg[2]]) <= max_lon and max(g.lon[seg[1]], g.lon[seg[2]]) >= min_lon
+        ]
+        if not inside and not segments:
+            return self.empty
+        return self._prepare(z, inside, segments)
+
+    def _prepare(self, z, stop_indices, segments):
+        g = self.g
+        kept = thin(stop_indices, self.px, self.py, self.weight, z, self.cell_px, self.thin_max_zoom)
+
+        # tramos consecutivos de la misma ruta en una sola línea
+        lines = []
+        last = None
+        for r, a, b in segments:
+            if last is not None and last[0] == r and last[1] == a:
+                lines[-1]["coords"].append([g.lat[b], g.lon[b]])
+            else:
+                lines.append({
+                    "ruta": g.route_names[r],
+                    "isEje": g.route_is_eje[r],
+                    "coords": [[g.lat[a], g.lon[a]], [g.lat[b], g.lon[b]]],
+                })
+            last = (r, b)
+
+        return PreparedResponse({
+            "ok": True,
+            "stops": [self.stops_data[i] for i in kept],
+            "segments": lines,
+        })
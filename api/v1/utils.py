@@ -1,91 +1,278 @@
-import math
+import hashlib
 import heapq
-import unicodedata
-import re
-from collections import defaultdict
-from itertools import count
-
-from .data import stops_data, routes_data, WALK_KMH, BUS_KMH, DWELL_SECONDS_PER_STOP
+import subprocess
+import sys
+import threading
+import time
+
+from .data import (
+    PARADAS_JSON, RUTAS_JSON, PERFILES_JSON, NETWORK_SNAPSHOT,
+    WALK_KMH, BUS_KMH, DWELL_SECONDS_PER_STOP,
+    WALK_RADIUS_KM, MAX_ACCESS_STOPS, ROUTING_ENGINE, HIERARCHY_MAX_BUSES,
+    ROUTING_TABLE, TABLE_REBUILD_PROCESSES, ROUTE_CACHE_SIZE, COORD_SNAP_DEG, RELOAD_INTERVAL_S,
+    TRANSFER_WALK_KM, MAX_TRANSFERS_PER_STOP, ALTERNATIVES_EXTRA_BUSES,
+    THIN_CELL_PX, THIN_MAX_ZOOM, TILE_MAX_ZOOM, TILE_INDEXED_ZOOMS, TILE_CACHE_SIZE,
+    GEOMETRY_ZOOMS, GEOMETRY_TOLERANCE_PX,
+    load_json, dataset_hash, dataset_signature, snapshot_hash,
+)
+from .helpers import is_eje_route
+from .spatial import SpatialIndex
+from .stops import StopStore, MATRIX_MAX_STOPS, np
+from .raptor import raptor_search
+from .pareto import pareto_search
+from .reach import reach_search
+from .astar import INF, min_buses_search, break_tie, bidirectional_search
+from .routegraph import RouteGraph
+from .hierarchy import hierarchical_search
+from .tiles import TileSet, thin
+from .geometry import RouteGeometry
+from .profiles import MINUTES_PER_DAY, constant_profiles, load_profiles
+from .table import RoutingTable, TABLE_VERSION
+from .cache import LRUCache
+from .snapshot import compile_network, read_snapshot
+from .search import RouteNameIndex
+from .batch import shutdown_executor
+from . import metrics
 
 
 # ---------------------------------------------------
-# NORMALIZACIÓN
+# CARGA DE LA RED
+# Del snapshot binario si está al día; si no, se compila desde los JSON.
+# Todo lo que depende de los datos vive en un solo objeto Network.
 # ---------------------------------------------------
-def normalize_text(text: str) -> str:
-    text = (text or "").lower()
-    text = unicodedata.normalize("NFD", text)
-    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+def routing_table_hash():
+    return dataset_hash(
+        TABLE_VERSION, BUS_KMH, DWELL_SECONDS_PER_STOP,
+        TRANSFER_WALK_KM, MAX_TRANSFERS_PER_STOP, WALK_KMH,
+    )
 
 
-def is_eje_route(route_name: str) -> bool:
-    t = normalize_text(route_name)
-    return ("troncal" in t) or ("eje" in t)
+def _load_json_or_empty(path, label):
+    try:
+        return load_json(path)
+    except Exception as e:
+        print(f"Error al cargar {label}:", e)
+        return []
 
 
-# ---------------------------------------------------
-# DISTANCIA (KM)
-# ---------------------------------------------------
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = (
-        math.sin(dlat / 2) ** 2 +
-        math.cos(math.radians(lat1)) *
-        math.cos(math.radians(lat2)) *
-        math.sin(dlon / 2) ** 2
+def compile_from_json(strict=False):
+    """strict: un JSON ilegible lanza la excepción en lugar de dejar la red vacía."""
+    if strict:
+        stops_data, routes_data = load_json(PARADAS_JSON), load_json(RUTAS_JSON)
+    else:
+        stops_data = _load_json_or_empty(PARADAS_JSON, "paradas")
+        routes_data = _load_json_or_empty(RUTAS_JSON, "rutas")
+    return compile_network(
+        stops_data, routes_data,
+        transfer_km=TRANSFER_WALK_KM,
+        max_transfers=MAX_TRANSFERS_PER_STOP,
+        walk_kmh=WALK_KMH,
     )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
 
 
-# ---------------------------------------------------
-# MAPAS Y GRAFO
-# ---------------------------------------------------
-stops_by_id = {int(s["id"]): s for s in stops_data}
-stop_to_routes = defaultdict(set)
-graph = defaultdict(list)
-
-for ruta in routes_data:
-    ruta_name = ruta.get("nombre", "")
-    seq = [int(x) for x in ruta.get("paradas", [])]
+def _load_profiles(route_names, strict=False):
+    if strict:
+        return load_profiles(PERFILES_JSON, route_names, BUS_KMH)
+    try:
+        return load_profiles(PERFILES_JSON, route_names, BUS_KMH)
+    except Exception as e:
+        print("Error al cargar perfiles:", e)
+        return constant_profiles(len(route_names), BUS_KMH)
+
+
+def load_network(strict=False):
+    data_hash = snapshot_hash()
+    net = read_snapshot(NETWORK_SNAPSHOT, data_hash)
+    if net is None:
+        net = compile_from_json(strict)
+
+    # los perfiles no entran al snapshot ni a la tabla, pero sí a la versión
+    net.profiles = _load_profiles(net.compiled.route_names, strict)
+    net.version = hashlib.sha256(data_hash + net.profiles.digest).hexdigest()[:12]
+    net.stop_store = StopStore(net.stops_data)
+    net.spatial_index = SpatialIndex(net.stop_store.lat, net.stop_store.lon)
+    net.route_graph = RouteGraph(net.compiled, BUS_KMH, DWELL_SECONDS_PER_STOP)
+    net.table_hash = routing_table_hash()
+    net.routing_table = RoutingTable.open(ROUTING_TABLE, net.compiled, net.table_hash)
+    net.route_name_index = RouteNameIndex(net.stops_data)
+    net.tiles = TileSet(
+        net.compiled, net.stops_data, net.spatial_index, TILE_INDEXED_ZOOMS,
+        TILE_MAX_ZOOM, TILE_CACHE_SIZE, THIN_CELL_PX, THIN_MAX_ZOOM,
+    )
+    net.route_geometry = RouteGeometry(net.routes_data, net.stops_data, GEOMETRY_ZOOMS, GEOMETRY_TOLERANCE_PX)
+    return net
 
-    for sid in seq:
-        stop_to_routes[sid].add(ruta_name)
 
-    for a, b in zip(seq, seq[1:]):
-        if a != b:
-            graph[a].append((b, ruta_name))
-            graph[b].append((a, ruta_name))
+# ---------------------------------------------------
+# RED ACTIVA (RECARGA EN CALIENTE)
+# Cada petición toma la red una sola vez (current_network) y la usa
+# hasta terminar; una recarga construye la nueva fuera de las peticiones
+# y la publica con una sola asignación.
+# ---------------------------------------------------
+_signature = dataset_signature()
+_network = load_network()
+_reload_lock = threading.Lock()
+_watcher = None
+
+# (versión de la red, origins, targets, engine, salida) -> (bus_segments, exacto)
+route_cache = LRUCache(ROUTE_CACHE_SIZE)
+
+
+def current_network():
+    return _network
+
+
+def reload_network(force=False):
+    """
+    Vuelve a cargar la red si paradas.json, rutas.json o perfiles.json cambiaron
+    (o siempre, con force). Devuelve (red activa, se_reemplazó).
+    """
+    global _network, _signature
+    with _reload_lock:
+        signature = dataset_signature()
+        if not force and signature == _signature:
+            return _network, False
+
+        # un archivo roto se reporta una vez; se reintenta al volver a cambiar
+        _signature = signature
+        net = load_network(strict=True)
+        if net.version == _network.version and not force:
+            return _network, False
+
+        old, _network = _network, net
+        if old.routing_table is not None:
+            old.routing_table.close()
+            if net.routing_table is None:
+                _table_outdated()
+        # los procesos del lote se crearon con la red anterior
+        shutdown_executor()
+        # tramos y estadísticas de la red anterior ya no sirven
+        route_cache.clear()
+        return net, True
 
 
-def distance_between_stops_km(a_id, b_id):
-    a = stops_by_id.get(a_id)
-    b = stops_by_id.get(b_id)
-    if not a or not b:
+# ---------------------------------------------------
+# RECONSTRUCCIÓN DE LA TABLA
+# Si la red anterior tenía tabla y la nueva no (cambiaron los datos), se
+# reconstruye en otro proceso (scripts/build_routing_table.py, sin fork
+# de este proceso con hilos) y al terminar se abre y se publica en la red
+# activa; mientras tanto se usa la búsqueda. Si la red volvió a cambiar
+# durante la reconstrucción, se repite para la nueva.
+# ---------------------------------------------------
+_table_builder = None
+
+
+def _table_outdated():
+    global _table_builder
+    if TABLE_REBUILD_PROCESSES <= 0:
+        print("Tabla de rutas desactualizada; se usa la búsqueda hasta reconstruirla "
+              "(python -m scripts.build_routing_table)")
+        return
+    if _table_builder is not None and _table_builder.is_alive():
+        return
+    _table_builder = threading.Thread(target=_rebuild_table, name="routing-table-builder", daemon=True)
+    _table_builder.start()
+
+
+def _rebuild_table():
+    while True:
+        net = _network
+        if net.routing_table is not None:
+            return
+        print("Reconstruyendo la tabla de rutas, versión", net.version)
+        done = subprocess.run(
+            [sys.executable, "-m", "scripts.build_routing_table",
+             "--salida", ROUTING_TABLE, "--procesos", str(TABLE_REBUILD_PROCESSES)],
+            capture_output=True, text=True,
+        )
+        if done.returncode != 0:
+            print("Error al reconstruir la tabla de rutas:", done.stderr.strip()[-500:])
+            return
+        with _reload_lock:
+            if _network is not net:
+                continue
+            # la tabla se armó con los archivos actuales: debe coincidir con esta red
+            net.routing_table = RoutingTable.open(ROUTING_TABLE, net.compiled, net.table_hash)
+            if net.routing_table is None:
+                print("La tabla reconstruida no corresponde a la red activa; se usa la búsqueda")
+            else:
+                print("Tabla de rutas reconstruida, versión", net.version)
+            return
+
+
+def _watch(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            net, swapped = reload_network()
+            if swapped:
+                print("Red recargada, versión", net.version)
+        except Exception as e:
+            print("Error al recargar la red:", e)
+
+
+def start_network_watcher(interval=RELOAD_INTERVAL_S):
+    """Hilo que revisa los JSON cada `interval` segundos (0 = no iniciar)."""
+    global _watcher
+    if interval <= 0 or _watcher is not None:
+        return
+    _watcher = threading.Thread(target=_watch, args=(interval,), name="network-watcher", daemon=True)
+    _watcher.start()
+
+
+def distance_between_stops_km(net, a_id, b_id):
+    store = net.stop_store
+    a = store.row(a_id)
+    b = store.row(b_id)
+    if a is None or b is None:
         return 0.0
-    return calculate_distance(
-        a["latitud"], a["longitud"],
-        b["latitud"], b["longitud"]
-    )
+    return store.distance_rows(a, b)
 
 
 # ---------------------------------------------------
 # PARADAS CERCANAS
 # ---------------------------------------------------
-def closest_stop(latitude, longitude):
-    closest = None
-    min_distance = float("inf")
+def closest_stop(net, latitude, longitude):
+    idx, distance = net.spatial_index.nearest(latitude, longitude)
+    if idx is None:
+        return None, distance
+    return net.stops_data[idx], distance
+
+
+def nearest_stops(net, latitude, longitude, k):
+    return [(net.stops_data[i], d) for i, d in net.spatial_index.k_nearest(latitude, longitude, k)]
+
+
+def stops_within_radius(net, latitude, longitude, radius_km):
+    return [(net.stops_data[i], d) for i, d in net.spatial_index.within_radius(latitude, longitude, radius_km)]
 
-    for stop in stops_data:
-        d = calculate_distance(latitude, longitude, stop["latitud"], stop["longitud"])
-        if d < min_distance:
-            min_distance = d
-            closest = stop
 
-    return closest, min_distance
+def stops_in_bbox(net, min_lat, min_lon, max_lat, max_lon, zoom=None):
+    """
+    Paradas dentro del rectángulo, adelgazadas como las teselas si viene zoom.
+    Devuelve (paradas, cuántas hay en el rectángulo sin adelgazar).
+    """
+    inside = net.spatial_index.within_bbox(min_lat, min_lon, max_lat, max_lon)
+    tiles = net.tiles
+    kept = thin(inside, tiles.px, tiles.py, tiles.weight, zoom, THIN_CELL_PX, THIN_MAX_ZOOM)
+    return [net.stops_data[i] for i in kept], len(inside)
+
+
+def snap_coordinate(value, step=COORD_SNAP_DEG):
+    return round(round(value / step) * step, 6)
+
+
+def access_stops(net, latitude, longitude, radius_km=WALK_RADIUS_KM, limit=MAX_ACCESS_STOPS):
+    """
+    Paradas a distancia caminable de un punto: [(stop, walk_km)].
+    Siempre incluye la más cercana aunque quede fuera del radio.
+    """
+    candidates = stops_within_radius(net, latitude, longitude, radius_km)[:limit]
+    if not candidates:
+        stop, distance = closest_stop(net, latitude, longitude)
+        if stop:
+            candidates = [(stop, distance)]
+    return candidates
 
 
 # ---------------------------------------------------
@@ -105,112 +292,549 @@ def reconstruct_path(came_from, goal_state):
 # ---------------------------------------------------
 # SEGMENTS
 # ---------------------------------------------------
-def build_bus_segments(path_states):
+def build_bus_segments(net, path_states):
+    """
+    Tramos de camión del camino [(stop_id, bus)]. bus None = se llegó
+    caminando desde la parada anterior (transbordo a pie): el tramo en
+    curso termina antes y el siguiente empieza en la parada de llegada.
+    "steps": km de cada arista del tramo (para los tiempos por franja).
+    """
     if not path_states:
         return []
 
+    store = net.stop_store
     segments = []
 
+    def close_segment():
+        segments.append({
+            "bus": current_bus,
+            "isEje": is_eje_route(current_bus),
+            "from_stop": store.by_id(seg_start_id),
+            "to_stop": store.by_id(seg_last_id),
+            "distance_km": seg_distance,
+            "stops_count": seg_stops_count,
+            "steps": seg_steps
+        })
+
+    # todas las distancias del camino en una sola llamada al kernel
+    steps = store.path_steps([store.row(stop_id) for stop_id, _ in path_states])
+
     current_bus = path_states[0][1]
     seg_start_id = path_states[0][0]
     seg_last_id = path_states[0][0]
     seg_distance = 0.0
     seg_stops_count = 1
+    seg_steps = []
+
+    for (prev_id, prev_bus), (cur_id, cur_bus), step in zip(path_states, path_states[1:], steps):
 
-    for (prev_id, prev_bus), (cur_id, cur_bus) in zip(path_states, path_states[1:]):
-        step = distance_between_stops_km(prev_id, cur_id)
-
-        if cur_bus != current_bus:
-            segments.append({
-                "bus": current_bus,
-                "isEje": is_eje_route(current_bus),
-                "from_stop": stops_by_id[seg_start_id],
-                "to_stop": stops_by_id[seg_last_id],
-                "distance_km": seg_distance,
-                "stops_count": seg_stops_count
-            })
+        if cur_bus is None:
+            close_segment()
+            current_bus = None
+        elif cur_bus != current_bus:
+            if current_bus is not None:
+                close_segment()
             current_bus = cur_bus
             seg_start_id = prev_id
             seg_last_id = cur_id
             seg_distance = step
             seg_stops_count = 2
+            seg_steps = [step]
         else:
             seg_last_id = cur_id
             seg_distance += step
             seg_stops_count += 1
+            seg_steps.append(step)
 
-    segments.append({
-        "bus": current_bus,
-        "isEje": is_eje_route(current_bus),
-        "from_stop": stops_by_id[seg_start_id],
-        "to_stop": stops_by_id[seg_last_id],
-        "distance_km": seg_distance,
-        "stops_count": seg_stops_count
-    })
+    if current_bus is not None:
+        close_segment()
 
     return segments
 
 
 # ---------------------------------------------------
 # RUTA ÓPTIMA A*
+# costo = (bus_count, non_eje_bus_count, distancia_km)
+# estado = entero del grafo compilado (parada, ruta)
+#   o foot_base + parada: a pie, aún sin camión (origen o transbordo a pie);
+#   solo se camina después de viajar en un camión y no se llega así al destino
+# engine: "dijkstra" (por defecto) o "raptor", mismo resultado
+# "dijkstra" es A* dirigido por el grafo de rutas (astar.py).
+# Si no hay camino, un Dijkstra completo da la aproximación de siempre.
 # ---------------------------------------------------
-def route_min_buses_prefer_ejes(start_id, end_id):
+def route_min_buses_prefer_ejes(net, start_id, end_id, engine=None):
+    g = net.compiled
+    start = g.stop_index.get(start_id)
+    goal = g.stop_index.get(end_id)
+    if start is None or goal is None:
+        return None
+
+    if (engine or ROUTING_ENGINE) == "raptor":
+        path, _ = raptor_search(g, {start: 0.0}, {goal: 0.0}, approx_goal=goal)
+        return _indices_to_path(g, path)
+
+    if start == goal:
+        return _path_to_state(g, {}, g.num_stops * g.num_routes + start)
+
+    came_from, state, _ = min_buses_search(g, start, goal, net.route_graph)
+    if state is not None:
+        return _path_to_state(g, came_from, state)
+
+    # sin camino: Dijkstra completo para la aproximación
+    came_from, _, first_pop = min_buses_search(g, start, goal)
+
+    # CLAVE: parada alcanzada más cercana al destino
+    if first_pop:
+        closest = _closest_reached(net, first_pop, goal)
+        return _path_to_state(g, came_from, first_pop[closest])
+
+    return None
+
+
+# ---------------------------------------------------
+# RUTA MULTI-PARADA
+# Un solo Dijkstra desde todas las paradas de origen hacia todas las de destino.
+# costo = (bus_count, non_eje_bus_count, minutos)
+# minutos = caminata inicial + tramos de bus + transbordos a pie + caminata final
+# origins / targets: [(stop_id, walk_km)]
+# Devuelve (path_states, exacto) o (None, False)
+# Con la tabla precalculada disponible se usa por defecto (sin búsqueda);
+# si no hay par alcanzable se recurre a la búsqueda para la aproximación.
+# engine "rutas": ruteo jerárquico (hierarchy.py) para viajes de hasta
+# HIERARCHY_MAX_BUSES camiones; los demás siguen con Dijkstra.
+# engine "bidireccional": búsqueda desde los dos extremos (astar.py), mismo
+# costo; sin camino sigue con Dijkstra para la aproximación.
+# departure (minutos desde las 00:00): velocidad y espera de los perfiles
+# en la franja de la hora en que se recorre cada arista (siempre Dijkstra;
+# la tabla, RAPTOR y el jerárquico usan el modelo constante; los endpoints
+# responden 400 si se pide otro motor con salida).
+# ---------------------------------------------------
+def route_multi_stop(net, origins, targets, engine=None, departure=None):
+    g = net.compiled
+    bus_min_per_km = minutes_from_km(1.0, BUS_KMH)
+    dwell_min = DWELL_SECONDS_PER_STOP / 60.0
+
+    # las paradas a un transbordo a pie de las candidatas también sirven
+    # (si no, habría que subir a un camión solo para poder caminar)
+    seeds = _with_transfers(g, _walk_minutes_by_index(g, origins))
+    egress = _with_transfers(g, _walk_minutes_by_index(g, targets))
+
+    engine = engine or ("tabla" if net.routing_table else ROUTING_ENGINE)
+    if departure is not None:
+        engine = "dijkstra"
+
+    if engine == "tabla":
+        path = _route_from_table(net.routing_table, seeds, egress)
+        if path:
+            return _indices_to_path(g, path), True
+        engine = "dijkstra"
+
+    if engine == "rutas":
+        states = hierarchical_search(g, net.route_graph, seeds, egress, HIERARCHY_MAX_BUSES)
+        if states is not None:
+            return _states_to_path(g, states), True
+        engine = "dijkstra"
+
+    if engine == "bidireccional":
+        states = bidirectional_search(g, net.route_graph, seeds, egress, bus_min_per_km, dwell_min)
+        if states is not None:
+            return _states_to_path(g, states), True
+        engine = "dijkstra"
+
+    if engine == "raptor":
+        path, exact = raptor_search(
+            g, seeds, egress,
+            per_km=bus_min_per_km, per_stop=dwell_min,
+            per_walk_km=minutes_from_km(1.0, WALK_KMH),
+            approx_goal=g.stop_index.get(targets[0][0]) if targets else None
+        )
+        return _indices_to_path(g, path), exact
+
+    came_from, arrival, _ = _multi_stop_search(net, seeds, egress, departure, net.route_graph)
+    if arrival is not None:
+        return _path_to_state(g, came_from, arrival), True
+
+    # sin llegada exacta: parada alcanzada más cercana al mejor destino
+    # (la búsqueda dirigida descarta lo que no llega: se repite sin cotas)
+    goal = g.stop_index.get(targets[0][0]) if targets else None
+    if goal is not None:
+        came_from, _, first_pop = _multi_stop_search(net, seeds, egress, departure)
+        if first_pop:
+            closest = _closest_reached(net, first_pop, goal)
+            return _path_to_state(g, came_from, first_pop[closest]), False
+
+    return None, False
+
+
+# ---------------------------------------------------
+# BÚSQUEDA MULTI-PARADA
+# Sin route_graph es Dijkstra y anota el primer estado extraído de cada
+# parada (first_pop, para la aproximación). Con route_graph es A*, como
+# la búsqueda parada-parada (astar.py): el heap se ordena por el costo
+# más la cota de camiones que faltan (saltos en el grafo de rutas hasta
+# alguna ruta de las paradas de destino; 0 en esas rutas). La cota es
+# consistente, así que la primera llegada que sale del heap es la misma
+# que con Dijkstra; en los empates se conserva el predecesor que
+# elegiría Dijkstra (break_tie) y el camino es idéntico. Los estados
+# sin forma de llegar ni entran al heap.
+# Devuelve (came_from, estado de llegada o None, first_pop o None).
+# ---------------------------------------------------
+def _multi_stop_search(net, seeds, egress, departure=None, route_graph=None):
+    g = net.compiled
+    R = g.num_routes
+    foot_base = g.num_stops * R
+    is_eje = g.route_is_eje
+    adj_ptr, adj_stop, adj_route, adj_dist = g.adj_ptr, g.adj_stop, g.adj_route, g.adj_dist
+
+    bus_min_per_km = minutes_from_km(1.0, BUS_KMH)
+    dwell_min = DWELL_SECONDS_PER_STOP / 60.0
+    if departure is not None:
+        profiles = net.profiles
+        band_of_minute, per_km, wait = profiles.band_of_minute, profiles.per_km, profiles.wait
+
+    directed = route_graph is not None
+    if directed:
+        buses_lb = route_graph.buses_to_any(egress)
+        edge_routes = route_graph.edge_routes
+        foot_lb = {}
+
+        def foot_bound(i):
+            # a pie solo se puede subir a una ruta de la parada
+            b = foot_lb.get(i)
+            if b is None:
+                b = foot_lb[i] = 1 + min((buses_lb[r] for r in edge_routes[i]), default=INF)
+            return b
+
     pq = []
     came_from = {}
     best_cost = {}
-    best_approx_state = None
-    best_approx_dist = float("inf")
-    tie = count()
-
-    for bus in stop_to_routes.get(start_id, []):
-        non_eje = 0 if is_eje_route(bus) else 1
-        state = (start_id, bus)
-        cost = (1, non_eje, 0.0)
-        best_cost[state] = cost
-        heapq.heappush(pq, (cost, next(tie), state))
+    closed = set()
+    first_pop = None if directed else {}
+    pops = 0
+    arrival = None
+
+    # origen: a pie en cada parada candidata
+    for i, walk_min in seeds.items():
+        state = foot_base + i
+        best_cost[state] = (0, 0, walk_min)
+        lb = foot_bound(i) if directed else 0
+        if lb < INF:
+            heapq.heappush(pq, (lb, 0, walk_min, state))
+
+        # parada que también es destino: subir y bajar ahí (1 camión, 0 paradas)
+        r = g.board_route(i)
+        if i in egress and r is not None:
+            heapq.heappush(pq, (1, 0 if is_eje[r] else 1, walk_min + egress[i], -state - 1))
 
     while pq:
-        (bus_c, non_eje_c, dist), _, (cur_id, cur_bus) = heapq.heappop(pq)
+        state = heapq.heappop(pq)[3]
+        pops += 1
+
+        # estado virtual de llegada: ya incluye la caminata final
+        if state < 0:
+            arrival = -state - 1
+            break
+
+        if state in closed:
+            continue
+        closed.add(state)
+        bus_c, non_eje_c, minutes = best_cost[state]
+
+        if state >= foot_base:
+            cur, cur_r = state - foot_base, -1
+            # origen a pie: solo sirve de aproximación si ahí se puede subir
+            if not directed and state not in came_from and cur not in first_pop and g.board_route(cur) is not None:
+                first_pop[cur] = state
+        else:
+            cur, cur_r = divmod(state, R)
+
+            if not directed and cur not in first_pop:
+                first_pop[cur] = state
+
+            if cur in egress:
+                heapq.heappush(pq, (bus_c, non_eje_c, minutes + egress[cur], -state - 1))
+
+            for nxt, _, walk_min in g.transfers(cur):
+                nxt_state = foot_base + nxt
+                nxt_cost = (bus_c, non_eje_c, minutes + walk_min)
+                old = best_cost.get(nxt_state)
+                if old is None or nxt_cost < old:
+                    if directed:
+                        lb = foot_bound(nxt)
+                        if lb == INF:
+                            continue
+                        key = (bus_c + lb, non_eje_c, nxt_cost[2], nxt_state)
+                    else:
+                        key = (*nxt_cost, nxt_state)
+                    best_cost[nxt_state] = nxt_cost
+                    came_from[nxt_state] = state
+                    heapq.heappush(pq, key)
+                elif directed and nxt_cost == old:
+                    break_tie(came_from, best_cost, nxt_state, state)
+
+        if departure is not None:
+            base = band_of_minute[int(departure + minutes) % MINUTES_PER_DAY] * R
+
+        lo = adj_ptr[cur]
+        hi = adj_ptr[cur + 1]
+        for nxt, r, step in zip(adj_stop[lo:hi], adj_route[lo:hi], adj_dist[lo:hi]):
+            if departure is None:
+                nxt_minutes = minutes + step * bus_min_per_km + dwell_min
+            else:
+                # al subir (origen o transbordo) se espera media frecuencia
+                nxt_minutes = minutes + step * per_km[base + r] + dwell_min
+                if r != cur_r:
+                    nxt_minutes += wait[base + r]
+            if r != cur_r:
+                nxt_cost = (bus_c + 1, non_eje_c + (0 if is_eje[r] else 1), nxt_minutes)
+            else:
+                nxt_cost = (bus_c, non_eje_c, nxt_minutes)
+
+            nxt_state = nxt * R + r
+            old = best_cost.get(nxt_state)
+            if old is None or nxt_cost < old:
+                if directed:
+                    lb = buses_lb[r]
+                    if lb == INF:
+                        continue
+                    key = (nxt_cost[0] + lb, nxt_cost[1], nxt_cost[2], nxt_state)
+                else:
+                    key = (*nxt_cost, nxt_state)
+                best_cost[nxt_state] = nxt_cost
+                came_from[nxt_state] = state
+                heapq.heappush(pq, key)
+            elif directed and nxt_cost == old:
+                break_tie(came_from, best_cost, nxt_state, state)
 
-        cur_stop = stops_by_id[cur_id]
-        end_stop = stops_by_id[end_id]
+    # todo lo que entró al heap salió (pops) o sigue ahí
+    metrics.count(pops=pops, pushes=pops + len(pq), expanded=len(closed))
+    return came_from, arrival, first_pop
 
-        d = calculate_distance(
-            cur_stop["latitud"], cur_stop["longitud"],
-            end_stop["latitud"], end_stop["longitud"]
-        )
 
-        if d < best_approx_dist:
-            best_approx_dist = d
-            best_approx_state = (cur_id, cur_bus)
+# ---------------------------------------------------
+# ALTERNATIVAS (FRENTE DE PARETO)
+# Una sola búsqueda multicriterio sobre (camiones, camiones no eje,
+# minutos, caminata); mismas paradas candidatas y transbordos que
+# route_multi_stop. Devuelve hasta k caminos [(stop_id, bus)] en ese
+# orden, sin repetir la misma secuencia de camiones (se queda la primera,
+# la mejor de ellas); la primera es la ruta de route_multi_stop.
+# ---------------------------------------------------
+def route_alternatives(net, origins, targets, k, departure=None):
+    g = net.compiled
+    seeds = _with_transfers(g, _walk_minutes_by_index(g, origins))
+    egress = _with_transfers(g, _walk_minutes_by_index(g, targets))
+
+    front = pareto_search(
+        g, seeds, egress,
+        per_km=minutes_from_km(1.0, BUS_KMH),
+        per_stop=DWELL_SECONDS_PER_STOP / 60.0,
+        per_walk_km=minutes_from_km(1.0, WALK_KMH),
+        max_extra_buses=ALTERNATIVES_EXTRA_BUSES,
+        profiles=None if departure is None else net.profiles,
+        departure=departure,
+    )
 
-        if cur_id == end_id:
-            return reconstruct_path(came_from, (cur_id, cur_bus))
+    alternatives = []
+    seen = set()
+    for _, states in front:
+        path = _states_to_path(g, states)
+        if not path:
+            continue
+        buses = _bus_sequence(path)
+        if buses in seen:
+            continue
+        seen.add(buses)
+        alternatives.append(path)
+        if len(alternatives) == k:
+            break
+    return alternatives
+
+
+def _bus_sequence(path):
+    # camiones en orden, como los tramos de build_bus_segments
+    buses = []
+    prev = None
+    for _, bus in path:
+        if bus is not None and bus != prev:
+            buses.append(bus)
+        prev = bus
+    return tuple(buses)
 
-        for nxt_id, nxt_bus in graph.get(cur_id, []):
-            add_bus = 1 if nxt_bus != cur_bus else 0
-            add_non_eje = 0 if is_eje_route(nxt_bus) else 1 if add_bus else 0
-            step = distance_between_stops_km(cur_id, nxt_id)
 
-            nxt_state = (nxt_id, nxt_bus)
-            nxt_cost = (
-                bus_c + add_bus,
-                non_eje_c + add_non_eje,
-                dist + step
-            )
+# ---------------------------------------------------
+# ALCANCE (ISÓCRONA)
+# Todas las paradas alcanzables desde un punto en a lo más budget minutos
+# y max_buses camiones, con una sola búsqueda uno-a-todos.
+# Mismas paradas de acceso, transbordos y costos que route_multi_stop.
+# ---------------------------------------------------
+def reachable_stops(net, latitude, longitude, budget, max_buses, radius_km=WALK_RADIUS_KM, departure=None):
+    """[(stop, minutos, camiones, ruta o None)] ordenado por (minutos, id)."""
+    g = net.compiled
+    origins = [(int(stop["id"]), d) for stop, d in access_stops(net, latitude, longitude, radius_km)]
+    seeds = _with_transfers(g, _walk_minutes_by_index(g, origins))
+
+    reached = reach_search(
+        g, seeds, budget, max_buses,
+        per_km=minutes_from_km(1.0, BUS_KMH),
+        per_stop=DWELL_SECONDS_PER_STOP / 60.0,
+        profiles=None if departure is None else net.profiles,
+        departure=departure,
+    )
 
-            if nxt_cost < best_cost.get(nxt_state, (1e9, 1e9, 1e9)):
-                best_cost[nxt_state] = nxt_cost
-                came_from[nxt_state] = (cur_id, cur_bus)
-                heapq.heappush(pq, (nxt_cost, next(tie), nxt_state))
+    out = [
+        (net.stops_data[i], minutes, bus_c, None if r is None else g.route_names[r])
+        for i, (minutes, bus_c, r) in reached.items()
+    ]
+    out.sort(key=lambda x: (x[1], int(x[0]["id"])))
+    return out
 
-    # CLAVE
-    if best_approx_state:
-        return reconstruct_path(came_from, best_approx_state)
 
-    return None
+def _closest_reached(net, reached, goal):
+    # distancias al destino de todas las paradas en una sola llamada al kernel
+    store = net.stop_store
+    dist = store.distances_from(store.lat[goal], store.lon[goal])
+    return min(reached, key=dist.__getitem__)
+
+
+def _walk_minutes_by_index(g, stops):
+    out = {}
+    for stop_id, walk_km in stops:
+        i = g.stop_index.get(stop_id)
+        if i is not None:
+            out[i] = min(out.get(i, float("inf")), minutes_from_km(walk_km, WALK_KMH))
+    return out
+
+
+def _with_transfers(g, walk_minutes):
+    out = dict(walk_minutes)
+    for i, walk_min in walk_minutes.items():
+        for nxt, _, transfer_min in g.transfers(i):
+            if walk_min + transfer_min < out.get(nxt, float("inf")):
+                out[nxt] = walk_min + transfer_min
+    return out
+
+
+def _route_from_table(routing_table, seeds, egress):
+    if routing_table is None:
+        return None
+
+    best = None
+    for o, walk_in in seeds.items():
+        for t, walk_out in egress.items():
+            rec = routing_table.lookup(o, t)
+            if rec is None:
+                continue
+            cand = (rec[0], rec[1], walk_in + rec[2] + walk_out, o, t)
+            if best is None or cand < best:
+                best = cand
+
+    if best is None:
+        return None
+    return routing_table.path(best[3], best[4])
 
 
+def _path_to_state(g, came_from, state):
+    return _states_to_path(g, reconstruct_path(came_from, state))
+
+
+def _states_to_path(g, states):
+    R = g.num_routes
+    foot_base = g.num_stops * R
+    path = [(s - foot_base, None) if s >= foot_base else divmod(s, R) for s in states]
+    # el origen a pie se aborda con la ruta del primer tramo;
+    # sin tramos, se sube y se queda en la misma parada
+    if path[0][1] is None:
+        r = path[1][1] if len(path) > 1 else g.board_route(path[0][0])
+        if r is None:
+            return None
+        path[0] = (path[0][0], r)
+    return _indices_to_path(g, path)
+
+
+def _indices_to_path(g, path):
+    if path is None:
+        return None
+    return [(g.stop_ids[i], None if r is None else g.route_names[r]) for i, r in path]
+
+
+# ---------------------------------------------------
+# TRAMOS CON CACHE
+# La clave es el par (paradas de origen, paradas de destino) con sus
+# caminatas; con coordenadas ajustadas a la malla, peticiones cercanas
+# comparten la misma entrada. Incluye la versión de la red: tras una
+# recarga las entradas anteriores ya no se encuentran.
+# ---------------------------------------------------
+def route_cache_key(net, origins, targets, engine=None, departure=None):
+    return (net.version, tuple(origins), tuple(targets), engine, departure)
+
+
+def store_bus_segments(net, key, path_states, exact):
+    with metrics.phase("tramos"):
+        result = (build_bus_segments(net, path_states) if path_states else None, exact)
+    route_cache.put(key, result)
+    return result
+
+
+def cached_bus_segments(net, origins, targets, engine=None, departure=None):
+    key = route_cache_key(net, origins, targets, engine, departure)
+    hit = route_cache.get(key)
+    if hit is not None:
+        return hit
+
+    with metrics.phase("busqueda"):
+        path_states, exact = route_multi_stop(net, origins, targets, engine=engine, departure=departure)
+    return store_bus_segments(net, key, path_states, exact)
+
+
+def cached_alternatives(net, origins, targets, k, departure=None):
+    """[bus_segments] de hasta k alternativas; misma cache que los tramos."""
+    key = route_cache_key(net, origins, targets, ("alternativas", k), departure)
+    hit = route_cache.get(key)
+    if hit is not None:
+        return hit
+
+    with metrics.phase("busqueda"):
+        paths = route_alternatives(net, origins, targets, k, departure)
+    with metrics.phase("tramos"):
+        result = [build_bus_segments(net, path) for path in paths]
+    route_cache.put(key, result)
+    return result
+
+
+def trip_stop_candidates(net, i_lat, i_lon, d_lat, d_lon, radius_km=WALK_RADIUS_KM, snap=False):
+    """Paradas candidatas [(stop_id, walk_km)] de origen y destino."""
+    if snap:
+        i_lat, i_lon = snap_coordinate(i_lat), snap_coordinate(i_lon)
+        d_lat, d_lon = snap_coordinate(d_lat), snap_coordinate(d_lon)
+
+    origins = [(int(stop["id"]), walk) for stop, walk in access_stops(net, i_lat, i_lon, radius_km)]
+    targets = [(int(stop["id"]), walk) for stop, walk in access_stops(net, d_lat, d_lon, radius_km)]
+    return origins, targets
+
+
+def batch_stop_candidates(net, trips, radius_km=WALK_RADIUS_KM, snap=False):
+    """
+    trip_stop_candidates para muchos viajes [(i_lat, i_lon, d_lat, d_lon)].
+    Con numpy y una red no muy grande, una matriz puntos x paradas en lugar
+    de una consulta al índice espacial por punto; mismo resultado.
+    """
+    store = net.stop_store
+    if np is None or len(store) > MATRIX_MAX_STOPS:
+        return [trip_stop_candidates(net, *trip, radius_km, snap=snap) for trip in trips]
+
+    points = []
+    for i_lat, i_lon, d_lat, d_lon in trips:
+        if snap:
+            i_lat, i_lon = snap_coordinate(i_lat), snap_coordinate(i_lon)
+            d_lat, d_lon = snap_coordinate(d_lat), snap_coordinate(d_lon)
+        points.append((i_lat, i_lon))
+        points.append((d_lat, d_lon))
+
+    found = store.within_radius_many(points, radius_km, MAX_ACCESS_STOPS)
+    ids = store.ids
+    candidates = [[(ids[row], walk) for row, walk in rows] for rows in found]
+    return list(zip(candidates[0::2], candidates[1::2]))
+
 
 # ---------------------------------------------------
 # ESTIMATION
@@ -220,8 +844,12 @@ def minutes_from_km(distance_km, speed_kmh):
         return 0.0
     return (distance_km / speed_kmh) * 60.0
 
-def estimate_bus_minutes(distance_km, stops_count):
-    ride_minutes = minutes_from_km(distance_km, BUS_KMH)
+def estimate_bus_minutes(distance_km, stops_count, per_km=None):
+    """per_km: minutos por km del perfil horario (None = BUS_KMH)."""
+    if per_km is None:
+        ride_minutes = minutes_from_km(distance_km, BUS_KMH)
+    else:
+        ride_minutes = distance_km * per_km
     dwell_minutes = ((max(stops_count - 1, 0)) * DWELL_SECONDS_PER_STOP) / 60.0
     return ride_minutes + dwell_minutes
 
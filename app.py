@@ -2,9 +2,10 @@ from flask import Flask, render_template
 from flask_cors import CORS
 
 from api.v1.endpoints import api_v1
+from api.v1.utils import start_network_watcher
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["ETag"])
 
 app.register_blueprint(api_v1, url_prefix="/api/v1")
 
@@ -18,4 +19,7 @@ def index():
 
 
 if __name__ == "__main__":
+    # recarga paradas.json / rutas.json sin reiniciar (RELOAD_INTERVAL_S);
+    # no al importar: los procesos del modo ASGI importan esta app
+    start_network_watcher()
     app.run(debug=True)
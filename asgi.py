@@ -0,0 +1,13 @@
+"""
+Punto de entrada ASGI (opcional): la misma app de app.py detrás de un event loop.
+
+    pip install uvicorn
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+Las búsquedas van a un pool acotado de procesos; catálogos y paradas se
+responden en el loop (ver api/v1/asgi.py).
+"""
+from app import app as flask_app
+from api.v1.asgi import AsgiApp
+
+app = AsgiApp(flask_app)
@@ -9,15 +9,52 @@ import '../models/summary_model.dart';
 class ApiService {
   static const String baseUrl = 'https://movikoox.vercel.app/api/v1';
 
+  // Catálogos en memoria validados con ETag (If-None-Match -> 304)
+  static String? _paradasEtag;
+  static List<Parada>? _paradasCache;
+  static String? _rutasEtag;
+  static List<Ruta>? _rutasCache;
+
+  static Map<String, String> _ifNoneMatch(String? etag) =>
+      etag == null ? const {} : {'If-None-Match': etag};
+
   // -------------------------
   // PARADAS
   // -------------------------
 
   static Future<List<Parada>> getParadas() async {
-    final response = await http.get(Uri.parse('$baseUrl/paradas'));
-    final data = jsonDecode(response.body);
+    final response = await http.get(
+      Uri.parse('$baseUrl/paradas'),
+      headers: _ifNoneMatch(_paradasEtag),
+    );
+
+    if (response.statusCode == 304 && _paradasCache != null) {
+      return _paradasCache!;
+    }
 
-    return List<Parada>.from(data.map((e) => Parada.fromJson(e)));
+    final Map<String, dynamic> json = jsonDecode(response.body);
+    final List<dynamic> body = json['body'];
+
+    _paradasCache = body.map<Parada>((e) => Parada.fromJson(e)).toList();
+    _paradasEtag = response.headers['etag'];
+    return _paradasCache!;
+  }
+
+  // Solo las paradas dentro del mapa (adelgazadas según el zoom)
+  static Future<List<Parada>> getParadasEnVista({
+    required double minLon,
+    required double minLat,
+    required double maxLon,
+    required double maxLat,
+    required int zoom,
+  }) async {
+    final response = await http.get(Uri.parse(
+      '$baseUrl/paradas?bbox=$minLon,$minLat,$maxLon,$maxLat&zoom=$zoom',
+    ));
+
+    final Map<String, dynamic> json = jsonDecode(response.body);
+    final List<dynamic> body = json['body'];
+    return body.map<Parada>((e) => Parada.fromJson(e)).toList();
   }
 
   static Future<Parada> getParadaById(String id) async {
@@ -49,12 +86,21 @@ class ApiService {
   // RUTAS
   // -------------------------
   static Future<List<Ruta>> getRutas() async {
-    final response = await http.get(Uri.parse('$baseUrl/rutas'));
+    final response = await http.get(
+      Uri.parse('$baseUrl/rutas'),
+      headers: _ifNoneMatch(_rutasEtag),
+    );
+
+    if (response.statusCode == 304 && _rutasCache != null) {
+      return _rutasCache!;
+    }
+
     final Map<String, dynamic> json = jsonDecode(response.body);
 
     final List<dynamic> body = json['body'];
 
-    return body.map<Ruta>((rutaJson) {
+    _rutasEtag = response.headers['etag'];
+    return _rutasCache = body.map<Ruta>((rutaJson) {
       return Ruta(
         nombre: rutaJson['nombre'],
         paradas: (rutaJson['paradas'] as List)
@@ -77,15 +123,25 @@ class ApiService {
     final uri = Uri.parse(
       '$baseUrl/instrucciones'
       '?inicio=$inicioLat,$inicioLon'
-      '&destino=$destinoLat,$destinoLon',
+      '&destino=$destinoLat,$destinoLon'
+      '&formato=compacto&campos=nombre,latitud,longitud',
     );
 
     final response = await http.get(uri);
     final json = jsonDecode(response.body);
 
+    // formato compacto: las instrucciones traen el id de la parada
+    final stops = <dynamic, dynamic>{
+      for (final s in json['stops'] ?? []) s['id']: s,
+    };
+
     return {
       'instructions': List<Instruction>.from(
-        json['instructions'].map((e) => Instruction.fromJson(e)),
+        json['instructions'].map((e) => Instruction.fromJson({
+              ...e,
+              if (e['from_stop'] != null) 'from_stop': stops[e['from_stop']],
+              if (e['to_stop'] != null) 'to_stop': stops[e['to_stop']],
+            })),
       ),
       'summary': Summary.fromJson(json['summary']),
     };
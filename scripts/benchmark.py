@@ -0,0 +1,388 @@
+"""
+Suite de benchmarks del ruteo y de los endpoints sobre los datos reales de db/.
+
+Genera cargas reproducibles (viajes origen-destino aleatorios con semilla fija)
+y reporta p50 / p95 / p99 y throughput de:
+  - funciones calientes: closest_stop, route_min_buses_prefer_ejes,
+    build_bus_segments
+  - endpoints completos con el cliente de pruebas de Flask:
+    /instrucciones, /rutas y /paradas/bus/<name>
+
+Uso (desde la raíz del proyecto):
+    python -m scripts.benchmark [--requests 500] [--seed 42] [--json salida.json]
+    python -m scripts.benchmark --target legacy        # last_app.py
+    python -m scripts.benchmark --compare-legacy       # api/v1 vs last_app.py
+    python -m scripts.benchmark --compare HEAD~3 .     # dos revisiones de git
+
+En --compare cada revisión se extrae con `git archive` a un directorio temporal
+y se mide en su propio proceso ("." = el árbol de trabajo actual). Las cargas
+salen solo de db/paradas.json y db/rutas.json, así que son las mismas en ambas
+mientras los datos no cambien.
+"""
+import argparse
+import importlib
+import inspect
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SCRIPT = os.path.abspath(__file__)
+
+# paso de la malla de jitter alrededor de una parada (~300 m)
+JITTER_DEG = 0.003
+WARMUP = 20
+
+
+# ---------------------------------------------------
+# CARGAS REPRODUCIBLES
+# ---------------------------------------------------
+def build_workload(root, n, seed):
+    # misma carpeta de datos que api/v1/data.py (MOVIKOOX_DATA_DIR)
+    data_dir = os.path.join(root, os.environ.get("MOVIKOOX_DATA_DIR", "db"))
+    with open(os.path.join(data_dir, "paradas.json"), encoding="utf-8") as f:
+        stops = json.load(f)
+    with open(os.path.join(data_dir, "rutas.json"), encoding="utf-8") as f:
+        routes = json.load(f)
+
+    rnd = random.Random(seed)
+    ids = [int(s["id"]) for s in stops]
+
+    def point():
+        s = rnd.choice(stops)
+        return (
+            round(s["latitud"] + rnd.uniform(-JITTER_DEG, JITTER_DEG), 6),
+            round(s["longitud"] + rnd.uniform(-JITTER_DEG, JITTER_DEG), 6),
+        )
+
+    # nombres completos, solo el número y un fragmento, como los escribe la app
+    names = []
+    for r in routes:
+        name = r.get("nombre", "")
+        names.append(name)
+        digits = "".join(c for c in name if c.isdigit())
+        if digits:
+            names.append(digits)
+        names.append(name.split()[-1] if name.split() else name)
+
+    total = n + WARMUP
+    return {
+        "points": [point() for _ in range(total)],
+        "pairs": [(rnd.choice(ids), rnd.choice(ids)) for _ in range(total)],
+        "trips": [point() + point() for _ in range(total)],
+        "bus_names": [rnd.choice(names) for _ in range(total)],
+        "stops": stops,
+        "routes": routes,
+    }
+
+
+# ---------------------------------------------------
+# OBJETIVOS: api/v1 (cualquier revisión) o last_app.py
+# Adaptan las firmas: desde que existe la red como objeto las funciones
+# reciben net como primer argumento.
+# ---------------------------------------------------
+class Target:
+
+    def __init__(self, name, module, client, prefix, net=None):
+        self.name = name
+        self.module = module
+        self.client = client
+        self.prefix = prefix
+        self.net = net
+
+    def call(self, fn_name, *args):
+        fn = getattr(self.module, fn_name)
+        if self.net is not None:
+            return fn(self.net, *args)
+        return fn(*args)
+
+    def has_endpoint(self, rule):
+        return any(r.rule == self.prefix + rule for r in self.client.application.url_map.iter_rules())
+
+
+def load_target(kind):
+    from flask import Flask
+
+    if kind == "legacy":
+        legacy = importlib.import_module("last_app")
+        return Target("last_app.py", legacy, legacy.app.test_client(), "")
+
+    utils = importlib.import_module("api.v1.utils")
+    endpoints = importlib.import_module("api.v1.endpoints")
+    app = Flask("benchmark")
+    app.register_blueprint(endpoints.api_v1, url_prefix="/api/v1")
+
+    net = None
+    if "net" in inspect.signature(utils.closest_stop).parameters:
+        net = utils.current_network()
+    return Target("api/v1", utils, app.test_client(), "/api/v1", net)
+
+
+# ---------------------------------------------------
+# MEDICIÓN
+# ---------------------------------------------------
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(int(len(sorted_values) * p / 100.0), len(sorted_values) - 1)
+    return sorted_values[k]
+
+
+def measure(fn, items):
+    for args in items[:WARMUP]:
+        fn(*args)
+
+    items = items[WARMUP:]
+    latencies = []
+    start = time.perf_counter()
+    for args in items:
+        t0 = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "n": len(items),
+        "p50_ms": round(percentile(latencies, 50), 4),
+        "p95_ms": round(percentile(latencies, 95), 4),
+        "p99_ms": round(percentile(latencies, 99), 4),
+        "mean_ms": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+        "ops_per_s": round(len(items) / total, 1) if total else 0.0,
+    }
+
+
+def get_ok(client, url):
+    response = client.get(url)
+    # 404 es válido (sin ruta / sin paradas); cualquier otro error invalida la medición
+    if response.status_code not in (200, 304, 404):
+        raise RuntimeError(f"{url} -> {response.status_code}")
+    return response
+
+
+def run_suite(target, workload):
+    results = {}
+
+    results["closest_stop"] = measure(
+        lambda lat, lon: target.call("closest_stop", lat, lon),
+        workload["points"],
+    )
+    results["route_min_buses_prefer_ejes"] = measure(
+        lambda a, b: target.call("route_min_buses_prefer_ejes", a, b),
+        workload["pairs"],
+    )
+
+    # caminos ya calculados, fuera de la medición
+    paths = []
+    for a, b in workload["pairs"]:
+        path = target.call("route_min_buses_prefer_ejes", a, b)
+        if path:
+            paths.append((path,))
+    results["build_bus_segments"] = measure(
+        lambda path: target.call("build_bus_segments", path),
+        paths,
+    )
+
+    client, prefix = target.client, target.prefix
+    if target.has_endpoint("/instrucciones"):
+        results["GET /instrucciones"] = measure(
+            lambda a, b, c, d: get_ok(client, f"{prefix}/instrucciones?inicio={a},{b}&destino={c},{d}"),
+            workload["trips"],
+        )
+    if target.has_endpoint("/rutas"):
+        results["GET /rutas"] = measure(
+            lambda: get_ok(client, f"{prefix}/rutas"),
+            [()] * len(workload["trips"]),
+        )
+    if target.has_endpoint("/paradas/bus/<name>"):
+        results["GET /paradas/bus/<name>"] = measure(
+            lambda name: get_ok(client, f"{prefix}/paradas/bus/{name}"),
+            [(name,) for name in workload["bus_names"]],
+        )
+    return results
+
+
+def git_revision(root):
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=root,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def max_rss_mb():
+    """Memoria residente máxima del proceso (MB); None si no se puede medir."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def benchmark(root, kind, n, seed, label=None):
+    workload = build_workload(root, n, seed)
+    t0 = time.perf_counter()
+    target = load_target(kind)
+    load_s = time.perf_counter() - t0
+    load_rss = max_rss_mb()
+    results = run_suite(target, workload)
+    return {
+        "meta": {
+            "label": label or target.name,
+            "target": target.name,
+            "revision": git_revision(root),
+            "stops": len(workload["stops"]),
+            "routes": len(workload["routes"]),
+            "load_s": round(load_s, 3),
+            "load_rss_mb": load_rss,
+            "max_rss_mb": max_rss_mb(),
+            "requests": n,
+            "seed": seed,
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+# ---------------------------------------------------
+# COMPARACIÓN
+# ---------------------------------------------------
+# generados e ignorados por git; cada versión los valida con su hash y los ignora si no le sirven
+GENERATED = ("db/network.snapshot", "db/routing_table.bin")
+
+
+def export_revision(repo, rev, dest):
+    """Extrae rev con git archive (sin tocar el árbol de trabajo) más los archivos generados."""
+    archive = subprocess.run(["git", "archive", "--format=tar", rev], cwd=repo, capture_output=True, check=True)
+    tar_path = os.path.join(dest, "rev.tar")
+    with open(tar_path, "wb") as f:
+        f.write(archive.stdout)
+    with tarfile.open(tar_path) as tar:
+        tar.extractall(dest)
+    os.remove(tar_path)
+
+    for path in GENERATED:
+        src = os.path.join(repo, path)
+        if os.path.exists(src) and os.path.isdir(os.path.dirname(os.path.join(dest, path))):
+            shutil.copyfile(src, os.path.join(dest, path))
+
+
+def run_isolated(root, kind, n, seed, label):
+    """Corre la suite en otro proceso con root como raíz del proyecto."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        out = tmp.name
+    try:
+        subprocess.run(
+            [sys.executable, SCRIPT, "--root", root, "--target", kind,
+             "--requests", str(n), "--seed", str(seed), "--label", label, "--json", out, "--quiet"],
+            check=True,
+        )
+        with open(out, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(out)
+
+
+def compare_revisions(repo, revs, n, seed):
+    reports = []
+    with tempfile.TemporaryDirectory(prefix="movikoox-bench-") as tmp:
+        for i, rev in enumerate(revs):
+            if rev == ".":
+                root = repo
+            else:
+                root = os.path.join(tmp, str(i))
+                os.makedirs(root)
+                export_revision(repo, rev, root)
+            report = run_isolated(root, "api", n, seed, rev)
+            if rev != ".":
+                # el directorio extraído no es un repo
+                report["meta"]["revision"] = rev
+            reports.append(report)
+    return reports
+
+
+def print_report(report):
+    meta = report["meta"]
+    print(
+        f"# {meta['label']} (rev {meta['revision']}, n={meta['requests']}, seed={meta['seed']}) "
+        f"{meta['stops']} paradas, {meta['routes']} rutas, carga {meta['load_s']}s, "
+        f"RSS máx {meta['max_rss_mb']} MB"
+    )
+    for name, r in report["results"].items():
+        print(
+            f"{name:<30} n={r['n']:<6} "
+            f"p50={r['p50_ms']:8.3f}ms p95={r['p95_ms']:8.3f}ms p99={r['p99_ms']:8.3f}ms "
+            f"{r['ops_per_s']:9.1f} ops/s"
+        )
+
+
+def print_comparison(base, other):
+    print(f"# {base['meta']['label']} -> {other['meta']['label']} (p50 / p99, ratio < 1 = más rápido)")
+    for name, a in base["results"].items():
+        b = other["results"].get(name)
+        if b is None:
+            print(f"{name:<30} (solo en {base['meta']['label']})")
+            continue
+        ratio50 = b["p50_ms"] / a["p50_ms"] if a["p50_ms"] else float("nan")
+        ratio99 = b["p99_ms"] / a["p99_ms"] if a["p99_ms"] else float("nan")
+        print(
+            f"{name:<30} p50 {a['p50_ms']:8.3f} -> {b['p50_ms']:8.3f}ms (x{ratio50:5.2f})  "
+            f"p99 {a['p99_ms']:8.3f} -> {b['p99_ms']:8.3f}ms (x{ratio99:5.2f})"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="mediciones por benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--target", choices=("api", "legacy"), default="api")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "OTRA"), help="dos revisiones de git ('.' = árbol actual)")
+    parser.add_argument("--compare-legacy", action="store_true", help="last_app.py contra api/v1")
+    parser.add_argument("--json", help="escribe el reporte en este archivo")
+    parser.add_argument("--root", default=os.getcwd(), help=argparse.SUPPRESS)
+    parser.add_argument("--label", help=argparse.SUPPRESS)
+    parser.add_argument("--quiet", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+
+    if args.compare:
+        reports = compare_revisions(root, args.compare, args.requests, args.seed)
+    elif args.compare_legacy:
+        reports = [
+            run_isolated(root, "legacy", args.requests, args.seed, "last_app.py"),
+            run_isolated(root, "api", args.requests, args.seed, "api/v1"),
+        ]
+    else:
+        # rutas relativas (db/...) y módulos de la raíz del proyecto
+        os.chdir(root)
+        sys.path.insert(0, root)
+        reports = [benchmark(root, args.target, args.requests, args.seed, args.label)]
+
+    if not args.quiet:
+        for report in reports:
+            print_report(report)
+        if len(reports) == 2:
+            print_comparison(*reports)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports[0] if len(reports) == 1 else {"reports": reports}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compara la latencia de los motores de búsqueda (Dijkstra vs RAPTOR, y la
+tabla precalculada si existe) sobre los datos reales de db/.
+
+También cuenta los estados por consulta, con y sin la cota del grafo de
+rutas: parada-parada (Dijkstra sin cota, como era antes: sin descartar
+entradas viejas del heap se expandía cada extracción) y multi-parada
+(la búsqueda de /instrucciones).
+
+Uso (desde la raíz del proyecto):
+    python -m scripts.benchmark_engines [--pairs 2000] [--seed 42]
+"""
+import argparse
+import random
+import time
+
+from api.v1 import metrics
+from api.v1.astar import min_buses_search
+from api.v1.data import ROUTING_ENGINES, WALK_RADIUS_KM
+from api.v1 import utils
+from api.v1.utils import (
+    current_network,
+    access_stops,
+    route_min_buses_prefer_ejes,
+    route_multi_stop,
+)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(int(len(sorted_values) * p / 100.0), len(sorted_values) - 1)
+    return sorted_values[k]
+
+
+def run(label, fn, workload):
+    latencies = []
+    start = time.perf_counter()
+    for args in workload:
+        t0 = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+    total = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{label:<26} n={len(workload):<6} "
+        f"p50={percentile(latencies, 50):7.3f}ms "
+        f"p95={percentile(latencies, 95):7.3f}ms "
+        f"p99={percentile(latencies, 99):7.3f}ms "
+        f"total={total:6.2f}s"
+    )
+
+
+def count_states(label, fn, workload):
+    pops, expanded = [], []
+    for args in workload:
+        with metrics.counting() as counters:
+            fn(*args)
+        pops.append(counters.get("pops", 0))
+        expanded.append(counters.get("expanded", 0))
+    pops.sort()
+    expanded.sort()
+    n = max(1, len(workload))
+    print(
+        f"{label:<26} extraídos media={sum(pops) / n:8.1f} p50={percentile(pops, 50):6} "
+        f"expandidos media={sum(expanded) / n:8.1f} p50={percentile(expanded, 50):6} "
+        f"p99={percentile(expanded, 99):6}"
+    )
+
+
+def multi_stop_states(net, origins, targets, route_graph):
+    g = net.compiled
+    seeds = utils._with_transfers(g, utils._walk_minutes_by_index(g, origins))
+    egress = utils._with_transfers(g, utils._walk_minutes_by_index(g, targets))
+    return utils._multi_stop_search(net, seeds, egress, route_graph=route_graph)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    net = current_network()
+    stops_data = net.stops_data
+    rnd = random.Random(args.seed)
+    ids = [int(s["id"]) for s in stops_data]
+
+    single = [(rnd.choice(ids), rnd.choice(ids)) for _ in range(args.pairs)]
+
+    multi = []
+    for _ in range(args.pairs):
+        a = rnd.choice(stops_data)
+        b = rnd.choice(stops_data)
+        origins = access_stops(net, a["latitud"], a["longitud"], WALK_RADIUS_KM)
+        targets = access_stops(net, b["latitud"], b["longitud"], WALK_RADIUS_KM)
+        multi.append((
+            [(int(s["id"]), w) for s, w in origins],
+            [(int(s["id"]), w) for s, w in targets],
+        ))
+
+    g = net.compiled
+    plain = [(g.stop_index[a], g.stop_index[b]) for a, b in single]
+
+    for engine in ("dijkstra", "raptor"):
+        run(f"{engine} parada-parada", lambda a, b: route_min_buses_prefer_ejes(net, a, b, engine), single)
+    run("dijkstra sin cota", lambda a, b: min_buses_search(g, a, b), plain)
+
+    print()
+    count_states("dijkstra sin cota", lambda a, b: min_buses_search(g, a, b), plain)
+    count_states("A* (grafo de rutas)", lambda a, b: route_min_buses_prefer_ejes(net, a, b, "dijkstra"), single)
+    count_states("multi-parada sin cota", lambda o, t: multi_stop_states(net, o, t, None), multi)
+    count_states("multi-parada A*", lambda o, t: multi_stop_states(net, o, t, net.route_graph), multi)
+    print()
+    for engine in ROUTING_ENGINES:
+        if engine == "tabla" and net.routing_table is None:
+            continue
+        run(f"{engine} multi-parada", lambda o, t: route_multi_stop(net, o, t, engine), multi)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Precalcula la tabla de rutas parada-parada que /instrucciones lee con mmap.
+
+Debe volver a ejecutarse cada vez que cambien db/paradas.json o db/rutas.json;
+el API ignora la tabla si el hash de los datos ya no coincide.
+
+Uso (desde la raíz del proyecto):
+    python -m scripts.build_routing_table [--procesos N] [--salida db/routing_table.bin] [--si-cambia]
+"""
+import argparse
+import os
+import time
+
+from api.v1.data import ROUTING_TABLE, BUS_KMH, DWELL_SECONDS_PER_STOP
+from api.v1.table import RoutingTable, build_routing_table
+from api.v1.utils import current_network, routing_table_hash, minutes_from_km
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--salida", default=ROUTING_TABLE)
+    parser.add_argument("--si-cambia", action="store_true", help="solo reconstruir si la tabla está desactualizada")
+    args = parser.parse_args()
+    compiled = current_network().compiled
+
+    if args.si_cambia and RoutingTable.open(args.salida, compiled, routing_table_hash()) is not None:
+        print(f"Tabla {args.salida} al día, no se reconstruye")
+        return
+
+    start = time.perf_counter()
+    build_routing_table(
+        args.salida,
+        compiled,
+        routing_table_hash(),
+        per_km=minutes_from_km(1.0, BUS_KMH),
+        per_stop=DWELL_SECONDS_PER_STOP / 60.0,
+        processes=args.procesos,
+    )
+    size_mb = os.path.getsize(args.salida) / (1024 * 1024)
+    print(
+        f"Tabla escrita en {args.salida}: {compiled.num_stops} paradas, "
+        f"{size_mb:.1f} MB, {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
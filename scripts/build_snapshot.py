@@ -0,0 +1,61 @@
+"""
+Escribe el snapshot binario de la red (grafo compilado, paradas, rutas y
+catálogos ya serializados) que el API carga al arrancar en lugar de los JSON.
+
+Debe volver a ejecutarse cada vez que cambien db/paradas.json o db/rutas.json;
+el API ignora el snapshot si el hash de los datos ya no coincide y compila
+desde los JSON como antes.
+
+Uso (desde la raíz del proyecto):
+    python -m scripts.build_snapshot [--salida db/network.snapshot] [--si-cambia] [--medir 20]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from api.v1.data import NETWORK_SNAPSHOT, snapshot_hash
+from api.v1.snapshot import read_snapshot, write_snapshot
+from api.v1.utils import compile_from_json
+
+
+def load_from_json():
+    return compile_from_json(strict=True)
+
+
+def measure(label, fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    print(f"{label:<10} primera={times[0]:7.2f}ms mediana={statistics.median(times):7.2f}ms n={repeat}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--salida", default=NETWORK_SNAPSHOT)
+    parser.add_argument("--si-cambia", action="store_true", help="solo reconstruir si el snapshot está desactualizado")
+    parser.add_argument("--medir", type=int, default=0, metavar="N",
+                        help="comparar N cargas desde JSON vs desde el snapshot")
+    args = parser.parse_args()
+
+    if args.si_cambia and read_snapshot(args.salida, snapshot_hash()) is not None:
+        print(f"Snapshot {args.salida} al día, no se reconstruye")
+    else:
+        start = time.perf_counter()
+        net = load_from_json()
+        write_snapshot(args.salida, net, snapshot_hash())
+        size_kb = os.path.getsize(args.salida) / 1024
+        print(
+            f"Snapshot escrito en {args.salida}: {net.compiled.num_stops} paradas, "
+            f"{net.compiled.num_routes} rutas, {size_kb:.0f} KB, {time.perf_counter() - start:.2f}s"
+        )
+
+    if args.medir > 0:
+        measure("json", load_from_json, args.medir)
+        measure("snapshot", lambda: read_snapshot(args.salida, snapshot_hash()), args.medir)
+
+
+if __name__ == "__main__":
+    main()
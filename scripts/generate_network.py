@@ -0,0 +1,254 @@
+"""
+Genera una red sintética (paradas.json / rutas.json con el mismo esquema
+de db/) para pruebas de escala.
+
+Las paradas se reparten al azar en un área cuadrada con la misma densidad
+aproximada que la red real; cada ruta es un recorrido que avanza con un
+rumbo que cambia poco a poco, eligiendo entre las paradas vecinas.
+  --traslape  probabilidad de preferir una parada que ya tiene otra ruta
+              (más traslape = más transbordos posibles)
+  --ejes      proporción de rutas "Troncal Eje" (las que prefiere el ruteo)
+Con la misma semilla y parámetros el resultado es idéntico.
+
+Uso (desde la raíz del proyecto):
+    python -m scripts.generate_network --paradas 20000 --rutas 500 --salida db/sintetica
+    MOVIKOOX_DATA_DIR=db/sintetica python app.py
+
+    # escala: genera cada tamaño y lo mide con scripts/benchmark.py
+    python -m scripts.generate_network --escalar 570,2000,5000,20000 --requests 200
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+# centro (Campeche) y km² por parada de la red real (570 paradas en ~190 km²)
+CENTER_LAT = 19.82
+CENTER_LON = -90.55
+KM2_PER_STOP = 0.33
+KM_PER_DEG_LAT = 111.32
+
+# vecinas consideradas en cada paso del recorrido y cambio máximo de rumbo
+NEIGHBOR_K = 8
+TURN_RAD = 0.35
+
+
+# ---------------------------------------------------
+# PARADAS
+# ---------------------------------------------------
+def generate_stops(rnd, count):
+    side_km = math.sqrt(count * KM2_PER_STOP)
+    half_lat = side_km / 2 / KM_PER_DEG_LAT
+    half_lon = side_km / 2 / (KM_PER_DEG_LAT * math.cos(math.radians(CENTER_LAT)))
+    return [
+        {
+            "id": i,
+            "nombre": f"Parada {i}",
+            "latitud": round(CENTER_LAT + rnd.uniform(-half_lat, half_lat), 6),
+            "longitud": round(CENTER_LON + rnd.uniform(-half_lon, half_lon), 6),
+            "rutas": [],
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+class _Grid:
+    """Malla plana (x, y en km) para encontrar las paradas vecinas de una parada."""
+
+    def __init__(self, stops):
+        cos_lat = math.cos(math.radians(CENTER_LAT))
+        self.xy = [
+            ((s["longitud"] - CENTER_LON) * KM_PER_DEG_LAT * cos_lat, (s["latitud"] - CENTER_LAT) * KM_PER_DEG_LAT)
+            for s in stops
+        ]
+        self.cell = math.sqrt(KM2_PER_STOP) * 2
+        self.cells = {}
+        for i, (x, y) in enumerate(self.xy):
+            self.cells.setdefault(self._key(x, y), []).append(i)
+
+    def _key(self, x, y):
+        return int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+
+    def neighbors(self, i, k):
+        x, y = self.xy[i]
+        cx, cy = self._key(x, y)
+        found = []
+        ring = 1
+        while len(found) < k and ring <= 4:
+            found = [
+                j
+                for gx in range(cx - ring, cx + ring + 1)
+                for gy in range(cy - ring, cy + ring + 1)
+                for j in self.cells.get((gx, gy), ())
+                if j != i
+            ]
+            ring += 1
+        found.sort(key=lambda j: (self.xy[j][0] - x) ** 2 + (self.xy[j][1] - y) ** 2)
+        return found[:k]
+
+    def bearing(self, i, j):
+        return math.atan2(self.xy[j][1] - self.xy[i][1], self.xy[j][0] - self.xy[i][0])
+
+
+# ---------------------------------------------------
+# RUTAS
+# ---------------------------------------------------
+def generate_routes(rnd, stops, count, length, overlap, eje_ratio):
+    grid = _Grid(stops)
+    served = [0] * len(stops)
+    eje_count = round(count * eje_ratio)
+    # las troncales, repartidas entre las demás
+    eje_slots = set(rnd.sample(range(count), eje_count)) if count else set()
+
+    routes = []
+    unserved = list(range(len(stops)))
+    rnd.shuffle(unserved)
+
+    for r in range(count):
+        # arranca en una parada sin servicio (cobertura) o en cualquiera según el traslape
+        while unserved and served[unserved[-1]]:
+            unserved.pop()
+        if unserved and rnd.random() >= overlap:
+            cur = unserved.pop()
+        else:
+            cur = rnd.randrange(len(stops))
+
+        seq = [cur]
+        in_route = {cur}
+        heading = rnd.uniform(-math.pi, math.pi)
+        while len(seq) < length:
+            cands = [j for j in grid.neighbors(cur, NEIGHBOR_K) if j not in in_route]
+            if not cands:
+                break
+            # hacia adelante (±90°) si se puede
+            ahead = [j for j in cands if math.cos(grid.bearing(cur, j) - heading) > 0] or cands
+            shared = [j for j in ahead if served[j]]
+            fresh = [j for j in ahead if not served[j]]
+            pool = (shared if rnd.random() < overlap else fresh) or ahead
+            # la más alineada con el rumbo entre las más cercanas
+            nxt = max(pool[:3], key=lambda j: math.cos(grid.bearing(cur, j) - heading))
+            heading = grid.bearing(cur, nxt) + rnd.uniform(-TURN_RAD, TURN_RAD)
+            seq.append(nxt)
+            in_route.add(nxt)
+            cur = nxt
+
+        for i in seq:
+            served[i] += 1
+
+        number = r + 1
+        if r in eje_slots:
+            name = f"Koox {number:03d} Troncal Eje {number}"
+        else:
+            name = f"Koox {number:03d} Sintética {number}"
+        routes.append({"nombre": name, "paradas": [stops[i]["id"] for i in seq]})
+
+    for route in routes:
+        for stop_id in dict.fromkeys(route["paradas"]):
+            stops[stop_id - 1]["rutas"].append(route["nombre"])
+    return routes
+
+
+def generate(stops_count, routes_count, length, overlap, eje_ratio, seed):
+    rnd = random.Random(seed)
+    stops = generate_stops(rnd, stops_count)
+    routes = generate_routes(rnd, stops, routes_count, length, overlap, eje_ratio)
+    return stops, routes
+
+
+def write(out_dir, stops, routes):
+    os.makedirs(out_dir, exist_ok=True)
+    for name, data in (("paradas.json", stops), ("rutas.json", routes)):
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+# ---------------------------------------------------
+# ESCALA
+# Cada tamaño se genera en un directorio temporal y se mide en su propio
+# proceso (scripts/benchmark.py con MOVIKOOX_DATA_DIR), para que la memoria
+# de uno no contamine al siguiente.
+# ---------------------------------------------------
+def scale(sizes, args):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    benchmark = os.path.join(root, "scripts", "benchmark.py")
+    routes_per_stop = args.rutas / args.paradas
+    rows = []
+
+    with tempfile.TemporaryDirectory(prefix="movikoox-scale-") as tmp:
+        for size in sizes:
+            routes_count = max(1, round(size * routes_per_stop))
+            out_dir = os.path.join(tmp, str(size))
+            write(out_dir, *generate(size, routes_count, args.largo, args.traslape, args.ejes, args.semilla))
+
+            report_path = os.path.join(tmp, f"{size}.json")
+            env = dict(os.environ, MOVIKOOX_DATA_DIR=out_dir)
+            subprocess.run(
+                [sys.executable, benchmark, "--root", root, "--requests", str(args.requests),
+                 "--seed", str(args.semilla), "--json", report_path, "--quiet"],
+                env=env, check=True,
+            )
+            with open(report_path, encoding="utf-8") as f:
+                report = json.load(f)
+            rows.append(report)
+            _print_row(report)
+
+    return rows
+
+
+def _print_row(report):
+    meta, results = report["meta"], report["results"]
+
+    def p(name, q):
+        r = results.get(name)
+        return f"{r[q]:8.2f}" if r else "       -"
+
+    print(
+        f"{meta['stops']:>7} paradas {meta['routes']:>5} rutas  "
+        f"carga {meta['load_s']:7.2f}s  RSS {meta['load_rss_mb']:>7} MB  "
+        f"closest p50 {p('closest_stop', 'p50_ms')}ms  "
+        f"ruta p50 {p('route_min_buses_prefer_ejes', 'p50_ms')} p99 {p('route_min_buses_prefer_ejes', 'p99_ms')}ms  "
+        f"/instrucciones p50 {p('GET /instrucciones', 'p50_ms')} p99 {p('GET /instrucciones', 'p99_ms')}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paradas", type=int, default=570)
+    parser.add_argument("--rutas", type=int, default=27)
+    parser.add_argument("--largo", type=int, default=42, help="paradas por ruta")
+    parser.add_argument("--traslape", type=float, default=0.3, help="0..1")
+    parser.add_argument("--ejes", type=float, default=0.15, help="proporción de rutas troncales, 0..1")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default="db/sintetica")
+    parser.add_argument("--escalar", help="tamaños separados por comas (rutas en la misma proporción)")
+    parser.add_argument("--requests", type=int, default=200, help="mediciones por benchmark en --escalar")
+    parser.add_argument("--json", help="con --escalar: escribe los reportes en este archivo")
+    args = parser.parse_args()
+
+    if args.paradas < 1 or args.rutas < 0 or args.largo < 2:
+        parser.error("se necesita al menos 1 parada y rutas de 2 paradas o más")
+    if not (0 <= args.traslape <= 1 and 0 <= args.ejes <= 1):
+        parser.error("--traslape y --ejes van de 0 a 1")
+
+    if args.escalar:
+        rows = scale([int(x) for x in args.escalar.split(",")], args)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"reports": rows}, f, ensure_ascii=False, indent=2)
+        return
+
+    stops, routes = generate(args.paradas, args.rutas, args.largo, args.traslape, args.ejes, args.semilla)
+    write(args.salida, stops, routes)
+    covered = sum(1 for s in stops if s["rutas"])
+    print(
+        f"Red sintética en {args.salida}: {len(stops)} paradas ({covered} con servicio), "
+        f"{len(routes)} rutas, semilla {args.semilla}"
+    )
+
+
+if __name__ == "__main__":
+    main()
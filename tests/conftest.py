@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# las rutas de datos (db/...) son relativas a la raíz del repositorio
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Cliente de Flask con solo el blueprint del API (sin el vigilante de app.py)."""
+    from flask import Flask
+    from api.v1.endpoints import api_v1
+
+    app = Flask(__name__)
+    app.register_blueprint(api_v1, url_prefix="/api/v1")
+    return app.test_client()
@@ -0,0 +1,57 @@
+import random
+
+from api.v1.data import WALK_KMH, BUS_KMH, DWELL_SECONDS_PER_STOP, MAX_TRANSFERS_PER_STOP
+from api.v1.profiles import constant_profiles
+from api.v1.routegraph import RouteGraph
+from api.v1.snapshot import compile_network
+from api.v1.stops import StopStore
+
+
+# ---------------------------------------------------
+# REDES PEQUEÑAS ARMADAS A MANO
+# ---------------------------------------------------
+def tiny_network(stops, routes, transfer_km=0.0):
+    """stops: [(id, lat, lon)]; routes: {nombre: [ids]}. Sin tabla; transbordos a pie hasta transfer_km."""
+    stops_data = [
+        {"id": sid, "nombre": f"Parada {sid}", "latitud": lat, "longitud": lon,
+         "rutas": [name for name, seq in routes.items() if sid in seq]}
+        for sid, lat, lon in stops
+    ]
+    routes_data = [{"nombre": name, "paradas": seq} for name, seq in routes.items()]
+    net = compile_network(stops_data, routes_data, transfer_km, MAX_TRANSFERS_PER_STOP, walk_kmh=WALK_KMH)
+    net.stop_store = StopStore(stops_data)
+    net.route_graph = RouteGraph(net.compiled, BUS_KMH, DWELL_SECONDS_PER_STOP)
+    net.routing_table = None
+    net.profiles = constant_profiles(net.compiled.num_routes, BUS_KMH)
+    return net
+
+
+# ---------------------------------------------------
+# MALLA DE PRUEBA
+# Malla de 8 x 8 paradas (~0.4 km entre vecinas) con rutas que la cruzan
+# en línea recta y algunas en zigzag, dos de ellas Eje; los transbordos a
+# pie unen paradas vecinas.
+# ---------------------------------------------------
+def grid_network():
+    """Red de los tests de motores y alternativas (siempre la misma)."""
+    rnd = random.Random(22)
+    side = 8
+    # corridas al azar para que no haya empates exactos de distancia
+    stops = [
+        (r * side + c + 1, r * 0.004 + rnd.uniform(-0.001, 0.001), c * 0.004 + rnd.uniform(-0.001, 0.001))
+        for r in range(side) for c in range(side)
+    ]
+    routes = {}
+    for k, r in enumerate((1, 4, 6)):
+        routes[f"Eje {k + 1}" if k < 2 else f"R{k + 1}"] = [r * side + c + 1 for c in range(side)]
+    for k, c in enumerate((2, 5)):
+        routes[f"R{k + 4}"] = [r * side + c + 1 for r in range(side)]
+    for k in range(3):
+        r, c = rnd.randrange(side), 0
+        seq = []
+        while c < side:
+            seq.append(r * side + c + 1)
+            r = min(max(r + rnd.choice((-1, 0, 1)), 0), side - 1)
+            c += 1
+        routes[f"Zigzag {k + 1}"] = seq
+    return tiny_network(stops, routes, transfer_km=0.45)
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from api.v1 import utils
+from api.v1.data import ALTERNATIVES_EXTRA_BUSES, BUS_KMH, DWELL_SECONDS_PER_STOP, WALK_KMH
+from api.v1.pareto import pareto_search
+from api.v1.utils import minutes_from_km, route_alternatives, route_multi_stop
+
+from networks import grid_network
+
+TRIPS = 80
+
+
+@pytest.fixture(scope="module")
+def net():
+    return grid_network()
+
+
+@pytest.fixture(scope="module")
+def trips(net):
+    rnd = random.Random(13)
+    ids = [int(s["id"]) for s in net.stops_data]
+    return [
+        ([(sid, rnd.uniform(0.0, 0.4)) for sid in rnd.sample(ids, 2)],
+         [(sid, rnd.uniform(0.0, 0.4)) for sid in rnd.sample(ids, 2)])
+        for _ in range(TRIPS)
+    ]
+
+
+def front_labels(net, origins, targets):
+    # los mismos parámetros que route_alternatives
+    g = net.compiled
+    seeds = utils._with_transfers(g, utils._walk_minutes_by_index(g, origins))
+    egress = utils._with_transfers(g, utils._walk_minutes_by_index(g, targets))
+    front = pareto_search(
+        g, seeds, egress,
+        per_km=minutes_from_km(1.0, BUS_KMH),
+        per_stop=DWELL_SECONDS_PER_STOP / 60.0,
+        per_walk_km=minutes_from_km(1.0, WALK_KMH),
+        max_extra_buses=ALTERNATIVES_EXTRA_BUSES,
+    )
+    return [label for label, _ in front]
+
+
+def dominates(a, b):
+    return a != b and all(x <= y for x, y in zip(a, b))
+
+
+def test_front_is_mutually_non_dominated(net, trips):
+    sizes = []
+    for origins, targets in trips:
+        labels = front_labels(net, origins, targets)
+        sizes.append(len(labels))
+        assert labels == sorted(labels)
+        for a in labels:
+            assert not any(dominates(b, a) for b in labels)
+        if labels:
+            assert labels[-1][0] <= labels[0][0] + ALTERNATIVES_EXTRA_BUSES
+    # la malla sí produce frentes de más de una alternativa
+    assert max(sizes) > 1
+
+
+def test_first_alternative_is_the_multi_stop_route(net, trips):
+    for origins, targets in trips:
+        path, exact = route_multi_stop(net, origins, targets, engine="dijkstra")
+        alternatives = route_alternatives(net, origins, targets, 5)
+        if not exact:
+            assert alternatives == []
+            continue
+        assert alternatives[0] == path
+        # sin repetir secuencias de camiones
+        sequences = [utils._bus_sequence(p) for p in alternatives]
+        assert len(set(sequences)) == len(sequences)
+
+
+@pytest.mark.parametrize("trip", [
+    "inicio=19.84,-90.53&destino=19.85,-90.52",
+    "inicio=19.83,-90.55&destino=19.86,-90.51",
+    "inicio=19.85,-90.56&destino=19.82,-90.52",
+])
+@pytest.mark.parametrize("extra", ["", "&salida=07:30"])
+def test_first_alternative_matches_instrucciones(client, trip, extra):
+    url = f"/api/v1/instrucciones?{trip}{extra}"
+    single = client.get(url)
+    assert single.status_code == 200
+    alternatives = client.get(url + "&alternativas=5").get_json()["alternatives"]
+    assert alternatives[0] == single.get_json()
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from flask import Flask
+
+from api.v1 import asgi, metrics
+from api.v1.endpoints import api_v1
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRIP = b"inicio=19.84,-90.53&destino=19.85,-90.52"
+
+
+@pytest.fixture
+def app():
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(api_v1, url_prefix="/api/v1")
+    app = asgi.AsgiApp(flask_app, workers=1, max_queue=0, threads=1)
+    # hilos en lugar del forkserver: el error se provoca en este proceso
+    app.pool._processes = False
+    yield app
+    metrics.gauge_providers.remove(app.pool.gauges)
+    app.pool.shutdown()
+    app.threads.shutdown(wait=False)
+
+
+def get(app, path, query=b""):
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query, "headers": []}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_search_goes_through_the_pool(app):
+    status, headers, body = get(app, "/api/v1/instrucciones", TRIP)
+    assert status == 200 and json.loads(body)["ok"] is True
+    assert app.pool.stats()["inflight"] == 0
+
+
+@pytest.mark.parametrize("error, status", [(RuntimeError("x"), 500), (BrokenProcessPool("x"), 503)])
+def test_pool_errors_return_json(app, monkeypatch, error, status):
+    def fail(environ, body):
+        raise error
+
+    monkeypatch.setattr(asgi, "_run_in_thread", fail)
+    got, headers, body = get(app, "/api/v1/instrucciones", TRIP)
+    assert got == status
+    assert headers[b"content-type"] == b"application/json"
+    assert json.loads(body)["ok"] is False
+    stats = app.pool.stats()
+    assert stats["errors"] == 1 and stats["inflight"] == 0
+    # un pool roto se descarta; la siguiente búsqueda crea otro
+    assert (app.pool._executor is None) is isinstance(error, BrokenProcessPool)
+
+    monkeypatch.undo()
+    assert get(app, "/api/v1/instrucciones", TRIP)[0] == 200
+
+
+@pytest.mark.parametrize("path, query, blocking", [
+    ("/api/v1/tiles/14/3744/7218", "", True),
+    ("/api/v1/tiles/14/3744", "", False),
+    ("/api/v1/paradas", "bbox=-90.55,19.83,-90.52,19.86&zoom=14", True),
+    ("/api/v1/paradas", "", False),
+    ("/api/v1/paradas/cercana", "lat=19.84&lon=-90.53", False),
+    ("/api/v1/rutas", "geometria=polyline&zoom=12", True),
+    ("/api/v1/rutas", "", False),
+    ("/api/v1/rutas/koox01troncalejeprincipal/geometria", "zoom=14", True),
+    ("/api/v1/rutas/koox01/extra/geometria", "", False),
+    ("/api/v1/instrucciones/batch", "", True),
+])
+def test_blocking_paths(app, path, query, blocking):
+    assert app.is_blocking(path, query) is blocking
+
+
+def test_tiles_and_geometry_are_built_off_the_event_loop(app):
+    threads = []
+    wsgi_app = app.wsgi_app
+
+    def recording(environ, start_response):
+        threads.append(threading.current_thread().name)
+        return wsgi_app(environ, start_response)
+
+    app.wsgi_app = recording
+    assert get(app, "/api/v1/tiles/14/3744/7218")[0] == 200
+    assert get(app, "/api/v1/paradas", b"bbox=-90.55,19.83,-90.52,19.86&zoom=14")[0] == 200
+    assert get(app, "/api/v1/rutas", b"geometria=polyline&zoom=12")[0] == 200
+    assert get(app, "/api/v1/rutas/koox01troncalejeprincipal/geometria")[0] == 200
+    assert get(app, "/api/v1/paradas/1")[0] == 200
+    assert all(name.startswith("movikoox-wsgi") for name in threads[:4])
+    assert threads[4] == threading.main_thread().name
+
+
+# el vigilante se revisa en otro intérprete: importar la app no debe iniciarlo
+WATCHER_SCRIPT = """
+import asyncio
+from api.v1 import utils
+import asgi
+
+assert utils._watcher is None
+app = asgi.app
+app.pool._processes = False
+messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+
+async def receive():
+    return next(messages)
+
+async def send(message):
+    pass
+
+asyncio.run(app({"type": "lifespan"}, receive, send))
+assert utils._watcher is not None and utils._watcher.is_alive()
+print("ok")
+"""
+
+
+def test_watcher_starts_in_lifespan_not_on_import():
+    done = subprocess.run(
+        [sys.executable, "-c", WATCHER_SCRIPT],
+        cwd=ROOT, capture_output=True, text=True, timeout=120,
+    )
+    assert done.returncode == 0, done.stderr
+    assert done.stdout.strip().endswith("ok")
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from api.v1 import batch, endpoints
+from api.v1.utils import current_network
+
+TRIPS = [
+    {"inicio": "19.84,-90.53", "destino": "19.85,-90.52"},
+    {"inicio": "no es un punto", "destino": "19.85,-90.52"},
+    {"inicio": [19.83, -90.54], "destino": [19.86, -90.51]},
+    {"destino": "19.85,-90.52"},
+    {"inicio": "nan,nan", "destino": "19.85,-90.52"},
+    {"inicio": "19.845,-90.525", "destino": "19.83,-90.545"},
+]
+
+
+def post(client, viajes, **options):
+    r = client.post("/api/v1/instrucciones/batch", json={"viajes": viajes, **options})
+    assert r.status_code == 200
+    assert r.mimetype == "application/x-ndjson"
+    return [json.loads(line) for line in r.data.decode("utf-8").splitlines()]
+
+
+def single(client, viaje):
+    point = lambda p: p if isinstance(p, str) else f"{p[0]},{p[1]}"
+    r = client.get(f"/api/v1/instrucciones?inicio={point(viaje['inicio'])}&destino={point(viaje['destino'])}")
+    return r.get_json()
+
+
+def test_lines_keep_request_order(client, monkeypatch):
+    # bloques de 2: el orden se conserva también entre bloques
+    monkeypatch.setattr(endpoints, "BATCH_CHUNK", 2)
+    lines = post(client, TRIPS * 3)
+    assert [line["index"] for line in lines] == list(range(len(TRIPS) * 3))
+    for line in lines:
+        viaje = TRIPS[line["index"] % len(TRIPS)]
+        if line["ok"]:
+            assert {k: v for k, v in line.items() if k != "index"} == single(client, viaje)
+
+
+def test_error_lines(client):
+    lines = post(client, TRIPS)
+    assert lines[1] == {"index": 1, "ok": False, "status": 400, "message": "Formato inválido"}
+    assert lines[3] == {"index": 3, "ok": False, "status": 400, "message": "Formato inválido"}
+    assert lines[4] == {"index": 4, "ok": False, "status": 400, "message": "Formato inválido"}
+    assert all(lines[i]["ok"] for i in (0, 2, 5))
+
+
+def test_request_errors(client):
+    r = client.post("/api/v1/instrucciones/batch", json={"otra": []})
+    assert r.status_code == 400
+    r = client.post("/api/v1/instrucciones/batch", json={"viajes": [], "motor": "otro"})
+    assert r.status_code == 400
+
+
+def test_process_pool_gives_the_same_paths(monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_WORKERS", 2)
+    net = current_network()
+    tasks = []
+    for a, b in ((0, 40), (10, 200), (300, 5), (77, 512)):
+        sa, sb = net.stops_data[a], net.stops_data[b]
+        tasks.append((net.version, [(int(sa["id"]), 0.1)], [(int(sb["id"]), 0.2)], "dijkstra", None))
+    try:
+        # directo al pool: solve_routes ocultaría un pool roto resolviendo aquí
+        pooled = list(batch.get_executor(net.version).map(batch._search, tasks))
+    finally:
+        batch.shutdown_executor()
+    assert pooled == [batch._search(task) for task in tasks]
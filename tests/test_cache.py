@@ -0,0 +1,61 @@
+from api.v1 import utils
+from api.v1.cache import LRUCache
+from api.v1.utils import cached_bus_segments, route_cache, route_cache_key, snap_coordinate
+
+from networks import tiny_network
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1, "evictions": 1, "hit_rate": 0.75}
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 0
+
+
+def test_lru_disabled_with_size_zero():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_snap_coordinate():
+    # malla de COORD_SNAP_DEG (0.001): puntos a unos metros comparten clave
+    assert snap_coordinate(19.84512) == snap_coordinate(19.84528) == 19.845
+    assert snap_coordinate(-90.53049) == -90.53
+    assert snap_coordinate(-90.5306) == -90.531
+
+
+def network(version):
+    net = tiny_network(
+        [(1, 0.0, 0.0), (2, 0.0, 0.01), (3, 0.0, 0.02)],
+        {"R1": [1, 2, 3]},
+    )
+    net.version = version
+    return net
+
+
+def test_cache_key_includes_network_version():
+    old, new = network("a"), network("b")
+    origins, targets = [(1, 0.1)], [(3, 0.1)]
+    assert route_cache_key(old, origins, targets) != route_cache_key(new, origins, targets)
+
+    route_cache.clear()
+    first = cached_bus_segments(old, origins, targets, engine="dijkstra")
+    assert cached_bus_segments(old, origins, targets, engine="dijkstra") is first
+    # otra versión: se vuelve a buscar con su propia red
+    assert cached_bus_segments(new, origins, targets, engine="dijkstra") is not first
+    assert route_cache.stats()["hits"] == 1
+
+
+def test_reload_clears_route_cache():
+    route_cache.put(route_cache_key(utils.current_network(), [], []), ([], True))
+    utils.reload_network(force=True)
+    assert len(route_cache) == 0
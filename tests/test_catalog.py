@@ -0,0 +1,44 @@
+import gzip
+import json
+
+import pytest
+
+from api.v1.utils import current_network
+
+
+@pytest.mark.parametrize("url", ["/api/v1/paradas", "/api/v1/rutas"])
+def test_etag_and_not_modified(client, url):
+    r = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    assert etag.startswith('"') and r.headers["Vary"] == "Accept-Encoding"
+    assert json.loads(r.data)["ok"] is True
+
+    again = client.get(url, headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+    assert client.get(url, headers={"If-None-Match": '"otro"'}).status_code == 200
+    assert client.get(url, headers={"If-None-Match": "*"}).status_code == 304
+
+
+def test_gzip_negotiation(client):
+    plain = client.get("/api/v1/paradas", headers={"Accept-Encoding": "identity"})
+    packed = client.get("/api/v1/paradas", headers={"Accept-Encoding": "gzip, deflate"})
+    assert "Content-Encoding" not in plain.headers
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(packed.data) == plain.data
+    # cada variante tiene su ETag y cualquiera sirve para revalidar
+    assert packed.headers["ETag"] != plain.headers["ETag"]
+    r = client.get("/api/v1/paradas", headers={"If-None-Match": plain.headers["ETag"], "Accept-Encoding": "gzip"})
+    assert r.status_code == 304
+    assert r.headers["ETag"] == packed.headers["ETag"]
+
+    refused = client.get("/api/v1/paradas", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in refused.headers
+
+
+def test_prepared_catalog_matches_data(client):
+    body = json.loads(client.get("/api/v1/paradas", headers={"Accept-Encoding": "identity"}).data)
+    assert body["body"] == current_network().stops_data
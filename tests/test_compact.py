@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from api.v1.compact import STOP_KEYS
+from api.v1.data import COMPACT_STOP_FIELDS
+
+TRIPS = [
+    "inicio=19.84,-90.53&destino=19.85,-90.52",
+    "inicio=19.83,-90.55&destino=19.86,-90.51",
+    "inicio=19.85,-90.56&destino=19.82,-90.52",
+    "inicio=19.845,-90.525&destino=19.845,-90.5251",
+]
+
+
+def expand(trip, stops):
+    """Formato compacto -> completo: cada id de parada vuelve a ser el objeto de la tabla."""
+    table = {stop["id"]: stop for stop in stops}
+    assert len(table) == len(stops)
+    instructions = []
+    for instruction in trip["instructions"]:
+        instruction = dict(instruction)
+        for key in STOP_KEYS:
+            if key in instruction:
+                instruction[key] = table[instruction[key]]
+        instructions.append(instruction)
+    return {**{k: v for k, v in trip.items() if k != "stops"}, "instructions": instructions}
+
+
+def only_fields(trip, fields):
+    keep = ("id", *fields)
+    out = json.loads(json.dumps(trip))
+    for instruction in out["instructions"]:
+        for key in STOP_KEYS:
+            if key in instruction:
+                instruction[key] = {f: instruction[key][f] for f in keep if f in instruction[key]}
+    return out
+
+
+@pytest.mark.parametrize("trip", TRIPS)
+def test_compact_expands_to_the_full_trip(client, trip):
+    full = client.get(f"/api/v1/instrucciones?{trip}").get_json()
+    r = client.get(f"/api/v1/instrucciones?{trip}&formato=compacto")
+    assert r.status_code == 200
+    compact = json.loads(r.data)
+    assert all(isinstance(i[key], int) for i in compact["instructions"] for key in STOP_KEYS if key in i)
+    assert set(COMPACT_STOP_FIELDS) | {"id"} >= set(compact["stops"][0])
+    assert expand(compact, compact["stops"]) == full
+
+
+def test_compact_fields(client):
+    trip = TRIPS[0]
+    full = client.get(f"/api/v1/instrucciones?{trip}").get_json()
+    compact = json.loads(client.get(f"/api/v1/instrucciones?{trip}&formato=compacto&campos=nombre,latitud").data)
+    assert all(set(stop) == {"id", "nombre", "latitud"} for stop in compact["stops"])
+    assert expand(compact, compact["stops"]) == only_fields(full, ("nombre", "latitud"))
+    assert client.get(f"/api/v1/instrucciones?{trip}&formato=compacto&campos=nombre,altura").status_code == 400
+
+
+def test_compact_alternatives_share_one_table(client):
+    trip = TRIPS[1]
+    full = client.get(f"/api/v1/instrucciones?{trip}&alternativas=3").get_json()
+    compact = json.loads(client.get(f"/api/v1/instrucciones?{trip}&alternativas=3&formato=compacto").data)
+    assert len(compact["alternatives"]) == len(full["alternatives"]) > 1
+    for got, want in zip(compact["alternatives"], full["alternatives"]):
+        assert expand(got, compact["stops"]) == want
+
+
+def test_compact_batch_lines(client):
+    viajes = [dict(zip(("inicio", "destino"), (p.split("=")[1] for p in trip.split("&")))) for trip in TRIPS]
+    body = {"viajes": viajes + [{"inicio": "x"}], "formato": "compacto"}
+    lines = [json.loads(line) for line in client.post("/api/v1/instrucciones/batch", json=body).data.splitlines()]
+    assert lines[-1]["ok"] is False and "stops" not in lines[-1]
+    for line, trip in zip(lines, TRIPS):
+        full = client.get(f"/api/v1/instrucciones?{trip}").get_json()
+        assert expand(line, line["stops"]) == {**full, "index": line["index"]}
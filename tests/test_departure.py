@@ -0,0 +1,71 @@
+import json
+
+from flask import Flask
+
+from api.v1.data import BUS_KMH, DWELL_SECONDS_PER_STOP
+from api.v1.endpoints import api_v1, build_trip
+from api.v1.profiles import load_profiles
+from api.v1.utils import build_bus_segments, route_multi_stop
+
+from networks import tiny_network
+
+
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(api_v1, url_prefix="/api/v1")
+    return app.test_client()
+
+
+def test_departure_rejects_constant_engines():
+    c = client()
+    for motor in ("tabla", "raptor", "rutas"):
+        r = c.get(f"/api/v1/instrucciones?inicio=19.84,-90.53&destino=19.85,-90.52&salida=08:00&motor={motor}")
+        assert r.status_code == 400
+        r = c.post("/api/v1/instrucciones/batch", json={"viajes": [], "salida": "08:00", "motor": motor})
+        assert r.status_code == 400
+
+
+def test_trip_minutes_use_the_band_of_each_edge(tmp_path):
+    # a las 08:00 el camión pasa de 60 a 6 km/h: el viaje sale 07:58 y cruza la franja
+    net = tiny_network(
+        [(1, 0.0, 0.0), (2, 0.0, 0.01), (3, 0.0, 0.02), (4, 0.0, 0.03)],
+        {"R1": [1, 2, 3, 4]},
+    )
+    path = tmp_path / "perfiles.json"
+    path.write_text(json.dumps({
+        "franjas": ["00:00", "08:00"],
+        "default": {"velocidad_kmh": [60, 6], "frecuencia_min": [0, 0]},
+    }))
+    net.profiles = load_profiles(str(path), net.compiled.route_names, BUS_KMH)
+    departure = 7 * 60 + 58
+
+    states, exact = route_multi_stop(net, [(1, 0.0)], [(4, 0.0)], departure=departure)
+    segments = build_bus_segments(net, states)
+    trip = build_trip(0.0, 0.0, 0.0, 0.03, segments, exact, net, departure)
+
+    clock = departure
+    for km in segments[0]["steps"]:
+        clock += km * net.profiles.ride_per_km(0, clock) + DWELL_SECONDS_PER_STOP / 60.0
+    assert len(segments[0]["steps"]) == 3
+    assert trip["summary"]["bus_minutes"] == round(clock - departure, 2)
+    # con una sola franja para todo el tramo saldría a 60 km/h
+    assert trip["summary"]["bus_minutes"] > 10
+
+
+def test_profiles_file_format():
+    # tests/data/perfiles.json: el ejemplo del README
+    routes = ["Koox 01 Troncal Eje Principal", "Otra ruta"]
+    profiles = load_profiles("tests/data/perfiles.json", routes, BUS_KMH)
+    morning = 7 * 60
+    assert profiles.band(morning) == 1
+    assert profiles.band(5 * 60) == 0 and profiles.band(23 * 60) == 6
+    # velocidad de default para las dos; frecuencia propia solo para la primera
+    assert profiles.ride_per_km(0, morning) == profiles.ride_per_km(1, morning) == 60.0 / 14
+    assert profiles.wait_minutes(0, morning) == 3.0
+    assert profiles.wait_minutes(1, morning) == 5.0
+
+
+def test_missing_profiles_file_is_the_constant_model(tmp_path):
+    profiles = load_profiles(str(tmp_path / "perfiles.json"), ["R1"], BUS_KMH)
+    assert profiles.ride_per_km(0, 8 * 60) == 60.0 / BUS_KMH
+    assert profiles.wait_minutes(0, 8 * 60) == 0.0
@@ -0,0 +1,26 @@
+import pytest
+from flask import Flask
+
+from api.v1.data import MAX_WALK_RADIUS_KM, WALK_RADIUS_KM
+from api.v1.endpoints import api_v1, parse_radius
+
+TRIP = "/api/v1/instrucciones?inicio=19.84,-90.53&destino=19.85,-90.52"
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(api_v1, url_prefix="/api/v1")
+    return app.test_client()
+
+
+@pytest.mark.parametrize("radio", ["0", "-1", "nan", "inf", "abc"])
+def test_invalid_radius_is_rejected(client, radio):
+    assert client.get(f"{TRIP}&radio={radio}").status_code == 400
+    assert client.get(f"/api/v1/alcance?origen=19.84,-90.53&minutos=20&radio={radio}").status_code == 400
+
+
+def test_radius_is_clamped():
+    assert parse_radius(None) == WALK_RADIUS_KM
+    assert parse_radius("0.8") == 0.8
+    assert parse_radius("1e9") == MAX_WALK_RADIUS_KM
@@ -0,0 +1,173 @@
+import random
+
+import pytest
+
+from api.v1 import utils
+from api.v1.astar import min_buses_search
+from api.v1.data import BUS_KMH, DWELL_SECONDS_PER_STOP
+from api.v1.table import RoutingTable, build_routing_table
+from api.v1.utils import route_min_buses_prefer_ejes, route_multi_stop
+
+from networks import grid_network, tiny_network
+
+DATA_HASH = b"\x02" * 32
+TRIPS = 150
+
+
+@pytest.fixture(scope="module")
+def net():
+    return grid_network()
+
+
+@pytest.fixture(scope="module")
+def trips(net):
+    rnd = random.Random(7)
+    ids = [int(s["id"]) for s in net.stops_data]
+    out = []
+    for _ in range(TRIPS):
+        origins = [(sid, rnd.uniform(0.0, 0.4)) for sid in rnd.sample(ids, 2)]
+        targets = [(sid, rnd.uniform(0.0, 0.4)) for sid in rnd.sample(ids, 2)]
+        out.append((origins, targets))
+    return out
+
+
+def baseline_multi_stop(net, origins, targets):
+    # Dijkstra sin cotas: la referencia de todos los motores
+    g = net.compiled
+    seeds = utils._with_transfers(g, utils._walk_minutes_by_index(g, origins))
+    egress = utils._with_transfers(g, utils._walk_minutes_by_index(g, targets))
+    came_from, arrival, _ = utils._multi_stop_search(net, seeds, egress)
+    if arrival is None:
+        return None
+    return utils._path_to_state(g, came_from, arrival)
+
+
+def bus_cost(net, path):
+    """(camiones, camiones que no son Eje) del camino."""
+    buses = utils._bus_sequence(path)
+    eje = {name for name, is_eje in zip(net.compiled.route_names, net.compiled.route_is_eje) if is_eje}
+    return len(buses), sum(1 for b in buses if b not in eje)
+
+
+# ---------------------------------------------------
+# MISMO RESULTADO QUE DIJKSTRA
+# ---------------------------------------------------
+@pytest.mark.parametrize("engine", ["dijkstra", "rutas", "raptor"])
+def test_multi_stop_engines_match_dijkstra(net, trips, engine):
+    for origins, targets in trips:
+        expected = baseline_multi_stop(net, origins, targets)
+        path, exact = route_multi_stop(net, origins, targets, engine=engine)
+        assert exact is (expected is not None)
+        if expected is None:
+            continue
+        assert bus_cost(net, path) == bus_cost(net, expected)
+        assert path == expected
+
+
+def path_cost(net, origins, targets, path):
+    """(camiones, no eje, minutos) del camino [(stop_id, bus)], recorriéndolo arista por arista."""
+    g = net.compiled
+    seeds = utils._with_transfers(g, utils._walk_minutes_by_index(g, origins))
+    egress = utils._with_transfers(g, utils._walk_minutes_by_index(g, targets))
+    per_km = utils.minutes_from_km(1.0, BUS_KMH)
+    dwell = DWELL_SECONDS_PER_STOP / 60.0
+
+    idx = [g.stop_index[sid] for sid, _ in path]
+    minutes = seeds[idx[0]] + egress[idx[-1]]
+    buses = non_eje = 0
+    prev_bus = None
+    if len(path) == 1:
+        r = g.board_route(idx[0])
+        return 1, 0 if g.route_is_eje[r] else 1, minutes
+    for (_, bus), i, j in zip(path[1:], idx, idx[1:]):
+        if bus is None:
+            minutes += min(m for k, _, m in g.transfers(i) if k == j)
+        else:
+            r = g.route_index[bus]
+            minutes += min(step for k, rr, step in g.neighbors(i) if k == j and rr == r) * per_km + dwell
+            if bus != prev_bus:
+                buses += 1
+                non_eje += 0 if g.route_is_eje[r] else 1
+        prev_bus = bus
+    return buses, non_eje, minutes
+
+
+def test_bidirectional_matches_dijkstra_cost(net, trips):
+    # mismo costo óptimo; entre caminos empatados puede elegir otro
+    same = 0
+    for origins, targets in trips:
+        expected = baseline_multi_stop(net, origins, targets)
+        path, exact = route_multi_stop(net, origins, targets, engine="bidireccional")
+        assert exact is (expected is not None)
+        if expected is None:
+            continue
+        got, want = path_cost(net, origins, targets, path), path_cost(net, origins, targets, expected)
+        assert got[:2] == want[:2]
+        assert got[2] == pytest.approx(want[2])
+        same += path == expected
+    assert same > len(trips) // 2
+
+
+def test_table_matches_dijkstra(tmp_path, trips):
+    net = grid_network()
+    path = str(tmp_path / "routing_table.bin")
+    build_routing_table(path, net.compiled, DATA_HASH, 60.0 / BUS_KMH, DWELL_SECONDS_PER_STOP / 60.0)
+    net.routing_table = RoutingTable.open(path, net.compiled, DATA_HASH)
+    assert net.routing_table is not None
+    try:
+        for origins, targets in trips:
+            expected = baseline_multi_stop(net, origins, targets)
+            found, exact = route_multi_stop(net, origins, targets, engine="tabla")
+            assert exact is (expected is not None)
+            if expected is not None:
+                assert bus_cost(net, found) == bus_cost(net, expected)
+                assert found == expected
+    finally:
+        net.routing_table.close()
+
+
+@pytest.mark.parametrize("engine", ["dijkstra", "raptor"])
+def test_stop_to_stop_engines_match_dijkstra(net, trips, engine):
+    g = net.compiled
+    for origins, targets in trips:
+        start_id, end_id = origins[0][0], targets[0][0]
+        start, goal = g.stop_index[start_id], g.stop_index[end_id]
+        if start == goal:
+            continue
+        came_from, state, _ = min_buses_search(g, start, goal)
+        if state is None:
+            continue
+        expected = utils._path_to_state(g, came_from, state)
+        path = route_min_buses_prefer_ejes(net, start_id, end_id, engine=engine)
+        assert bus_cost(net, path) == bus_cost(net, expected)
+        assert path == expected
+
+
+# ---------------------------------------------------
+# CASOS LÍMITE
+# ---------------------------------------------------
+@pytest.mark.parametrize("engine", ["dijkstra", "rutas", "raptor", "bidireccional"])
+def test_same_stop(net, engine):
+    path = route_min_buses_prefer_ejes(net, 10, 10, engine=engine)
+    assert [stop for stop, _ in path] == [10]
+    path, exact = route_multi_stop(net, [(10, 0.1)], [(10, 0.2)], engine=engine)
+    assert exact is True
+    assert [stop for stop, _ in path] == [10]
+
+
+@pytest.mark.parametrize("engine", ["dijkstra", "rutas", "raptor", "bidireccional"])
+def test_unreachable_destination_is_approximated(engine):
+    # 4 y 5 están en una ruta sin conexión con R1: se llega lo más cerca posible
+    net = tiny_network(
+        [(1, 0.0, 0.0), (2, 0.0, 0.01), (3, 0.0, 0.02), (4, 0.0, 0.05), (5, 0.0, 0.06)],
+        {"R1": [1, 2, 3], "R2": [4, 5]},
+    )
+    path, exact = route_multi_stop(net, [(1, 0.1)], [(5, 0.1)], engine=engine)
+    assert exact is False
+    assert path[-1][0] == 3
+    assert bus_cost(net, path) == (1, 1)
+
+
+def test_unknown_stop():
+    net = grid_network()
+    assert route_min_buses_prefer_ejes(net, 1, 999) is None
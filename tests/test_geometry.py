@@ -0,0 +1,126 @@
+import pytest
+
+from api.v1.data import GEOMETRY_ZOOMS
+from api.v1.geometry import douglas_peucker, encode_polyline
+from api.v1.utils import current_network
+
+ROUTE = "koox01troncalejeprincipal"
+
+
+def decode_polyline(text, precision=5):
+    """Inverso de encode_polyline: [(lat, lon)]."""
+    factor = 10 ** precision
+    points = []
+    values = []
+    shift = result = 0
+    for ch in text:
+        b = ord(ch) - 63
+        result |= (b & 0x1F) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+            shift = result = 0
+    assert shift == 0 and len(values) % 2 == 0
+    lat = lon = 0
+    for k in range(0, len(values), 2):
+        lat += values[k]
+        lon += values[k + 1]
+        points.append((lat / factor, lon / factor))
+    return points
+
+
+def stop_coords():
+    return {int(s["id"]): (float(s["latitud"]), float(s["longitud"])) for s in current_network().stops_data}
+
+
+def assert_paired(body, coords):
+    """Cada id de "paradas" es el vértice de la polyline en la misma posición."""
+    points = decode_polyline(body["polyline"])
+    assert len(points) == len(body["paradas"])
+    for stop_id, (lat, lon) in zip(body["paradas"], points):
+        assert lat == pytest.approx(coords[stop_id][0], abs=0.6e-5)
+        assert lon == pytest.approx(coords[stop_id][1], abs=0.6e-5)
+
+
+def test_polyline_round_trip():
+    # el ejemplo de la documentación de Google
+    assert encode_polyline([(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    points = [(0, 0), (19.84512, -90.53321), (-19.84512, 90.53321), (89.99999, -179.99999), (1e-5, -1e-5), (1e-5, -1e-5)]
+    decoded = decode_polyline(encode_polyline(points))
+    assert len(decoded) == len(points)
+    for (lat, lon), (dlat, dlon) in zip(points, decoded):
+        assert dlat == pytest.approx(lat, abs=0.6e-5) and dlon == pytest.approx(lon, abs=0.6e-5)
+    assert encode_polyline([]) == "" and decode_polyline("") == []
+
+
+def test_douglas_peucker_keeps_the_ends():
+    xs = [0, 1, 2, 3, 4, 5]
+    ys = [0, 0.01, 0, 3, 0, 0]
+    assert douglas_peucker(xs, ys, 0.1) == [0, 2, 3, 4, 5]
+    assert douglas_peucker(xs, ys, 10) == [0, 5]
+    assert douglas_peucker([1], [1], 1) == [0]
+    # la ruta regresa al mismo punto: no se pierde el más lejano
+    assert douglas_peucker([0, 5, 0], [0, 5, 0], 1) == [0, 1, 2]
+
+
+def test_level_picks_the_finest_zoom_that_covers():
+    geometry = current_network().route_geometry
+    assert geometry.level(None) is None
+    assert geometry.level(0) == GEOMETRY_ZOOMS[0]
+    for z in GEOMETRY_ZOOMS:
+        assert geometry.level(z) == z
+    assert geometry.level(GEOMETRY_ZOOMS[0] + 1) == GEOMETRY_ZOOMS[1]
+    assert geometry.level(GEOMETRY_ZOOMS[-1] + 1) is None
+
+
+@pytest.mark.parametrize("zoom", [None, *GEOMETRY_ZOOMS])
+def test_catalog_ids_pair_with_vertices(client, zoom):
+    coords = stop_coords()
+    query = "" if zoom is None else f"&zoom={zoom}"
+    body = client.get(f"/api/v1/rutas?geometria=polyline{query}").get_json()["body"]
+    rutas = current_network().routes_data
+    assert [line["nombre"] for line in body] == [ruta["nombre"] for ruta in rutas]
+    for line, ruta in zip(body, rutas):
+        assert_paired(line, coords)
+        full = [int(i) for i in ruta["paradas"] if int(i) in coords]
+        if zoom is None:
+            assert line["paradas"] == full
+        elif full:
+            # subsecuencia de la línea completa con los mismos extremos
+            it = iter(full)
+            assert all(i in it for i in line["paradas"])
+            assert line["paradas"][0] == full[0] and line["paradas"][-1] == full[-1]
+
+
+def test_coarser_zoom_has_fewer_points(client):
+    sizes = []
+    for zoom in (*GEOMETRY_ZOOMS, GEOMETRY_ZOOMS[-1] + 1):
+        body = client.get(f"/api/v1/rutas?geometria=polyline&zoom={zoom}").get_json()["body"]
+        sizes.append(sum(len(line["paradas"]) for line in body))
+    assert sizes == sorted(sizes) and sizes[0] < sizes[-1]
+
+
+def test_route_geometry(client):
+    coords = stop_coords()
+    full = client.get(f"/api/v1/rutas/{ROUTE}/geometria").get_json()["body"]
+    assert full["nombre"] == "Koox 01 Troncal Eje Principal"
+    assert_paired(full, coords)
+    catalog = client.get("/api/v1/rutas?geometria=polyline").get_json()["body"]
+    assert full in catalog
+    for zoom in GEOMETRY_ZOOMS:
+        body = client.get(f"/api/v1/rutas/{ROUTE}/geometria?zoom={zoom}").get_json()["body"]
+        assert_paired(body, coords)
+        assert len(body["paradas"]) <= len(full["paradas"])
+    # sin acentos, espacios ni mayúsculas
+    assert client.get("/api/v1/rutas/Koox 01 Troncal Eje Principal/geometria").get_json()["body"] == full
+
+
+@pytest.mark.parametrize("url, status", [
+    ("/api/v1/rutas/noexiste/geometria", 404),
+    ("/api/v1/rutas?geometria=geojson", 400),
+    ("/api/v1/rutas?geometria=polyline&zoom=99", 400),
+    (f"/api/v1/rutas/{ROUTE}/geometria?zoom=x", 400),
+])
+def test_invalid_geometry_requests(client, url, status):
+    r = client.get(url)
+    assert r.status_code == status and r.get_json()["ok"] is False
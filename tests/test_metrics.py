@@ -0,0 +1,96 @@
+import re
+
+from api.v1 import metrics
+from api.v1.utils import route_cache
+
+# con la tabla no hay búsqueda en el heap (ni contadores)
+TRIP = "/api/v1/instrucciones?inicio=19.84,-90.53&destino=19.85,-90.52&motor=dijkstra"
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(?:,|$)')
+SUFFIXES = ("_bucket", "_sum", "_count")
+
+
+def parse_prometheus(text):
+    """{familia: {"help", "type", "samples": [(nombre, {etiquetas}, valor)]}}; falla si una línea no es válida."""
+    families = {}
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name, help_text = line[7:].split(" ", 1)
+            families.setdefault(name, {"samples": []})["help"] = help_text
+        elif line.startswith("# TYPE "):
+            name, kind = line[7:].split(" ")
+            assert kind in ("counter", "gauge", "histogram"), line
+            families.setdefault(name, {"samples": []})["type"] = kind
+        else:
+            m = SAMPLE.match(line)
+            assert m, line
+            name, raw_labels, value = m.groups()
+            labels = {}
+            if raw_labels:
+                pairs = LABEL.findall(raw_labels)
+                assert ",".join(f'{k}="{v}"' for k, v in pairs) == raw_labels, line
+                labels = dict(pairs)
+            family = name
+            if family not in families:
+                family = next(name[:-len(s)] for s in SUFFIXES if name.endswith(s))
+            # cada muestra va después de su HELP y su TYPE
+            assert "help" in families[family] and "type" in families[family], line
+            families[family]["samples"].append((name, labels, float(value)))
+    return families
+
+
+def test_server_timing_header(client):
+    route_cache.clear()
+    r = client.get(TRIP)
+    assert r.status_code == 200
+    entries = dict(part.split(";", 1) for part in r.headers["Server-Timing"].split(", "))
+    for phase in ("paradas", "busqueda", "tramos", "viaje", "json", "total"):
+        assert re.fullmatch(r"dur=\d+\.\d{3}", entries[phase]), phase
+    assert re.fullmatch(r'desc="pops=\d+ pushes=\d+ expanded=\d+"', entries["estados"])
+    assert list(entries)[-1] == "total"
+
+    # acierto del cache: sin búsqueda ni tramos
+    entries = dict(part.split(";", 1) for part in client.get(TRIP).headers["Server-Timing"].split(", "))
+    assert "busqueda" not in entries and "tramos" not in entries
+
+
+def test_metrics_is_valid_prometheus_text(client):
+    route_cache.clear()
+    client.get(TRIP)
+    r = client.get("/api/v1/metrics")
+    assert r.status_code == 200
+    assert r.mimetype == "text/plain"
+    families = parse_prometheus(r.get_data(as_text=True))
+
+    for name in ("pops", "pushes", "expanded"):
+        family = families[f"movikoox_search_{name}_total"]
+        assert family["type"] == "counter"
+        assert family["help"] == metrics.SEARCH_COUNTERS_HELP[name]
+        assert family["samples"][0][2] > 0
+
+    requests = families["movikoox_requests_total"]["samples"]
+    assert any(labels == {"endpoint": "/api/v1/instrucciones", "status": "200"} for _, labels, _ in requests)
+
+    # histogramas: cubetas acumuladas y +Inf igual al conteo
+    latency = families["movikoox_request_duration_seconds"]
+    assert latency["type"] == "histogram"
+    series = {}
+    for name, labels, value in latency["samples"]:
+        key = labels["endpoint"]
+        series.setdefault(key, {"buckets": []})
+        if name.endswith("_bucket"):
+            series[key]["buckets"].append(value)
+        elif name.endswith("_count"):
+            series[key]["count"] = value
+    for s in series.values():
+        assert s["buckets"] == sorted(s["buckets"])
+        assert s["buckets"][-1] == s["count"]
+
+
+def test_label_values_are_escaped():
+    registry = metrics.MetricsRegistry((0.1,))
+    registry.observe('/x"\\\n', 200, 0.05, {}, {})
+    families = parse_prometheus(registry.render())
+    (_, labels, value), = families["movikoox_requests_total"]["samples"]
+    assert labels["endpoint"] == '/x\\"\\\\\\n' and value == 1
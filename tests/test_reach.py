@@ -0,0 +1,83 @@
+import pytest
+
+from api.v1.data import REACH_MAX_BUSES, WALK_KMH
+from api.v1.helpers import calculate_distance
+from api.v1.utils import access_stops, current_network, minutes_from_km, reachable_stops
+
+ORIGIN = (19.84, -90.53)
+URL = f"/api/v1/alcance?origen={ORIGIN[0]},{ORIGIN[1]}"
+
+
+def by_id(reached):
+    return {int(stop["id"]): (minutes, buses, bus) for stop, minutes, buses, bus in reached}
+
+
+def test_zero_buses_is_walk_only(client):
+    net = current_network()
+    reached = reachable_stops(net, *ORIGIN, 60, 0)
+    assert reached
+    access = {int(stop["id"]): km for stop, km in access_stops(net, *ORIGIN)}
+    for stop, minutes, buses, bus in reached:
+        assert buses == 0 and bus is None
+        # nunca más rápido que caminar en línea recta
+        km = calculate_distance(ORIGIN[0], ORIGIN[1], stop["latitud"], stop["longitud"])
+        assert minutes >= minutes_from_km(km, WALK_KMH) - 1e-9
+        if int(stop["id"]) in access:
+            assert minutes == pytest.approx(minutes_from_km(access[int(stop["id"])], WALK_KMH))
+
+    body = client.get(f"{URL}&minutos=60&max_buses=0").get_json()
+    assert body["count"] == len(reached)
+    assert all(item["buses"] == 0 and item["bus"] is None for item in body["body"])
+
+
+def test_budget_is_monotone():
+    net = current_network()
+    previous = {}
+    for budget in (5, 10, 20, 40, 80):
+        reached = reachable_stops(net, *ORIGIN, budget, 2)
+        current = by_id(reached)
+        assert all(minutes <= budget for minutes, _, _ in current.values())
+        # lo alcanzado con menos tiempo sigue igual, solo se agregan paradas
+        assert all(current[sid] == previous[sid] for sid in previous)
+        assert len(current) >= len(previous)
+        previous = current
+    assert len(previous) > 50
+
+
+def test_more_buses_never_slower():
+    net = current_network()
+    previous = {}
+    for max_buses in range(REACH_MAX_BUSES + 1):
+        current = by_id(reachable_stops(net, *ORIGIN, 45, max_buses))
+        assert all(sid in current and current[sid][0] <= previous[sid][0] + 1e-9 for sid in previous)
+        assert all(buses <= max_buses for _, buses, _ in current.values())
+        previous = current
+
+
+def test_results_are_sorted(client):
+    # ordenados por los minutos sin redondear: los redondeados no bajan
+    body = client.get(f"{URL}&minutos=30").get_json()
+    minutes = [item["minutes"] for item in body["body"]]
+    assert minutes == sorted(minutes)
+
+
+def test_geojson_shape(client):
+    plain = client.get(f"{URL}&minutos=30").get_json()
+    geo = client.get(f"{URL}&minutos=30&formato=geojson").get_json()
+    assert geo["type"] == "FeatureCollection"
+    assert len(geo["features"]) == plain["count"] > 0
+    for feature, item in zip(geo["features"], plain["body"]):
+        stop = item["stop"]
+        assert feature["type"] == "Feature"
+        assert feature["geometry"] == {"type": "Point", "coordinates": [stop["longitud"], stop["latitud"]]}
+        assert feature["properties"] == {
+            "id": stop["id"], "nombre": stop["nombre"],
+            "minutes": item["minutes"], "buses": item["buses"], "bus": item["bus"],
+        }
+
+
+@pytest.mark.parametrize("query", [
+    "minutos=0", "minutos=181", "minutos=20&max_buses=-1", f"minutos=20&max_buses={REACH_MAX_BUSES + 1}",
+])
+def test_invalid_parameters(client, query):
+    assert client.get(f"{URL}&{query}").status_code == 400
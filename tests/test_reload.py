@@ -0,0 +1,72 @@
+import os
+import shutil
+import subprocess
+import sys
+
+from api.v1.data import snapshot_hash
+from api.v1.snapshot import read_snapshot, write_snapshot
+
+from networks import tiny_network
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_snapshot_round_trip(tmp_path):
+    net = tiny_network(
+        [(1, 0.0, 0.0), (2, 0.0, 0.01), (3, 0.01, 0.01)],
+        {"R1": [1, 2], "R2": [2, 3]},
+    )
+    path = str(tmp_path / "network.snapshot")
+    data_hash = snapshot_hash()
+    write_snapshot(path, net, data_hash)
+
+    loaded = read_snapshot(path, data_hash)
+    assert loaded.source == "snapshot"
+    assert loaded.stops_data == net.stops_data and loaded.routes_data == net.routes_data
+    for name in type(net.compiled).__slots__:
+        assert getattr(loaded.compiled, name) == getattr(net.compiled, name), name
+    assert loaded.rutas_response.etag == net.rutas_response.etag
+    # otro hash de datos: el snapshot no se usa
+    assert read_snapshot(path, b"\0" * 32) is None
+
+
+# la red se carga al importar utils con las rutas de MOVIKOOX_DATA_DIR:
+# la recarga se prueba en otro intérprete con una copia de los datos
+RELOAD_SCRIPT = """
+import json, sys
+from api.v1 import utils
+from api.v1.data import RUTAS_JSON
+
+old = utils.current_network()
+a, b = old.routes_data[0]["paradas"][0], old.routes_data[0]["paradas"][-1]
+before = utils.route_multi_stop(old, [(a, 0.0)], [(b, 0.0)], engine="dijkstra")
+
+# otra ruta en los datos; la petición en curso se quedó con `old`
+routes = json.load(open(RUTAS_JSON, encoding="utf-8"))
+routes.append({"nombre": "Ruta de prueba", "paradas": [a, b]})
+with open(RUTAS_JSON, "w", encoding="utf-8") as f:
+    json.dump(routes, f)
+
+net, swapped = utils.reload_network()
+assert swapped and utils.current_network() is net
+assert net.version != old.version
+assert "Ruta de prueba" in net.compiled.route_names
+assert "Ruta de prueba" not in old.compiled.route_names
+assert utils.route_multi_stop(old, [(a, 0.0)], [(b, 0.0)], engine="dijkstra") == before
+
+# sin cambios no se reemplaza
+assert utils.reload_network() == (net, False)
+print("ok")
+"""
+
+
+def test_reload_swaps_network_and_keeps_old_object(tmp_path):
+    for name in ("paradas.json", "rutas.json"):
+        shutil.copy(os.path.join(ROOT, "db", name), tmp_path / name)
+    env = dict(os.environ, MOVIKOOX_DATA_DIR=str(tmp_path))
+    done = subprocess.run(
+        [sys.executable, "-c", RELOAD_SCRIPT],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert done.returncode == 0, done.stderr
+    assert done.stdout.strip().endswith("ok")
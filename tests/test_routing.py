@@ -0,0 +1,15 @@
+from api.v1.utils import route_multi_stop
+
+from networks import tiny_network
+
+
+def test_approximation_skips_origin_without_routes():
+    # 1 no tiene rutas y es la parada de origen más cercana al destino 4,
+    # que está en otra ruta sin conexión: la aproximación debe viajar en R1
+    net = tiny_network(
+        [(1, 0.0, 0.004), (2, 0.0, 0.0), (3, 0.0, -0.01), (4, 0.0, 0.05), (5, 0.0, 0.06)],
+        {"R1": [2, 3], "R2": [4, 5]},
+    )
+    path, exact = route_multi_stop(net, [(1, 0.1), (2, 0.3)], [(4, 0.1)], engine="dijkstra")
+    assert exact is False
+    assert path == [(2, "R1")]
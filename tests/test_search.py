@@ -0,0 +1,79 @@
+import random
+import re
+import unicodedata
+
+import pytest
+
+from api.v1.search import RouteNameIndex
+from api.v1.utils import current_network
+
+
+# ---------------------------------------------------
+# BÚSQUEDA LINEAL ORIGINAL (/paradas/bus/<name> antes del índice)
+# ---------------------------------------------------
+def normalize(text):
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return re.sub(r"[^a-z0-9]", "", text)
+
+
+def extract_number(text):
+    match = re.search(r"(\d+)", text)
+    return int(match.group(1)) if match else None
+
+
+def linear_stops(stops_data, name):
+    query_norm = normalize(name)
+    query_number = extract_number(name)
+    paradas = []
+    for stop in stops_data:
+        for ruta in stop.get("rutas", []):
+            if query_number is not None and extract_number(ruta) == query_number:
+                paradas.append(stop)
+                break
+            if query_norm in normalize(ruta):
+                paradas.append(stop)
+                break
+    return paradas
+
+
+def queries(route_names, count):
+    rnd = random.Random(8)
+    out = ["", "koox", "KOOX 1", "Koox 01", "eje", "troncal", "Éje Principal", "zzz", "0", "99", "-", "ko'ox"]
+    for _ in range(count):
+        name = rnd.choice(route_names)
+        kind = rnd.randrange(4)
+        if kind == 0:
+            out.append(name)
+        elif kind == 1:
+            i = rnd.randrange(len(name))
+            out.append(name[i:i + rnd.randint(1, 12)])
+        elif kind == 2:
+            out.append(name.upper().replace("a", "á"))
+        else:
+            out.append("".join(rnd.choice("abcdeijklmnoprstuxz 0123456789") for _ in range(rnd.randint(1, 6))))
+    return out
+
+
+def test_index_matches_linear_search_on_real_data():
+    stops_data = current_network().stops_data
+    index = RouteNameIndex(stops_data)
+    names = sorted({ruta for stop in stops_data for ruta in stop.get("rutas", [])})
+    for query in queries(names, 300):
+        assert index.stops(query) == linear_stops(stops_data, query), query
+
+
+@pytest.mark.parametrize("query", ["1", "10", "Ruta 1", "centro", "cen", "ntro", "tro", "x"])
+def test_index_matches_linear_search_on_overlapping_names(query):
+    stops_data = [
+        {"id": 1, "rutas": ["Ruta 1 Centro", "Ruta 10"]},
+        {"id": 2, "rutas": ["Ruta 10"]},
+        {"id": 3, "rutas": ["Troncal Centro", "Ruta 1 Centro"]},
+        {"id": 4, "rutas": []},
+    ]
+    assert RouteNameIndex(stops_data).stops(query) == linear_stops(stops_data, query)
+
+
+def test_endpoint_404_when_nothing_matches(client):
+    assert client.get("/api/v1/paradas/bus/zzzz").status_code == 404
+    assert client.get("/api/v1/paradas/bus/koox").get_json()["ok"] is True
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+from flask import Flask
+
+from api.v1.endpoints import api_v1
+from api.v1.helpers import calculate_distance
+from api.v1.spatial import SpatialIndex
+
+
+@pytest.fixture(scope="module")
+def points():
+    rnd = random.Random(2)
+    # paradas agrupadas como en una ciudad, más algunas sueltas
+    lats, lons = [], []
+    for _ in range(400):
+        lats.append(19.84 + rnd.gauss(0, 0.02))
+        lons.append(-90.53 + rnd.gauss(0, 0.02))
+    for _ in range(20):
+        lats.append(rnd.uniform(19.5, 20.2))
+        lons.append(rnd.uniform(-90.9, -90.1))
+    return lats, lons
+
+
+def scan(lats, lons, lat, lon):
+    return sorted(
+        ((i, calculate_distance(lat, lon, la, lo)) for i, (la, lo) in enumerate(zip(lats, lons))),
+        key=lambda x: (x[1], x[0]),
+    )
+
+
+def queries():
+    rnd = random.Random(9)
+    # dentro de la malla y fuera de ella
+    return [(19.84 + rnd.uniform(-0.5, 0.5), -90.53 + rnd.uniform(-0.5, 0.5)) for _ in range(200)]
+
+
+def test_nearest_matches_linear_scan(points):
+    index = SpatialIndex(*points)
+    for lat, lon in queries():
+        assert index.nearest(lat, lon) == scan(*points, lat, lon)[0]
+        assert index.k_nearest(lat, lon, 5) == scan(*points, lat, lon)[:5]
+
+
+@pytest.mark.parametrize("radius_km", [0.1, 0.5, 2.0])
+def test_within_radius_matches_linear_scan(points, radius_km):
+    index = SpatialIndex(*points)
+    for lat, lon in queries():
+        expected = [(i, d) for i, d in scan(*points, lat, lon) if d <= radius_km]
+        assert index.within_radius(lat, lon, radius_km) == expected
+
+
+def test_empty_index():
+    index = SpatialIndex([], [])
+    assert index.nearest(19.8, -90.5) == (None, float("inf"))
+    assert index.within_radius(19.8, -90.5, 1.0) == []
+
+
+@pytest.mark.parametrize("url", [
+    "/api/v1/paradas/cercana?latitud=nan&longitud=nan",
+    "/api/v1/paradas/cercana?latitud=inf&longitud=0",
+    "/api/v1/instrucciones?inicio=nan,nan&destino=19.85,-90.52",
+    "/api/v1/instrucciones?inicio=inf,0&destino=19.85,-90.52",
+    "/api/v1/alcance?origen=nan,nan&minutos=20",
+    "/api/v1/alcance?origen=inf,inf&minutos=20",
+    "/api/v1/paradas?bbox=-inf,19.8,-90.5,inf",
+])
+def test_non_finite_coordinates_are_rejected(url):
+    app = Flask(__name__)
+    app.register_blueprint(api_v1, url_prefix="/api/v1")
+    r = app.test_client().get(url)
+    assert r.status_code == 400
+    assert r.get_json()["ok"] is False
@@ -0,0 +1,40 @@
+from api.v1.stops import StopStore
+
+
+def stops(ids):
+    return [{"id": sid, "nombre": f"Parada {sid}", "latitud": 21.0, "longitud": -89.6} for sid in ids]
+
+
+def test_dense_ids():
+    store = StopStore(stops([3, 1, 2]))
+    assert store.dense
+    assert store.row(1) == 1
+    assert store.row(0) is None
+    assert store.row(7) is None
+    assert store.row(-1) is None
+
+
+def test_negative_and_sparse_ids_use_a_dict():
+    store = StopStore(stops([-5, 10]))
+    assert not store.dense
+    assert store.row(-5) == 0
+    assert store.by_id(10)["id"] == 10
+    assert store.row(0) is None
+
+    store = StopStore(stops([1, 10 ** 12]))
+    assert not store.dense
+    assert store.row(10 ** 12) == 1
+
+
+def test_repeated_id_keeps_last_row():
+    assert StopStore(stops([4, 4])).row(4) == 1
+    assert StopStore(stops([4, 10 ** 9, 4])).row(4) == 2
+
+
+def test_names_are_interned_without_touching_the_dicts():
+    data = stops([1, 2])
+    name = "".join(["Parada ", "1"])
+    data[0]["nombre"] = name
+    store = StopStore(data)
+    assert store.names[0] == "Parada 1"
+    assert data[0]["nombre"] is name
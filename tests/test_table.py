@@ -0,0 +1,51 @@
+from api.v1.data import BUS_KMH, DWELL_SECONDS_PER_STOP
+from api.v1.table import RoutingTable, build_routing_table
+
+from networks import tiny_network
+
+DATA_HASH = b"\x01" * 32
+
+
+def build_table(tmp_path):
+    net = tiny_network(
+        [(1, 0.0, 0.0), (2, 0.0, 0.01), (3, 0.0, 0.02), (4, 0.01, 0.02)],
+        {"R1": [1, 2, 3], "R2": [3, 4]},
+    )
+    path = str(tmp_path / "routing_table.bin")
+    build_routing_table(path, net.compiled, DATA_HASH, 60.0 / BUS_KMH, DWELL_SECONDS_PER_STOP / 60.0)
+    return net, path
+
+
+def truncate(path, size):
+    with open(path, "r+b") as f:
+        f.truncate(size)
+
+
+def test_table_round_trip(tmp_path):
+    net, path = build_table(tmp_path)
+    table = RoutingTable.open(path, net.compiled, DATA_HASH)
+    assert table is not None
+    # 1 -> 4: R1 hasta 3 y R2 hasta 4
+    assert table.path(0, 3) == [(0, 0), (1, 0), (2, 0), (3, 1)]
+    table.close()
+
+
+def test_truncated_table_is_ignored(tmp_path):
+    net, path = build_table(tmp_path)
+    with open(path, "rb") as f:
+        size = len(f.read())
+
+    # un byte menos: la última sección de ruta queda incompleta
+    truncate(path, size - 1)
+    assert RoutingTable.open(path, net.compiled, DATA_HASH) is None
+    # a media matriz de registros
+    truncate(path, size // 2)
+    assert RoutingTable.open(path, net.compiled, DATA_HASH) is None
+
+
+def test_closed_table_reads_as_empty(tmp_path):
+    net, path = build_table(tmp_path)
+    table = RoutingTable.open(path, net.compiled, DATA_HASH)
+    table.close()
+    assert table.lookup(0, 3) is None
+    assert table.path(0, 3) is None
@@ -0,0 +1,83 @@
+import pytest
+
+from api.v1.data import THIN_CELL_PX, THIN_MAX_ZOOM, TILE_INDEXED_ZOOMS
+from api.v1.tiles import TILE_SIZE_PX, thin, tile_bounds, world_pixel
+from api.v1.utils import current_network
+
+# un zoom sin índice, los dos extremos del índice y uno sin adelgazar
+ZOOMS = [9, TILE_INDEXED_ZOOMS[0], 13, TILE_INDEXED_ZOOMS[1], 17]
+
+
+def tile_of(lat, lon, z):
+    x, y = world_pixel(lat, lon, z)
+    return int(x // TILE_SIZE_PX), int(y // TILE_SIZE_PX)
+
+
+def busy_tiles(z):
+    """Teselas del zoom z con paradas, de la más poblada a la menos (a lo más 5)."""
+    counts = {}
+    for stop in current_network().stops_data:
+        key = tile_of(stop["latitud"], stop["longitud"], z)
+        counts[key] = counts.get(key, 0) + 1
+    return sorted(counts, key=lambda k: -counts[k])[:5]
+
+
+def test_thin_keeps_the_busiest_stop_per_cell():
+    tiles = current_network().tiles
+    everything = range(len(tiles.px))
+    for z in range(8, THIN_MAX_ZOOM):
+        kept = thin(everything, tiles.px, tiles.py, tiles.weight, z, THIN_CELL_PX, THIN_MAX_ZOOM)
+        cell = THIN_CELL_PX / (1 << z)
+        cell_of = lambda i: (int(tiles.px[i] // cell), int(tiles.py[i] // cell))
+        winners = {cell_of(i): i for i in kept}
+        # una por celda, y ninguna otra de la celda tiene más rutas (en empate, menor índice)
+        assert len(winners) == len(kept) and kept == sorted(kept)
+        for i in everything:
+            w = winners[cell_of(i)]
+            assert (-tiles.weight[w], w) <= (-tiles.weight[i], i)
+    # desde THIN_MAX_ZOOM y sin zoom no se adelgaza
+    assert thin(everything, tiles.px, tiles.py, tiles.weight, THIN_MAX_ZOOM, THIN_CELL_PX, THIN_MAX_ZOOM) == list(everything)
+    assert thin(everything, tiles.px, tiles.py, tiles.weight, None, THIN_CELL_PX, THIN_MAX_ZOOM) == list(everything)
+
+
+def test_fewer_stops_when_zoomed_out():
+    tiles = current_network().tiles
+    everything = range(len(tiles.px))
+    sizes = [len(thin(everything, tiles.px, tiles.py, tiles.weight, z, THIN_CELL_PX, THIN_MAX_ZOOM))
+             for z in range(8, THIN_MAX_ZOOM + 1)]
+    assert sizes == sorted(sizes) and sizes[0] < sizes[-1]
+
+
+@pytest.mark.parametrize("z", ZOOMS)
+def test_bbox_and_tile_give_the_same_stops(client, z):
+    for x, y in busy_tiles(z):
+        tile = client.get(f"/api/v1/tiles/{z}/{x}/{y}").get_json()
+        min_lat, min_lon, max_lat, max_lon = tile_bounds(z, x, y)
+        bbox = client.get(f"/api/v1/paradas?bbox={min_lon},{min_lat},{max_lon},{max_lat}&zoom={z}").get_json()
+        assert [s["id"] for s in tile["stops"]] == [s["id"] for s in bbox["body"]]
+        assert bbox["count"] == len(tile["stops"]) <= bbox["total"]
+        # todas sus paradas caen dentro de la tesela
+        assert all(tile_of(s["latitud"], s["longitud"], z) == (x, y) for s in tile["stops"])
+
+
+def test_tile_segments_cross_the_tile(client):
+    z = 14
+    x, y = busy_tiles(z)[0]
+    min_lat, min_lon, max_lat, max_lon = tile_bounds(z, x, y)
+    tile = client.get(f"/api/v1/tiles/{z}/{x}/{y}").get_json()
+    assert tile["segments"]
+    for line in tile["segments"]:
+        assert len(line["coords"]) >= 2
+        lats = [p[0] for p in line["coords"]]
+        lons = [p[1] for p in line["coords"]]
+        assert min(lats) <= max_lat and max(lats) >= min_lat
+        assert min(lons) <= max_lon and max(lons) >= min_lon
+
+
+def test_empty_and_invalid_tiles(client):
+    empty = client.get("/api/v1/tiles/14/0/0")
+    assert empty.status_code == 200
+    assert empty.get_json() == {"ok": True, "stops": [], "segments": []}
+    assert "ETag" in empty.headers
+    assert client.get("/api/v1/tiles/2/4/0").status_code == 400
+    assert client.get("/api/v1/tiles/21/0/0").status_code == 400